@@ -6,8 +6,8 @@ from sqlalchemy import pool
 
 from alembic import context
 
-# Import Base from your models file and DATABASE_URL from your database file
-from app.database import Base, DATABASE_URL # Base is defined in database.py
+# Import Base from your models file and the URL getter from your database file
+from app.database import Base, get_database_url # Base is defined in database.py; importing it connects nothing
 # Explicitly import all models to ensure they are registered with Base.metadata
 from app.models import User, Profile, Experience, Education
 
@@ -62,7 +62,7 @@ def run_migrations_online() -> None:
 
     """
     # Fetch DB_URL from environment variable or alembic.ini
-    actual_db_url = DATABASE_URL # This is imported from app.database at the top of the file
+    actual_db_url = get_database_url() # SUPABASE_DB_URL, read only now so offline mode doesn't need it
 
     # If using engine_from_config, ensure it uses the fetched DB_URL.
     # Create a new dictionary for engine configuration or update existing one.
@@ -0,0 +1,33 @@
+"""manual_002_profile_snapshots
+
+Revision ID: manual_002
+Revises: manual_001
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_002'
+down_revision: Union[str, None] = 'manual_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Materialized public profile JSON, one row per profile.
+    # Backfill after upgrading with: python -m app.cli rebuild-snapshots
+    op.create_table('profile_snapshots',
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['profile_id'], ['profiles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('profile_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('profile_snapshots')
@@ -0,0 +1,41 @@
+"""manual_003_foreign_key_indexes
+
+Revision ID: manual_003
+Revises: manual_002
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_003'
+down_revision: Union[str, None] = 'manual_002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # profile_id had no index, so loading a profile's children and the ownership
+    # filters in crud scanned the whole table. Leading with profile_id serves both;
+    # start_date keeps a profile's rows in timeline order.
+    op.create_index('ix_experiences_profile_id_start_date', 'experiences', ['profile_id', 'start_date'], unique=False)
+    op.create_index('ix_education_history_profile_id_start_date', 'education_history', ['profile_id', 'start_date'], unique=False)
+
+    # Primary keys are already indexed; these only cost space and write time
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_profiles_id', table_name='profiles')
+    op.drop_index('ix_experiences_id', table_name='experiences')
+    op.drop_index('ix_education_history_id', table_name='education_history')
+
+
+def downgrade() -> None:
+    op.create_index('ix_education_history_id', 'education_history', ['id'], unique=False)
+    op.create_index('ix_experiences_id', 'experiences', ['id'], unique=False)
+    op.create_index('ix_profiles_id', 'profiles', ['id'], unique=False)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.drop_index('ix_education_history_profile_id_start_date', table_name='education_history')
+    op.drop_index('ix_experiences_profile_id_start_date', table_name='experiences')
@@ -0,0 +1,39 @@
+"""manual_004_profile_search
+
+Revision ID: manual_004
+Revises: manual_003
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_004'
+down_revision: Union[str, None] = 'manual_003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Full-text search documents for GET /search (see app/search.py).
+    # Backfill after upgrading with: python -m app.cli rebuild-search
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE profile_search ("
+            "profile_id INTEGER PRIMARY KEY REFERENCES profiles (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX ix_profile_search_document ON profile_search USING gin (document)")
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE profile_search USING fts5("
+            "name, headline, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE profile_search")
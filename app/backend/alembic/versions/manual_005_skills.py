@@ -0,0 +1,77 @@
+"""manual_005_skills
+
+Revision ID: manual_005
+Revises: manual_004
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_005'
+down_revision: Union[str, None] = 'manual_004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _skill_names(value):
+    # experiences.skills_used holds a JSON array, or comma-separated text in older rows.
+    # Names are canonicalized like crud.canonical_skill_name().
+    if not value:
+        return set()
+    names = json.loads(value) if value.startswith('[') else value.split(',')
+    return {' '.join(name.split()).casefold() for name in names if name.strip()}
+
+
+def upgrade() -> None:
+    skills = op.create_table('skills',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    experience_skills = op.create_table('experience_skills',
+    sa.Column('experience_id', sa.Integer(), nullable=False),
+    sa.Column('skill_id', sa.Integer(), nullable=False),
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['experience_id'], ['experiences.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['profile_id'], ['profiles.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ),
+    sa.PrimaryKeyConstraint('experience_id', 'skill_id')
+    )
+    op.create_index('ix_experience_skills_skill_id_profile_id', 'experience_skills', ['skill_id', 'profile_id'], unique=False)
+
+    # Backfill from the existing skills_used text, in id order and bounded batches
+    conn = op.get_bind()
+    experiences = sa.table('experiences', sa.column('id'), sa.column('profile_id'), sa.column('skills_used'))
+    skill_ids = {}
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(experiences.c.id, experiences.c.profile_id, experiences.c.skills_used)
+            .where(experiences.c.id > last_id).order_by(experiences.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        postings = []
+        for row in rows:
+            for name in _skill_names(row.skills_used):
+                if name not in skill_ids:
+                    skill_ids[name] = conn.execute(sa.insert(skills).values(name=name).returning(skills.c.id)).scalar_one()
+                postings.append({'experience_id': row.id, 'skill_id': skill_ids[name], 'profile_id': row.profile_id})
+        if postings:
+            conn.execute(sa.insert(experience_skills), postings)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_experience_skills_skill_id_profile_id', table_name='experience_skills')
+    op.drop_table('experience_skills')
+    op.drop_table('skills')
@@ -0,0 +1,33 @@
+"""manual_006_handle_lower_index
+
+Revision ID: manual_006
+Revises: manual_005
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_006'
+down_revision: Union[str, None] = 'manual_005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Handles become unique ignoring case, and lookups by lower(handle) use this index.
+    # Existing handles that differ only in case must be renamed first.
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT lower(handle) FROM profiles WHERE handle IS NOT NULL GROUP BY lower(handle) HAVING count(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Handles that differ only in case must be renamed before this migration: {duplicates}")
+    op.create_index('ix_profiles_handle_lower', 'profiles', [sa.text('lower(handle)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_profiles_handle_lower', table_name='profiles')
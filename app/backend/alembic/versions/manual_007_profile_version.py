@@ -0,0 +1,30 @@
+"""manual_007_profile_version
+
+Revision ID: manual_007
+Revises: manual_006
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_007'
+down_revision: Union[str, None] = 'manual_006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Version counter and last write time of each profile, for ETag/Last-Modified and If-Match.
+    # Existing rows start at version 1; updated_at stays NULL (no Last-Modified) until their next write.
+    op.add_column('profiles', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('profiles', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('profiles', 'updated_at')
+    op.drop_column('profiles', 'version')
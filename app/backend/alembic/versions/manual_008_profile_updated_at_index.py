@@ -0,0 +1,28 @@
+"""manual_008_profile_updated_at_index
+
+Revision ID: manual_008
+Revises: manual_007
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'manual_008'
+down_revision: Union[str, None] = 'manual_007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Each worker's handle filter adds the handles written since its last refresh every few
+    # seconds; without an index that read would scan the whole table
+    op.create_index('ix_profiles_updated_at', 'profiles', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_profiles_updated_at', table_name='profiles')
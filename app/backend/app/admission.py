@@ -0,0 +1,109 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from fastapi import HTTPException, status
+
+from . import metrics
+from .passwords import PASSWORD_HASH_WORKERS
+
+# Admission control for /signin and /signup, which each cost a bcrypt hash or verification.
+# Requests over a limit are turned away before the database lookup and before any bcrypt work,
+# so a credential-stuffing burst can't take the CPU the rest of the API needs. Settings:
+#   AUTH_IP_PER_MINUTE / AUTH_IP_BURST            attempts per client address (0 disables)
+#   AUTH_ACCOUNT_PER_MINUTE / AUTH_ACCOUNT_BURST  attempts per email address (0 disables)
+#   AUTH_MAX_CONCURRENT                           attempts in progress at once per worker, beyond which new ones get a 503 (0 disables)
+#   AUTH_BUCKETS_SIZE                             addresses and accounts tracked, each (LRU beyond that)
+AUTH_IP_PER_MINUTE = float(os.environ.get("AUTH_IP_PER_MINUTE", "10"))
+AUTH_IP_BURST = int(os.environ.get("AUTH_IP_BURST", "20"))
+AUTH_ACCOUNT_PER_MINUTE = float(os.environ.get("AUTH_ACCOUNT_PER_MINUTE", "5"))
+AUTH_ACCOUNT_BURST = int(os.environ.get("AUTH_ACCOUNT_BURST", "5"))
+AUTH_BUCKETS_SIZE = int(os.environ.get("AUTH_BUCKETS_SIZE", "100000"))
+# Default: enough to keep every bcrypt worker busy while other attempts wait on their user lookup
+AUTH_MAX_CONCURRENT = int(os.environ.get("AUTH_MAX_CONCURRENT", str(PASSWORD_HASH_WORKERS * 2)))
+
+
+class TokenBuckets:
+    """A token bucket per key in a bounded LRU.
+
+    Each key can spend `burst` tokens at once, refilled at `per_minute`. A bucket
+    that has refilled completely is the same as no bucket, so full ones are dropped
+    from the old end as keys are used, and past `maxsize` keys the least recently
+    used goes. Every call is O(1) amortized. Used from the event loop only.
+    """
+
+    def __init__(self, per_minute: float, burst: int, maxsize: int):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict() # key -> (tokens, as of time.monotonic())
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0 and self.maxsize > 0
+
+    def take(self, key: str) -> float:
+        """Spend one of `key`'s tokens: 0 if it had one, else the seconds until it will."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        self._expire(now)
+        return wait
+
+    def _expire(self, now: float) -> None:
+        # Oldest updates first; stops at the first bucket that hasn't refilled yet
+        while self._buckets:
+            key, (tokens, updated_at) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.maxsize and tokens + (now - updated_at) * self.rate < self.burst:
+                return
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AuthAdmission:
+    def __init__(self, ip_per_minute: float = AUTH_IP_PER_MINUTE, ip_burst: int = AUTH_IP_BURST,
+                 account_per_minute: float = AUTH_ACCOUNT_PER_MINUTE, account_burst: int = AUTH_ACCOUNT_BURST,
+                 max_concurrent: int = AUTH_MAX_CONCURRENT, buckets_size: int = AUTH_BUCKETS_SIZE):
+        self.ip_buckets = TokenBuckets(ip_per_minute, ip_burst, buckets_size)
+        self.account_buckets = TokenBuckets(account_per_minute, account_burst, buckets_size)
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+
+    def _reject(self, endpoint: str, outcome: str, status_code: int, retry_after: float, detail: str):
+        metrics.AUTH_ADMISSION.inc((endpoint, outcome))
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    @contextmanager
+    def admit(self, endpoint: str, client_ip: str | None, account: str):
+        """Run a sign-in or sign-up attempt, or reject it with 503 (too many in progress) or 429 (rate limited)."""
+        # Checked before the buckets, so attempts shed for load don't also use up the caller's tokens
+        if self.max_concurrent > 0 and self.in_flight >= self.max_concurrent:
+            self._reject(endpoint, "overloaded", status.HTTP_503_SERVICE_UNAVAILABLE, 1,
+                         "Too many authentication requests, please retry shortly")
+        if client_ip is not None and (wait := self.ip_buckets.take(client_ip)):
+            self._reject(endpoint, "ip_limited", status.HTTP_429_TOO_MANY_REQUESTS, wait,
+                         "Too many attempts from this address, please retry later")
+        if wait := self.account_buckets.take(account.strip().lower()):
+            self._reject(endpoint, "account_limited", status.HTTP_429_TOO_MANY_REQUESTS, wait,
+                         "Too many attempts for this account, please retry later")
+        metrics.AUTH_ADMISSION.inc((endpoint, "admitted"))
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+
+auth_admission = AuthAdmission()
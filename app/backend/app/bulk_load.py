@@ -0,0 +1,174 @@
+"""Streaming bulk loader behind `python -m app.cli bulk-load`.
+
+Reads one table's rows from an NDJSON file (one JSON object per line) or a CSV
+file (header line, then one record per line) and inserts them in fixed-size
+chunks: COPY on PostgreSQL, executemany INSERT on SQLite. Only one chunk is held
+in memory at a time. After each committed chunk the byte offset reached is
+written to a checkpoint file, so an interrupted load resumes where it stopped
+instead of inserting the same rows twice.
+
+Rows are inserted as given (ids included when present); users must carry an
+already hashed `hashed_password`. Profile snapshots and search documents are not
+touched, so run `python -m app.cli rebuild-snapshots` (which re-indexes search too)
+once the load is done, and `python -m app.cli rebuild-skills` after loading experiences.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Iterator
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, Table, insert, text
+
+from . import models
+from .database import get_engine
+
+TABLES = ("users", "profiles", "experiences", "education_history")
+FORMATS = ("ndjson", "csv")
+
+
+def _coercer(column) -> Callable[[Any], Any]:
+    # CSV gives strings for everything and NDJSON gives JSON types,
+    # so values are converted to what the column's bind processing expects
+    column_type = column.type
+    if isinstance(column_type, models.SkillList):
+        return lambda value: value if isinstance(value, list) else column_type.process_result_value(value, None)
+    if isinstance(column_type, DateTime):
+        return datetime.fromisoformat
+    if isinstance(column_type, Date):
+        return date.fromisoformat
+    if isinstance(column_type, Boolean):
+        return lambda value: value if isinstance(value, bool) else value.strip().lower() in ("1", "true", "t", "yes")
+    if isinstance(column_type, Integer):
+        return int
+    return lambda value: value if isinstance(value, str) else str(value)
+
+
+class _Reader:
+    """Yields (row dict, byte offset after the row) from a file, starting at a given offset."""
+
+    def __init__(self, path: str, file_format: str, table: Table):
+        self.path = path
+        self.file_format = file_format
+        self.coercers = {column.name: _coercer(column) for column in table.columns}
+        self.header: list[str] | None = None
+
+    def _parse(self, line: bytes) -> dict | None:
+        decoded = line.decode("utf-8").rstrip("\r\n")
+        if not decoded.strip():
+            return None
+        if self.file_format == "csv":
+            values = next(csv.reader([decoded]))
+            record = dict(zip(self.header, values))
+        else:
+            record = json.loads(decoded)
+        unknown = set(record) - set(self.coercers)
+        if unknown:
+            raise ValueError(f"unknown column(s) {sorted(unknown)}")
+        # Empty CSV fields and JSON nulls are both NULL
+        return {name: None if value is None or value == "" else self.coercers[name](value) for name, value in record.items()}
+
+    def rows(self, offset: int) -> Iterator[tuple[dict, int]]:
+        with open(self.path, "rb") as f:
+            if self.file_format == "csv":
+                self.header = next(csv.reader([f.readline().decode("utf-8-sig").rstrip("\r\n")]))
+            if offset > f.tell():
+                f.seek(offset)
+            while line := f.readline():
+                try:
+                    row = self._parse(line)
+                except ValueError as e:
+                    raise ValueError(f"{self.path} at byte {f.tell() - len(line)}: {e}") from e
+                if row is not None:
+                    yield row, f.tell()
+
+
+def _read_checkpoint(checkpoint_path: str, source_path: str) -> tuple[int, int]:
+    if not os.path.exists(checkpoint_path):
+        return 0, 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != os.path.abspath(source_path):
+        raise ValueError(f"checkpoint {checkpoint_path} belongs to {checkpoint.get('source')}")
+    return checkpoint["offset"], checkpoint["rows"]
+
+
+def _write_checkpoint(checkpoint_path: str, source_path: str, offset: int, rows: int):
+    # Write then rename so a crash never leaves a half-written checkpoint
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": os.path.abspath(source_path), "offset": offset, "rows": rows}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+async def _insert_chunk(conn, table: Table, rows: list[dict]):
+    if conn.dialect.name == "postgresql":
+        # COPY needs one column list for the whole chunk and values already in database form
+        columns = [column for column in table.columns if any(column.name in row for row in rows)]
+        processors = [
+            (lambda value, c=column: c.type.process_bind_param(value, conn.dialect)) if isinstance(column.type, models.SkillList) else None
+            for column in columns
+        ]
+        records = [
+            tuple(process(row.get(column.name)) if process else row.get(column.name) for column, process in zip(columns, processors))
+            for row in rows
+        ]
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=[column.name for column in columns])
+    else:
+        await conn.execute(insert(table), rows)
+
+
+async def _reset_sequence(conn, table: Table):
+    # Rows loaded with explicit ids don't advance the serial sequence on PostgreSQL
+    if conn.dialect.name == "postgresql" and "id" in table.columns:
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce((SELECT max(id) FROM {table.name}), 1))"
+        ))
+
+
+async def bulk_load(table_name: str, path: str, file_format: str | None = None, chunk_size: int = 5000,
+                    checkpoint_path: str | None = None) -> int:
+    table = models.Base.metadata.tables[table_name]
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    checkpoint_path = checkpoint_path or path + ".checkpoint"
+    offset, loaded = _read_checkpoint(checkpoint_path, path)
+    if offset:
+        print(f"resuming {path} at byte {offset} ({loaded} rows already loaded)", file=sys.stderr)
+
+    started = time.perf_counter()
+    loaded_this_run = 0
+
+    async def flush(chunk: list[dict], chunk_end: int):
+        nonlocal loaded, loaded_this_run
+        async with get_engine().begin() as conn:
+            await _insert_chunk(conn, table, chunk)
+        loaded += len(chunk)
+        loaded_this_run += len(chunk)
+        _write_checkpoint(checkpoint_path, path, chunk_end, loaded)
+        elapsed = time.perf_counter() - started
+        print(f"{table_name}: {loaded} rows ({loaded_this_run / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    chunk: list[dict] = []
+    chunk_end = offset
+    for row, chunk_end in _Reader(path, file_format, table).rows(offset):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            await flush(chunk, chunk_end)
+            chunk = []
+    if chunk:
+        await flush(chunk, chunk_end)
+
+    async with get_engine().begin() as conn:
+        await _reset_sequence(conn, table)
+
+    elapsed = time.perf_counter() - started
+    print(f"loaded {loaded_this_run} rows into {table_name} in {elapsed:.1f}s "
+          f"({loaded_this_run / elapsed if elapsed else 0:,.0f} rows/s); {loaded} rows total from {path}")
+    if table_name in ("profiles", "experiences", "education_history"):
+        print("profile snapshots and search documents are now stale: run `python -m app.cli rebuild-snapshots`")
+    if table_name == "experiences":
+        print("experience_skills is not filled by bulk-load: run `python -m app.cli rebuild-skills`")
+    return 0
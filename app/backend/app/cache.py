@@ -0,0 +1,152 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire `ttl` seconds after being set.
+
+    maxsize=0 disables the cache (every get is a miss, set is a no-op).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any, int | None]] = OrderedDict() # expires_at, value, version
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value, _ = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._set(key, value, None)
+
+    def set_versioned(self, key: Hashable, value: Any, version: int) -> None:
+        """Set unless the live entry was set with a higher version (entries from set() have none)."""
+        self._set(key, value, version)
+
+    def _set(self, key: Hashable, value: Any, version: int | None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            expires_at, _, current = self._data.get(key, (0.0, None, None))
+            if version is not None and current is not None and current > version and expires_at > now:
+                return
+            self._data[key] = (now + self.ttl, value, version)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Byte-value cache in a local SQLite file, shared by every worker process on the host.
+
+    Same interface as TTLCache. It stands in for a shared cache server (Redis, memcached)
+    when running locally: values must be bytes, and other processes see sets and deletes.
+    Eviction is oldest-first rather than LRU so reads never write.
+    """
+
+    def __init__(self, path: str, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._sets = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, version INTEGER)")
+        if "version" not in {column[1] for column in self._conn.execute("PRAGMA table_info(cache)")}:
+            self._conn.execute("ALTER TABLE cache ADD COLUMN version INTEGER") # A cache file from before set_versioned
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_expires_at ON cache (expires_at)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        self._set(key, value, None)
+
+    def set_versioned(self, key: str, value: bytes, version: int) -> None:
+        """Set unless the live entry was set with a higher version (entries from set() have none).
+
+        The comparison happens in the upsert, so it holds across the processes sharing the file.
+        """
+        self._set(key, value, version)
+
+    def _set(self, key: str, value: bytes, version: int | None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO cache (key, value, expires_at, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, version = excluded.version "
+                "WHERE excluded.version IS NULL OR cache.version IS NULL OR cache.version <= excluded.version OR cache.expires_at <= ?",
+                (key, value, now + self.ttl, version, now),
+            )
+            self._sets += 1
+            # Trimming needs a count(*), so only do it every few sets; the table may briefly run over maxsize
+            if self._sets % 64 == 0:
+                excess = len(self) - self.maxsize
+                if excess > 0:
+                    self._conn.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT ?)", (excess,))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+
+
+def cache_from_url(url: str, maxsize: int, ttl: float) -> TTLCache | SQLiteCache:
+    """Build a cache backend from a URL: "memory://" or "sqlite:///path/to/cache.db"."""
+    if url.startswith("memory://"):
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):], maxsize=maxsize, ttl=ttl)
+    raise ValueError(f"Unsupported cache URL {url!r}")
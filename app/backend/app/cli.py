@@ -0,0 +1,170 @@
+"""Maintenance commands. Run from app/backend with SUPABASE_DB_URL set:
+
+    python -m app.cli rebuild-snapshots [--batch-size 500]
+    python -m app.cli check-snapshots [--batch-size 500] [--fix]
+    python -m app.cli rebuild-search [--batch-size 500]
+    python -m app.cli rebuild-skills [--batch-size 500]
+    python -m app.cli bulk-load TABLE FILE [--format ndjson|csv] [--chunk-size 5000] [--checkpoint PATH]
+    python -m app.cli export-static OUTPUT_DIR [--workers N] [--batch-size 500] [--full]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from . import bulk_load, crud, models, search, static_export
+from .database import dispose_engine, get_sessionmaker
+
+
+async def _iter_profile_batches(batch_size: int):
+    # Keyset pagination over profile ids so memory stays bounded on large tables
+    last_id = 0
+    while True:
+        async with get_sessionmaker()() as db:
+            profiles = (await db.scalars(
+                select(models.Profile).options(
+                    selectinload(models.Profile.experiences),
+                    selectinload(models.Profile.education_history)
+                ).filter(models.Profile.id > last_id).order_by(models.Profile.id).limit(batch_size)
+            )).all()
+            if not profiles:
+                return
+            yield db, profiles
+            last_id = profiles[-1].id
+
+
+async def rebuild_snapshots(batch_size: int) -> int:
+    rebuilt = 0
+    async for db, profiles in _iter_profile_batches(batch_size):
+        for db_profile in profiles:
+            # Also bumps the version: after a bulk load the rows changed without one
+            await crud.rebuild_profile_snapshot(db, db_profile.id, db_profile=db_profile)
+        await db.commit()
+        for db_profile in profiles:
+            await crud.invalidate_profile_cache(db, db_profile.id, db_profile.handle, version=db_profile.version)
+        rebuilt += len(profiles)
+        print(f"rebuilt {rebuilt} snapshots", file=sys.stderr)
+    return 0
+
+
+async def check_snapshots(batch_size: int, fix: bool) -> int:
+    checked = missing = stale = 0
+    async for db, profiles in _iter_profile_batches(batch_size):
+        snapshots = dict((await db.execute(
+            select(models.ProfileSnapshot.profile_id, models.ProfileSnapshot.body)
+            .filter(models.ProfileSnapshot.profile_id.in_([p.id for p in profiles]))
+        )).all())
+        bad = []
+        for db_profile in profiles:
+            checked += 1
+            body = snapshots.get(db_profile.id)
+            # Compare parsed JSON so that formatting differences don't count
+            if body is None:
+                missing += 1
+            elif json.loads(body) != json.loads(crud.render_profile_json(db_profile)):
+                stale += 1
+            else:
+                continue
+            print(f"profile {db_profile.id} ({db_profile.handle}): {'missing' if body is None else 'stale'}")
+            bad.append(db_profile)
+        if fix and bad:
+            for db_profile in bad:
+                await crud.rebuild_profile_snapshot(db, db_profile.id, db_profile=db_profile)
+            await db.commit()
+            for db_profile in bad:
+                await crud.invalidate_profile_cache(db, db_profile.id, db_profile.handle, version=db_profile.version)
+    print(f"checked {checked} profiles: {missing} missing, {stale} stale{' (fixed)' if fix and missing + stale else ''}")
+    return 1 if missing + stale and not fix else 0
+
+
+async def rebuild_search(batch_size: int) -> int:
+    indexed = 0
+    async for db, profiles in _iter_profile_batches(batch_size):
+        await search.index_profiles(db, profiles)
+        await db.commit()
+        indexed += len(profiles)
+        print(f"indexed {indexed} profiles", file=sys.stderr)
+    async with get_sessionmaker()() as db:
+        await search.optimize_index(db)
+        await db.commit()
+    return 0
+
+
+async def rebuild_skills(batch_size: int) -> int:
+    # Re-derive experience_skills from experiences.skills_used, by keyset over experience ids
+    synced = last_id = 0
+    while True:
+        async with get_sessionmaker()() as db:
+            experiences = (await db.scalars(
+                select(models.Experience).filter(models.Experience.id > last_id).order_by(models.Experience.id).limit(batch_size)
+            )).all()
+            if not experiences:
+                return 0
+            await crud.sync_experience_skills(db, experiences)
+            await db.commit()
+        last_id = experiences[-1].id
+        synced += len(experiences)
+        print(f"synced skills of {synced} experiences", file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-snapshots", help="re-render every public profile snapshot (backfill)")
+    rebuild.add_argument("--batch-size", type=int, default=500)
+
+    check = commands.add_parser("check-snapshots", help="diff stored snapshots against freshly rendered profiles")
+    check.add_argument("--batch-size", type=int, default=500)
+    check.add_argument("--fix", action="store_true", help="rebuild missing or stale snapshots")
+
+    reindex = commands.add_parser("rebuild-search", help="re-index every profile for GET /search (backfill)")
+    reindex.add_argument("--batch-size", type=int, default=500)
+
+    reskill = commands.add_parser("rebuild-skills", help="re-derive experience_skills from experiences.skills_used")
+    reskill.add_argument("--batch-size", type=int, default=500)
+
+    load = commands.add_parser("bulk-load", help="stream an NDJSON or CSV file into a table in chunks (resumable)")
+    load.add_argument("table", choices=bulk_load.TABLES)
+    load.add_argument("file")
+    load.add_argument("--format", choices=bulk_load.FORMATS, help="default: from the file extension (.csv, else ndjson)")
+    load.add_argument("--chunk-size", type=int, default=5000, help="rows per INSERT/COPY and commit")
+    load.add_argument("--checkpoint", help="resume file (default: FILE.checkpoint)")
+
+    export = commands.add_parser("export-static", help="write public profiles as precompressed static files (incremental)")
+    export.add_argument("output_dir")
+    export.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="compression processes (default: one per CPU)")
+    export.add_argument("--batch-size", type=int, default=500, help="profiles read from the database at a time")
+    export.add_argument("--full", action="store_true", help="load every profile, not just those whose version changed (files are still only rewritten if their JSON did)")
+
+    args = parser.parse_args(argv)
+
+    async def run() -> int:
+        try:
+            if args.command == "rebuild-snapshots":
+                return await rebuild_snapshots(args.batch_size)
+            if args.command == "rebuild-search":
+                return await rebuild_search(args.batch_size)
+            if args.command == "rebuild-skills":
+                return await rebuild_skills(args.batch_size)
+            if args.command == "export-static":
+                return await static_export.export_static(args.output_dir, args.workers, args.batch_size, args.full)
+            if args.command == "bulk-load":
+                try:
+                    return await bulk_load.bulk_load(args.table, args.file, args.format, args.chunk_size, args.checkpoint)
+                except ValueError as e: # Bad row or mismatched checkpoint; committed chunks stay loaded
+                    print(f"bulk-load stopped: {e}", file=sys.stderr)
+                    return 1
+            return await check_snapshots(args.batch_size, args.fix)
+        finally:
+            await dispose_engine()
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
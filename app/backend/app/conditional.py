@@ -0,0 +1,66 @@
+"""HTTP validators for profiles (RFC 9110 conditional requests).
+
+A profile's ETag is its id and version, and Last-Modified its updated_at; both
+change with every write to the profile, its experiences or its education (see
+crud.rebuild_profile_snapshot). GETs answer If-None-Match / If-Modified-Since
+with 304, and writes take If-Match for optimistic concurrency: a write based on
+an outdated version is refused with 412 instead of overwriting the newer one.
+"""
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping
+
+_ETAG = re.compile(r'"(\d+)\.(\d+)"')
+
+# /profiles/me/ differs per member, so shared caches must not store it; both are revalidated on every use
+PRIVATE_CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+PUBLIC_CACHE_HEADERS = {"Cache-Control": "no-cache"}
+
+
+def profile_etag(profile_id: int, version: int) -> str:
+    return f'"{profile_id}.{version}"'
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they are stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def validator_headers(profile_id: int, version: int, updated_at: datetime | None) -> dict[str, str]:
+    headers = {"ETag": profile_etag(profile_id, version)}
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(_utc(updated_at), usegmt=True)
+    return headers
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str, updated_at: datetime | None) -> bool:
+    """Whether a GET with these headers can be answered with 304.
+
+    If-None-Match takes precedence over If-Modified-Since, which is only
+    precise to the second.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/"1.2" matches "1.2"
+        return if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or updated_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False # Invalid dates are ignored
+    return _utc(updated_at).replace(microsecond=0) <= _utc(since)
+
+
+def parse_if_match(header: str | None) -> list[tuple[int, int]] | None:
+    """(profile id, version) of each profile ETag in an If-Match header.
+
+    None when there is no header or it is "*" (no precondition to check). Weak
+    and foreign ETags can never match and are dropped, so a list that ends up
+    empty fails the precondition.
+    """
+    if header is None or header.strip() == "*":
+        return None
+    return [(int(match[1]), int(match[2])) for tag in header.split(",") if (match := _ETAG.fullmatch(tag.strip()))]
@@ -1,45 +1,377 @@
-from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import update as sqlalchemy_update # To avoid confusion with schema update models
+import base64
+import binascii
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import Row, distinct, func, literal, or_, select, union_all, delete as sqlalchemy_delete, insert as sqlalchemy_insert, update as sqlalchemy_update # To avoid confusion with schema update models
 from fastapi import HTTPException, status # For raising exceptions
-from . import models, schemas
-from passlib.context import CryptContext
+from . import database, models, schemas, search, serialization
+from .passwords import password_hasher
+from .cache import cache_from_url
+from .handles import handle_filter
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Read-through cache of public profile JSON by handle (see get_public_profile_json).
+# PROFILE_CACHE_URL is "memory://" (per process) or "sqlite:///path" (shared by the workers on a host).
+# Invalidation only reaches the cache it runs against: with "memory://" and several workers, the
+# others keep serving their copy of a changed profile for up to PROFILE_CACHE_TTL seconds.
+profile_cache = cache_from_url(
+    os.environ.get("PROFILE_CACHE_URL", "memory://"),
+    maxsize=int(os.environ.get("PROFILE_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("PROFILE_CACHE_TTL", "300")),
+)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def _profile_cache_key(handle: str) -> str:
+    return f"profile:handle:{handle.lower()}" # Handles resolve case-insensitively
+
+def _handle_matches(handle: str):
+    # Case-insensitive handle filter; served by the unique ix_profiles_handle_lower index
+    return func.lower(models.Profile.handle) == func.lower(handle)
+
+async def invalidate_profile_cache(db: AsyncSession, profile_id: int, *handles: str | None, version: int | None = None) -> None:
+    # Called after the commit of every write that changes what a public profile shows.
+    # Pass the handle(s) when known; otherwise the current handle is looked up. Each key is
+    # overwritten with an empty tombstone at the written version (this session's last write
+    # unless `version` is given) rather than deleted, so a reader that loaded an older version
+    # before the commit can't put it back afterwards: its fill is refused (get_public_profile_json).
+    if not handles:
+        handles = (await db.scalar(select(models.Profile.handle).filter(models.Profile.id == profile_id)),)
+    if version is None and (written := written_profile_version(db)) is not None and written[0] == profile_id:
+        version = written[1]
+    for handle in handles:
+        if handle is not None:
+            if version is None:
+                profile_cache.delete(_profile_cache_key(handle))
+            else:
+                profile_cache.set_versioned(_profile_cache_key(handle), b"", version)
+            # Until replicas have the write, refill the cache from the primary only
+            database.pin_reads(database.handle_pin_key(handle))
+
+# Serializing a profile reads exactly the relationships loaded here. With FORBID_LAZY_LOADS=1
+# any other relationship access raises instead of lazy loading (one query per row: N+1).
+FORBID_LAZY_LOADS = os.environ.get("FORBID_LAZY_LOADS", "").lower() in ("1", "true", "yes")
+
+def _profile_graph() -> tuple:
+    options = (selectinload(models.Profile.experiences), selectinload(models.Profile.education_history))
+    if FORBID_LAZY_LOADS:
+        options += (raiseload("*", sql_only=True),)
+    return options
+
+# --- Profile snapshots ---
+# models.ProfileSnapshot holds the public profile JSON. Every write below rebuilds it before
+# committing, so the public handle endpoint can return it without hydrating the ORM graph.
+def render_profile_json(db_profile: models.Profile) -> str:
+    if serialization.FAST_RESPONSES:
+        return serialization.dumps(serialization.profile_dict(db_profile)).decode()
+    return schemas.Profile.model_validate(db_profile).model_dump_json()
+
+def _dialect_insert(db: AsyncSession, table):
+    # INSERT supporting on_conflict_do_update()/on_conflict_do_nothing() on PostgreSQL and SQLite
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+async def rebuild_profile_snapshot(db: AsyncSession, profile_id: int, db_profile: models.Profile | None = None,
+                                   bump_version: bool = True, if_match: list[tuple[int, int]] | None = None) -> str | None:
+    """Bump a profile's version and re-render its snapshot and search document inside the caller's transaction (call before commit).
+
+    Pass `db_profile` when the caller already holds it with children loaded and up to date, and
+    bump_version=False for a profile created in this transaction. `if_match` holds the (profile id,
+    version) pairs of an If-Match header: unless the profile is still at one of those versions the
+    whole transaction is rolled back with 412. Returns the profile's current handle for cache invalidation.
+    """
+    await db.flush()
+    bump = (
+        sqlalchemy_update(models.Profile).where(models.Profile.id == profile_id)
+        .values(version=models.Profile.version + 1, updated_at=datetime.now(timezone.utc))
+    )
+    if if_match is not None:
+        # Checked in the UPDATE itself, so no other write can slip in between the check and this one
+        bump = bump.where(models.Profile.version.in_([version for etag_profile_id, version in if_match if etag_profile_id == profile_id]))
+    if db_profile is None:
+        # The bump's RETURNING loads the profile (and the selectinloads its children) for rendering
+        db_profile = await db.scalar(bump.returning(models.Profile).options(*_profile_graph()).execution_options(populate_existing=True))
+        if db_profile is None:
+            await _check_precondition(db, if_match)
+            return None
+    elif bump_version:
+        row = (await db.execute(bump.returning(models.Profile.version, models.Profile.updated_at))).first()
+        if row is None:
+            await _check_precondition(db, if_match)
+            return None
+        set_committed_value(db_profile, "version", row.version)
+        set_committed_value(db_profile, "updated_at", row.updated_at)
+    db.info["profile_version"] = (profile_id, db_profile.version, db_profile.updated_at)
+    stmt = _dialect_insert(db, models.ProfileSnapshot).values(profile_id=profile_id, body=render_profile_json(db_profile))
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.ProfileSnapshot.profile_id],
+        set_={"body": stmt.excluded.body},
+    ))
+    # The search document is derived from the same graph, so it is kept in step here too
+    await search.index_profiles(db, [db_profile])
+    return db_profile.handle
+
+async def _check_precondition(db: AsyncSession, if_match: list[tuple[int, int]] | None) -> None:
+    # The bump matched no row: with If-Match, the profile has moved on since the client read it
+    if if_match is not None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Profile was modified; fetch it again and retry")
+
+async def _check_unchanged_precondition(db: AsyncSession, user_id: int, if_match: list[tuple[int, int]] | None) -> None:
+    # An update with nothing to change writes nothing, but an outdated If-Match still fails it
+    if if_match is not None:
+        row = await get_profile_version(db, user_id)
+        if row is not None and (row.id, row.version) not in if_match:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Profile was modified; fetch it again and retry")
+
+def written_profile_version(db: AsyncSession) -> tuple[int, int, datetime | None] | None:
+    # (profile id, version, updated_at) left by this session's last write, for the response's ETag
+    return db.info.get("profile_version")
+
+class PublicProfile(NamedTuple):
+    body: bytes # Serialized schemas.Profile
+    profile_id: int
+    version: int
+    updated_at: datetime | None
+
+async def get_profile_snapshot_by_handle(db: AsyncSession, handle: str) -> Row | None:
+    # (body, profile id, version, updated_at) of the stored snapshot
+    return (await db.execute(
+        select(models.ProfileSnapshot.body, models.Profile.id, models.Profile.version, models.Profile.updated_at)
+        .join(models.Profile, models.Profile.id == models.ProfileSnapshot.profile_id)
+        .filter(_handle_matches(handle))
+    )).first()
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # Returns (is_valid, new_hash); new_hash is set when the stored hash uses an outdated bcrypt cost
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
 
 # --- User CRUD ---
-def get_user(db: Session, user_id: int) -> models.User | None:
-    return db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int) -> models.User | None:
+    return await db.scalar(select(models.User).filter(models.User.id == user_id))
 
-def get_user_by_email(db: Session, email: str) -> models.User | None:
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> models.User | None:
+    return await db.scalar(select(models.User).filter(models.User.email == email))
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
+    hashed_password = await get_password_hash(user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    return db_user
+
+async def create_user_with_profile(db: AsyncSession, user: schemas.UserCreate) -> models.User | None:
+    """Create a user and their empty profile in one transaction.
+
+    Returns None if the email is already registered. The email check is the INSERT itself
+    (ON CONFLICT DO NOTHING), so there is no window between checking and inserting.
+    """
+    hashed_password = await get_password_hash(user.password) # Before the transaction opens
+    try:
+        db_user = await db.scalar(
+            _dialect_insert(db, models.User)
+            .values(email=user.email, hashed_password=hashed_password)
+            .on_conflict_do_nothing(index_elements=[models.User.email])
+            .returning(models.User)
+        )
+        if db_user is None:
+            await db.rollback()
+            return None
+        db_profile = await _insert_profile_if_missing(db, user_id=db_user.id)
+        await rebuild_profile_snapshot(db, db_profile.id, db_profile=db_profile, bump_version=False)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account could not be created")
+    return db_user
+
+async def update_user_password_hash(db: AsyncSession, db_user: models.User, hashed_password: str) -> models.User:
+    db_user.hashed_password = hashed_password
+    db.add(db_user)
+    await db.commit()
     return db_user
 
 # --- Profile CRUD ---
-def get_profile_by_user_id(db: Session, user_id: int) -> models.Profile | None:
-    return db.query(models.Profile).options(
-        selectinload(models.Profile.experiences),
-        selectinload(models.Profile.education_history)
-    ).filter(models.Profile.user_id == user_id).first()
-
-def get_profile_by_handle(db: Session, handle: str) -> models.Profile | None:
-    return db.query(models.Profile).options(
-        selectinload(models.Profile.experiences),
-        selectinload(models.Profile.education_history)
-    ).filter(models.Profile.handle == handle).first()
-
-def create_user_profile(db: Session, profile_data: schemas.ProfileCreate, user_id: int) -> models.Profile:
+async def get_profile_id_by_user_id(db: AsyncSession, user_id: int) -> int | None:
+    return await db.scalar(select(models.Profile.id).filter(models.Profile.user_id == user_id))
+
+async def get_profile_by_user_id(db: AsyncSession, user_id: int) -> models.Profile | None:
+    return await db.scalar(select(models.Profile).options(*_profile_graph()).filter(models.Profile.user_id == user_id))
+
+async def get_profile_by_handle(db: AsyncSession, handle: str) -> models.Profile | None:
+    return await db.scalar(select(models.Profile).options(*_profile_graph()).filter(_handle_matches(handle)))
+
+async def get_profiles_by_handles(db: AsyncSession, handles: list[str]) -> list[models.Profile]:
+    # Handles exactly as stored (e.g. from a scan of profiles.handle); one query for all, not one each
+    return (await db.scalars(select(models.Profile).options(*_profile_graph()).filter(models.Profile.handle.in_(handles)))).all()
+
+async def get_public_profile_json(db: AsyncSession, handle: str) -> PublicProfile | None:
+    # Serialized schemas.Profile for a handle with its version: profile_cache, then the stored snapshot
+    key = _profile_cache_key(handle)
+    cached = profile_cache.get(key)
+    if cached: # Not a miss, nor a tombstone left by invalidate_profile_cache
+        return _unpack_public_profile(cached)
+    snapshot = await get_profile_snapshot_by_handle(db, handle=handle)
+    if snapshot is not None:
+        profile = PublicProfile(snapshot.body.encode(), snapshot.id, snapshot.version, snapshot.updated_at)
+    else:
+        # No snapshot yet (e.g. rows created before snapshots existed): render from the ORM graph
+        db_profile = await get_profile_by_handle(db, handle=handle)
+        if db_profile is None:
+            return None
+        profile = PublicProfile(render_profile_json(db_profile).encode(), db_profile.id, db_profile.version, db_profile.updated_at)
+    # Refused if a write committed since this read left a newer version's tombstone
+    profile_cache.set_versioned(key, _pack_public_profile(profile), profile.version)
+    return profile
+
+def _pack_public_profile(profile: PublicProfile) -> bytes:
+    # Cache values are bytes (the SQLite backend stores blobs): a header line, then the JSON
+    updated_at = profile.updated_at.isoformat() if profile.updated_at is not None else ""
+    return f"{profile.profile_id} {profile.version} {updated_at}\n".encode() + profile.body
+
+def _unpack_public_profile(data: bytes) -> PublicProfile:
+    header, body = data.split(b"\n", 1)
+    profile_id, version, updated_at = header.decode().split(" ")
+    return PublicProfile(body, int(profile_id), int(version), datetime.fromisoformat(updated_at) if updated_at else None)
+
+async def get_profile_version(db: AsyncSession, user_id: int) -> Row | None:
+    # (id, version, updated_at) of a member's profile, to revalidate without loading the children
+    return (await db.execute(
+        select(models.Profile.id, models.Profile.version, models.Profile.updated_at).filter(models.Profile.user_id == user_id)
+    )).first()
+
+# --- Profile directory ---
+# Keyset pagination on the unique handle index: each page is an index seek past the last
+# handle of the previous page, so page 10,000 costs the same as page 1 (OFFSET would scan
+# every skipped row). Cursors are opaque to clients so the ordering can change later.
+DIRECTORY_MAX_PAGE_SIZE = int(os.environ.get("DIRECTORY_MAX_PAGE_SIZE", "100"))
+
+def _encode_cursor(value: str) -> str:
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _decode_offset_cursor(cursor: str | None) -> int:
+    # Cursor of the ranked listings (search, skills), which page by offset
+    if cursor is None:
+        return 0
+    try:
+        offset = int(_decode_cursor(cursor))
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return offset
+
+async def get_profile_directory_page(db: AsyncSession, limit: int, cursor: str | None = None) -> schemas.ProfileCardPage:
+    stmt = select(models.Profile.handle, models.Profile.full_name, models.Profile.profile_picture_url).filter(
+        models.Profile.handle.isnot(None) # Profiles without a handle have no public page
+    )
+    if cursor is not None:
+        stmt = stmt.filter(models.Profile.handle > _decode_cursor(cursor))
+    # One extra row tells whether there is a next page without a COUNT
+    rows = (await db.execute(stmt.order_by(models.Profile.handle).limit(limit + 1))).all()
+    next_cursor = _encode_cursor(rows[limit - 1].handle) if len(rows) > limit else None
+    return schemas.ProfileCardPage(
+        items=[schemas.ProfileCard.model_validate(row) for row in rows[:limit]],
+        next_cursor=next_cursor,
+    )
+
+# --- Search ---
+# Ranked results can't be keyset-paginated on a stable column, so the cursor carries an
+# offset. SEARCH_MAX_RESULTS bounds how deep paging goes (and so the cost of OFFSET).
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "1000"))
+
+async def search_profiles(db: AsyncSession, query: str, limit: int, cursor: str | None = None) -> schemas.ProfileCardPage:
+    tokens = search.query_tokens(query)
+    if not tokens:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search query has no words")
+    offset = _decode_offset_cursor(cursor)
+    limit = max(0, min(limit, SEARCH_MAX_RESULTS - offset))
+    rows = await search.search_profile_cards(db, tokens, limit=limit + 1, offset=offset) if limit else []
+    next_offset = offset + limit
+    return schemas.ProfileCardPage(
+        items=[schemas.ProfileCard.model_validate(row) for row in rows[:limit]],
+        next_cursor=_encode_cursor(str(next_offset)) if len(rows) > limit and next_offset < SEARCH_MAX_RESULTS else None,
+    )
+
+# --- Skills ---
+# models.ExperienceSkill mirrors Experience.skills_used in normalized form. Every write that
+# sets skills_used calls sync_experience_skills() before committing; the skill search below
+# only reads the posting lists of the requested skills.
+def canonical_skill_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+async def sync_experience_skills(db: AsyncSession, experiences: list[models.Experience], replace: bool = True) -> None:
+    """Rewrite the experience_skills rows of `experiences` from their skills_used (call before commit)."""
+    await db.flush() # New experiences need their ids
+    if replace:
+        await db.execute(sqlalchemy_delete(models.ExperienceSkill).where(
+            models.ExperienceSkill.experience_id.in_([e.id for e in experiences])))
+    names = {e.id: {canonical_skill_name(n) for n in e.skills_used or [] if n.strip()} for e in experiences}
+    all_names = set().union(*names.values())
+    if not all_names:
+        return
+    skills = models.Skill.__table__
+    await db.execute(_dialect_insert(db, skills).on_conflict_do_nothing(index_elements=[skills.c.name]), [{"name": n} for n in all_names])
+    skill_ids = dict((await db.execute(select(models.Skill.name, models.Skill.id).filter(models.Skill.name.in_(all_names)))).all())
+    await db.execute(sqlalchemy_insert(models.ExperienceSkill.__table__), [
+        {"experience_id": e.id, "skill_id": skill_ids[name], "profile_id": e.profile_id} for e in experiences for name in names[e.id]
+    ])
+
+async def find_profiles_by_skills(db: AsyncSession, skills: list[str], match_all: bool, limit: int, cursor: str | None = None) -> schemas.SkillMatchPage:
+    names = {canonical_skill_name(s) for s in skills if s.strip()}
+    if not names:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No skills given")
+    offset = _decode_offset_cursor(cursor)
+    skill_ids = (await db.scalars(select(models.Skill.id).filter(models.Skill.name.in_(names)))).all()
+    if not skill_ids or (match_all and len(skill_ids) < len(names)):
+        return schemas.SkillMatchPage(items=[], total=0) # Some skill is unknown, so nobody has all of them
+
+    # Union (any-of) or intersection (all-of) of the posting lists: reads only the
+    # (skill_id, profile_id) index entries of these skills, whatever the table size
+    matched = func.count(distinct(models.ExperienceSkill.skill_id)).label("matched_skills")
+    postings = select(models.ExperienceSkill.profile_id, matched).filter(
+        models.ExperienceSkill.skill_id.in_(skill_ids)).group_by(models.ExperienceSkill.profile_id)
+    if match_all:
+        postings = postings.having(matched == len(skill_ids))
+    postings = postings.subquery()
+    stmt = select(
+        models.Profile.handle, models.Profile.full_name, models.Profile.profile_picture_url, postings.c.matched_skills
+    ).join(postings, models.Profile.id == postings.c.profile_id).filter(models.Profile.handle.isnot(None))
+
+    total = await db.scalar(select(func.count()).select_from(stmt.subquery()))
+    rows = (await db.execute(
+        stmt.order_by(postings.c.matched_skills.desc(), models.Profile.id).offset(offset).limit(limit + 1)
+    )).all()
+    return schemas.SkillMatchPage(
+        items=[schemas.SkillMatch.model_validate(row) for row in rows[:limit]],
+        total=total,
+        next_cursor=_encode_cursor(str(offset + limit)) if len(rows) > limit else None,
+    )
+
+async def is_handle_available(db: AsyncSession, handle: str) -> bool:
+    # Most free handles are answered by handle_filter alone; possible hits are confirmed in the DB
+    if not handle_filter.might_be_taken(handle):
+        return True
+    handle_filter.database_checks += 1
+    return await db.scalar(select(models.Profile.id).filter(_handle_matches(handle))) is None
+
+async def create_user_profile(db: AsyncSession, profile_data: schemas.ProfileCreate, user_id: int) -> models.Profile:
     if profile_data.handle:
-        existing_handle = db.query(models.Profile).filter(models.Profile.handle == profile_data.handle).first()
+        existing_handle = await db.scalar(select(models.Profile.id).filter(_handle_matches(profile_data.handle)))
         if existing_handle:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Handle already taken")
 
@@ -48,94 +380,361 @@ def create_user_profile(db: Session, profile_data: schemas.ProfileCreate, user_i
     if 'full_name' not in profile_dict:
         profile_dict['full_name'] = None
 
-    db_profile = models.Profile(**profile_dict, user_id=user_id)
+    # Start with empty collections so the new profile can be serialized without a lazy load
+    db_profile = models.Profile(**profile_dict, user_id=user_id, experiences=[], education_history=[])
     db.add(db_profile)
-    db.commit()
-    db.refresh(db_profile)
+    await db.flush()
+    await rebuild_profile_snapshot(db, db_profile.id, db_profile=db_profile, bump_version=False)
+    await db.commit()
+    handle_filter.add(db_profile.handle)
     return db_profile
 
-def update_user_profile(db: Session, profile_data: schemas.ProfileUpdate, existing_profile: models.Profile) -> models.Profile:
+async def update_user_profile(db: AsyncSession, profile_data: schemas.ProfileUpdate, existing_profile: models.Profile, if_match: list[tuple[int, int]] | None = None) -> models.Profile:
     update_data = profile_data.model_dump(exclude_unset=True)
 
     if "handle" in update_data and update_data["handle"] != existing_profile.handle:
         if update_data["handle"] is not None: # Allow unsetting handle to None
-            existing_handle = db.query(models.Profile).filter(
-                models.Profile.handle == update_data["handle"],
-                models.Profile.id != existing_profile.id
-            ).first()
+            existing_handle = await db.scalar(select(models.Profile.id).filter(
+                _handle_matches(update_data["handle"]),
+                models.Profile.id != existing_profile.id # Changing only the case of your own handle is fine
+            ))
             if existing_handle:
                 raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Handle already taken")
 
+    old_handle = existing_profile.handle
     for key, value in update_data.items():
         setattr(existing_profile, key, value)
 
     db.add(existing_profile) # Add to session to track changes
-    db.commit()
-    db.refresh(existing_profile)
+    try:
+        await rebuild_profile_snapshot(db, existing_profile.id, db_profile=existing_profile, if_match=if_match)
+        await db.commit()
+    except IntegrityError: # Lost a race for the same handle after the check above
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Handle already taken")
+    handle_filter.add(existing_profile.handle)
+    await invalidate_profile_cache(db, existing_profile.id, old_handle, existing_profile.handle) # Evicts the old key on renames
     return existing_profile
 
-def get_or_create_profile(db: Session, user_id: int) -> models.Profile:
-    profile = get_profile_by_user_id(db, user_id=user_id)
+async def _insert_profile_if_missing(db: AsyncSession, user_id: int) -> models.Profile | None:
+    # INSERT ... ON CONFLICT (user_id) DO NOTHING RETURNING: None if the user already has a profile
+    db_profile = await db.scalar(
+        _dialect_insert(db, models.Profile)
+        .values(user_id=user_id, full_name=None)
+        .on_conflict_do_nothing(index_elements=[models.Profile.user_id])
+        .returning(models.Profile)
+    )
+    if db_profile is not None:
+        # A new profile has no children; mark them loaded so serializing it needs no lazy load
+        set_committed_value(db_profile, "experiences", [])
+        set_committed_value(db_profile, "education_history", [])
+    return db_profile
+
+async def get_or_create_profile(db: AsyncSession, user_id: int) -> models.Profile:
+    # Existing profiles (the common case) cost one SELECT (+ selectinloads). Creation is an upsert,
+    # so concurrent first requests for the same user don't collide on profiles.user_id.
+    profile = await get_profile_by_user_id(db, user_id=user_id)
     if not profile:
-        profile = create_user_profile(db, profile_data=schemas.ProfileCreate(), user_id=user_id)
+        profile = await _insert_profile_if_missing(db, user_id=user_id)
+        if profile is None: # A concurrent request created it first
+            await db.rollback()
+            return await get_profile_by_user_id(db, user_id=user_id)
+        await rebuild_profile_snapshot(db, profile.id, db_profile=profile, bump_version=False)
+        await db.commit()
     return profile
 
+def _owned_profile_id(user_id: int):
+    # Scalar subquery for the caller's profile id, so ownership is checked in the same statement
+    return select(models.Profile.id).filter(models.Profile.user_id == user_id).scalar_subquery()
+
 # --- Experience CRUD ---
-def create_profile_experience(db: Session, experience: schemas.ExperienceCreate, profile_id: int) -> models.Experience:
+async def create_profile_experience(db: AsyncSession, experience: schemas.ExperienceCreate, profile_id: int) -> models.Experience:
     db_experience = models.Experience(**experience.model_dump(), profile_id=profile_id)
     db.add(db_experience)
-    db.commit()
-    db.refresh(db_experience)
+    await sync_experience_skills(db, [db_experience], replace=False)
+    handle = await rebuild_profile_snapshot(db, profile_id)
+    await db.commit()
+    await invalidate_profile_cache(db, profile_id, handle)
     return db_experience
 
-def get_experience(db: Session, experience_id: int, profile_id: int) -> models.Experience | None:
-    return db.query(models.Experience).filter(
+async def create_profile_experiences(db: AsyncSession, experiences: list[schemas.ExperienceCreate], profile_id: int) -> list[models.Experience]:
+    # One multi-row INSERT ... RETURNING for the whole batch, one commit
+    db_experiences = (await db.scalars(
+        sqlalchemy_insert(models.Experience).returning(models.Experience, sort_by_parameter_order=True),
+        [dict(experience.model_dump(), profile_id=profile_id) for experience in experiences],
+    )).all()
+    await sync_experience_skills(db, db_experiences, replace=False)
+    handle = await rebuild_profile_snapshot(db, profile_id)
+    await db.commit()
+    await invalidate_profile_cache(db, profile_id, handle)
+    return db_experiences
+
+async def get_experience(db: AsyncSession, experience_id: int, profile_id: int) -> models.Experience | None:
+    return await db.scalar(select(models.Experience).filter(
         models.Experience.id == experience_id,
         models.Experience.profile_id == profile_id # Ensure it belongs to the correct profile
-    ).first()
+    ))
 
-def update_profile_experience(db: Session, experience_data: schemas.ExperienceUpdate, db_experience: models.Experience) -> models.Experience:
+async def update_profile_experience(db: AsyncSession, experience_data: schemas.ExperienceUpdate, db_experience: models.Experience) -> models.Experience:
     update_data = experience_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_experience, key, value)
     db.add(db_experience)
-    db.commit()
-    db.refresh(db_experience)
+    if "skills_used" in update_data:
+        await sync_experience_skills(db, [db_experience])
+    handle = await rebuild_profile_snapshot(db, db_experience.profile_id)
+    await db.commit()
+    await invalidate_profile_cache(db, db_experience.profile_id, handle)
     return db_experience
 
-def delete_profile_experience(db: Session, experience_id: int, profile_id: int) -> models.Experience | None:
-    db_experience = get_experience(db, experience_id=experience_id, profile_id=profile_id)
+async def delete_profile_experience(db: AsyncSession, experience_id: int, profile_id: int) -> models.Experience | None:
+    # One DELETE ... RETURNING instead of SELECT + DELETE
+    db_experience = await db.scalar(
+        sqlalchemy_delete(models.Experience)
+        .where(models.Experience.id == experience_id, models.Experience.profile_id == profile_id)
+        .returning(models.Experience)
+    )
     if db_experience:
-        db.delete(db_experience)
-        db.commit()
+        await _delete_experience_skills(db, [experience_id])
+        handle = await rebuild_profile_snapshot(db, profile_id)
+        await db.commit()
+        await invalidate_profile_cache(db, profile_id, handle)
     return db_experience # Returns the deleted object, or None if not found
 
+# Lean variants for the /profiles/me/experiences/{id} endpoints: ownership is checked through
+# profiles.user_id in the same statement instead of loading the whole profile first.
+async def get_user_experience(db: AsyncSession, experience_id: int, user_id: int) -> models.Experience | None:
+    return await db.scalar(select(models.Experience).filter(
+        models.Experience.id == experience_id,
+        models.Experience.profile_id == _owned_profile_id(user_id)
+    ))
+
+async def update_user_experience(db: AsyncSession, experience_id: int, user_id: int, experience_data: schemas.ExperienceUpdate, if_match: list[tuple[int, int]] | None = None) -> models.Experience | None:
+    update_data = experience_data.model_dump(exclude_unset=True)
+    if not update_data:
+        await _check_unchanged_precondition(db, user_id, if_match)
+        return await get_user_experience(db, experience_id=experience_id, user_id=user_id)
+    db_experience = await db.scalar(
+        sqlalchemy_update(models.Experience)
+        .where(models.Experience.id == experience_id, models.Experience.profile_id == _owned_profile_id(user_id))
+        .values(**update_data)
+        .returning(models.Experience)
+        .execution_options(populate_existing=True)
+    )
+    if db_experience is None:
+        return None
+    if "skills_used" in update_data:
+        await sync_experience_skills(db, [db_experience])
+    handle = await rebuild_profile_snapshot(db, db_experience.profile_id, if_match=if_match)
+    await db.commit()
+    await invalidate_profile_cache(db, db_experience.profile_id, handle)
+    return db_experience
+
+async def delete_user_experience(db: AsyncSession, experience_id: int, user_id: int, if_match: list[tuple[int, int]] | None = None) -> int | None:
+    # Returns the id of the deleted experience, or None if not found / not owned
+    row = (await db.execute(
+        sqlalchemy_delete(models.Experience)
+        .where(models.Experience.id == experience_id, models.Experience.profile_id == _owned_profile_id(user_id))
+        .returning(models.Experience.id, models.Experience.profile_id)
+    )).first()
+    if row is None:
+        return None
+    await _delete_experience_skills(db, [row.id])
+    handle = await rebuild_profile_snapshot(db, row.profile_id, if_match=if_match)
+    await db.commit()
+    await invalidate_profile_cache(db, row.profile_id, handle)
+    return row.id
+
+async def _delete_experience_skills(db: AsyncSession, experience_ids: list[int] | set[int]) -> None:
+    # The FK cascade covers PostgreSQL; SQLite doesn't enforce foreign keys by default
+    await db.execute(sqlalchemy_delete(models.ExperienceSkill).where(models.ExperienceSkill.experience_id.in_(experience_ids)))
+
 # --- Education CRUD ---
-def create_profile_education(db: Session, education: schemas.EducationCreate, profile_id: int) -> models.Education:
+async def create_profile_education(db: AsyncSession, education: schemas.EducationCreate, profile_id: int) -> models.Education:
     db_education = models.Education(**education.model_dump(), profile_id=profile_id)
     db.add(db_education)
-    db.commit()
-    db.refresh(db_education)
+    handle = await rebuild_profile_snapshot(db, profile_id)
+    await db.commit()
+    await invalidate_profile_cache(db, profile_id, handle)
     return db_education
 
-def get_education_item(db: Session, education_id: int, profile_id: int) -> models.Education | None:
-    return db.query(models.Education).filter(
+async def create_profile_education_batch(db: AsyncSession, education_items: list[schemas.EducationCreate], profile_id: int) -> list[models.Education]:
+    # One multi-row INSERT ... RETURNING for the whole batch, one commit
+    db_education_items = (await db.scalars(
+        sqlalchemy_insert(models.Education).returning(models.Education, sort_by_parameter_order=True),
+        [dict(education.model_dump(), profile_id=profile_id) for education in education_items],
+    )).all()
+    handle = await rebuild_profile_snapshot(db, profile_id)
+    await db.commit()
+    await invalidate_profile_cache(db, profile_id, handle)
+    return db_education_items
+
+async def get_education_item(db: AsyncSession, education_id: int, profile_id: int) -> models.Education | None:
+    return await db.scalar(select(models.Education).filter(
         models.Education.id == education_id,
         models.Education.profile_id == profile_id
-    ).first()
+    ))
 
-def update_profile_education(db: Session, education_data: schemas.EducationUpdate, db_education: models.Education) -> models.Education:
+async def update_profile_education(db: AsyncSession, education_data: schemas.EducationUpdate, db_education: models.Education) -> models.Education:
     update_data = education_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_education, key, value)
     db.add(db_education)
-    db.commit()
-    db.refresh(db_education)
+    handle = await rebuild_profile_snapshot(db, db_education.profile_id)
+    await db.commit()
+    await invalidate_profile_cache(db, db_education.profile_id, handle)
     return db_education
 
-def delete_profile_education(db: Session, education_id: int, profile_id: int) -> models.Education | None:
-    db_education = get_education_item(db, education_id=education_id, profile_id=profile_id)
+async def delete_profile_education(db: AsyncSession, education_id: int, profile_id: int) -> models.Education | None:
+    # One DELETE ... RETURNING instead of SELECT + DELETE
+    db_education = await db.scalar(
+        sqlalchemy_delete(models.Education)
+        .where(models.Education.id == education_id, models.Education.profile_id == profile_id)
+        .returning(models.Education)
+    )
     if db_education:
-        db.delete(db_education)
-        db.commit()
+        handle = await rebuild_profile_snapshot(db, profile_id)
+        await db.commit()
+        await invalidate_profile_cache(db, profile_id, handle)
     return db_education # Returns the deleted object, or None if not found
+
+# Lean variants for the /profiles/me/education/{id} endpoints (see get_user_experience)
+async def get_user_education_item(db: AsyncSession, education_id: int, user_id: int) -> models.Education | None:
+    return await db.scalar(select(models.Education).filter(
+        models.Education.id == education_id,
+        models.Education.profile_id == _owned_profile_id(user_id)
+    ))
+
+async def update_user_education(db: AsyncSession, education_id: int, user_id: int, education_data: schemas.EducationUpdate, if_match: list[tuple[int, int]] | None = None) -> models.Education | None:
+    update_data = education_data.model_dump(exclude_unset=True)
+    if not update_data:
+        await _check_unchanged_precondition(db, user_id, if_match)
+        return await get_user_education_item(db, education_id=education_id, user_id=user_id)
+    db_education = await db.scalar(
+        sqlalchemy_update(models.Education)
+        .where(models.Education.id == education_id, models.Education.profile_id == _owned_profile_id(user_id))
+        .values(**update_data)
+        .returning(models.Education)
+        .execution_options(populate_existing=True)
+    )
+    if db_education is None:
+        return None
+    handle = await rebuild_profile_snapshot(db, db_education.profile_id, if_match=if_match)
+    await db.commit()
+    await invalidate_profile_cache(db, db_education.profile_id, handle)
+    return db_education
+
+async def delete_user_education(db: AsyncSession, education_id: int, user_id: int, if_match: list[tuple[int, int]] | None = None) -> int | None:
+    # Returns the id of the deleted education item, or None if not found / not owned
+    row = (await db.execute(
+        sqlalchemy_delete(models.Education)
+        .where(models.Education.id == education_id, models.Education.profile_id == _owned_profile_id(user_id))
+        .returning(models.Education.id, models.Education.profile_id)
+    )).first()
+    if row is None:
+        return None
+    handle = await rebuild_profile_snapshot(db, row.profile_id, if_match=if_match)
+    await db.commit()
+    await invalidate_profile_cache(db, row.profile_id, handle)
+    return row.id
+
+# --- Profile batch ---
+# PATCH /profiles/me/batch applies one editor save (profile fields, experiences, education) in a single
+# transaction. Operations are grouped per kind, so a save costs the same statements however many
+# items it touches: bulk UPDATEs add one statement per distinct set of changed fields.
+def _is_handle_conflict(error: IntegrityError) -> bool:
+    # A unique violation on profiles.handle (SQLite names the column) or its indexes (PostgreSQL names those)
+    message = str(error.orig)
+    return "ix_profiles_handle" in message or "profiles.handle" in message
+
+class _ItemChanges(NamedTuple):
+    model: type
+    creates: list[dict]
+    updates: dict[int, dict] # id -> changed fields, later operations on the same id winning
+    deletes: set[int]
+
+async def apply_profile_batch(db: AsyncSession, profile_id: int, operations: list[schemas.ProfileBatchOperation],
+                              if_match: list[tuple[int, int]] | None = None) -> models.Profile:
+    """Apply `operations` to the profile and its items, all or nothing; returns the profile with its children.
+
+    An item that doesn't exist or belongs to another profile fails the batch with 404, and a taken
+    handle with 409, before anything is written. An outdated If-Match fails it with 412.
+    """
+    profile_data: dict = {}
+    items = {"experience": _ItemChanges(models.Experience, [], {}, set()), "education": _ItemChanges(models.Education, [], {}, set())}
+    for operation in operations:
+        if operation.op == "update_profile":
+            profile_data.update(operation.data.model_dump(exclude_unset=True))
+            continue
+        action, kind = operation.op.split("_", 1)
+        changes = items[kind]
+        if action == "create":
+            changes.creates.append(dict(operation.data.model_dump(), profile_id=profile_id))
+        elif action == "update":
+            changes.updates.setdefault(operation.id, {}).update(operation.data.model_dump(exclude_unset=True))
+        else:
+            changes.deletes.add(operation.id)
+    for kind, changes in items.items():
+        if both := changes.updates.keys() & changes.deletes:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{kind.capitalize()} {min(both)} is both updated and deleted")
+
+    # One ownership check for every item the batch refers to
+    owned_queries = [
+        select(literal(kind).label("kind"), changes.model.id).filter(changes.model.id.in_(ids), changes.model.profile_id == profile_id)
+        for kind, changes in items.items() if (ids := changes.updates.keys() | changes.deletes)
+    ]
+    if owned_queries:
+        owned = set((await db.execute(union_all(*owned_queries) if len(owned_queries) > 1 else owned_queries[0])).all())
+        for kind, changes in items.items():
+            for item_id in sorted(changes.updates.keys() | changes.deletes):
+                if (kind, item_id) not in owned:
+                    raise HTTPException(status_code=404, detail=f"{kind.capitalize()} {item_id} not found or not owned by user")
+
+    old_handle = None
+    if "handle" in profile_data:
+        # The current handle (evicted from the cache below) and any other profile holding the new one, in one query
+        condition = models.Profile.id == profile_id
+        if profile_data["handle"] is not None:
+            condition = or_(condition, _handle_matches(profile_data["handle"]))
+        for row_id, handle in (await db.execute(select(models.Profile.id, models.Profile.handle).filter(condition))).all():
+            if row_id != profile_id:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Handle already taken")
+            old_handle = handle
+
+    try:
+        if profile_data:
+            await db.execute(sqlalchemy_update(models.Profile).where(models.Profile.id == profile_id).values(**profile_data))
+        resync_skills = set() # Experiences whose skills_used was set
+        for kind, changes in items.items():
+            model = changes.model
+            if updates := [dict(values, id=item_id) for item_id, values in changes.updates.items() if values]:
+                await db.execute(sqlalchemy_update(model), updates) # ORM bulk UPDATE by primary key
+                if model is models.Experience:
+                    resync_skills.update(update["id"] for update in updates if "skills_used" in update)
+            if changes.deletes:
+                if model is models.Experience:
+                    await _delete_experience_skills(db, changes.deletes)
+                await db.execute(sqlalchemy_delete(model).where(model.id.in_(changes.deletes)))
+            if changes.creates:
+                created_ids = (await db.scalars(sqlalchemy_insert(model).returning(model.id, sort_by_parameter_order=True), changes.creates)).all()
+                if model is models.Experience:
+                    resync_skills.update(created_ids)
+        # Loaded after the writes, so the returned profile and its snapshot show them
+        db_profile = await db.scalar(select(models.Profile).options(*_profile_graph()).filter(models.Profile.id == profile_id)
+                                     .execution_options(populate_existing=True))
+        if db_profile is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        handle = await rebuild_profile_snapshot(db, profile_id, db_profile=db_profile, if_match=if_match)
+        if resync_skills:
+            await sync_experience_skills(db, [e for e in db_profile.experiences if e.id in resync_skills])
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        if not _is_handle_conflict(error):
+            raise
+        # Lost a race for the same handle after the check above
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Handle already taken")
+    if "handle" in profile_data:
+        handle_filter.add(handle)
+    await invalidate_profile_cache(db, profile_id, old_handle, handle)
+    return db_profile
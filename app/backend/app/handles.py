@@ -0,0 +1,157 @@
+"""In-memory filter of taken profile handles for GET /handles/{handle}/available.
+
+A signup form checks availability on every keystroke, and nearly every prefix typed
+is free. The Bloom filter answers "definitely free" for those without a query; only
+handles it reports as possibly taken (taken ones, plus ~HANDLE_FILTER_FP_RATE of the
+free ones) are checked against the database, so "taken" is always confirmed.
+
+"Available" can be out of date, though. Handles are compared lower-cased. This process
+adds every handle it writes as soon as the write commits. Handles written by other
+workers are added by a task started in the app's lifespan (keep_current), off the
+request path: every HANDLE_FILTER_REFRESH seconds it reads the profiles written since
+its last pass (an index range scan on updated_at), and every HANDLE_FILTER_TTL seconds
+it rebuilds the whole filter. Until the refresh such a handle may be reported as
+available, and the write that tries to take it still gets a 409. The rebuild drops
+released handles (until then one only costs a query) and picks up rows the refresh
+can't see: a COPY bulk-load on PostgreSQL leaves updated_at NULL unless the file has
+it. Until the first build, every check queries.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 10000
+# Read again by each refresh: covers transactions still in flight at the last one and clock skew between workers
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from the two halves of one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class HandleFilter:
+    def __init__(self, ttl: float, refresh_interval: float, error_rate: float):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.error_rate = error_rate
+        self.checks = 0
+        self.database_checks = 0
+        self._bloom: BloomFilter | None = None
+        self._written_since: datetime | None = None # Start of the last build or refresh
+        self._lock = asyncio.Lock()
+        self._rebuilding = False
+        self._added_during_rebuild: list[str] = []
+
+    @staticmethod
+    def key(handle: str) -> str:
+        return handle.lower()
+
+    def add(self, handle: str | None) -> None:
+        if handle is None:
+            return
+        if self._bloom is not None:
+            self._bloom.add(self.key(handle))
+        if self._rebuilding:
+            self._added_during_rebuild.append(self.key(handle)) # May be missing from the filter being built
+
+    def might_be_taken(self, handle: str) -> bool:
+        self.checks += 1
+        return self._bloom is None or self.key(handle) in self._bloom
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Add the handles written (by any worker) since the last build or refresh; a no-op before the first build."""
+        async with self._lock:
+            if self._bloom is None:
+                return
+            started = datetime.now(timezone.utc)
+            handles = (await db.scalars(select(models.Profile.handle).filter(
+                models.Profile.updated_at > self._written_since - REFRESH_OVERLAP, models.Profile.handle.isnot(None)
+            ))).all()
+            for handle in handles:
+                self._bloom.add(self.key(handle))
+            self._written_since = started
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Build the filter from every taken handle, replacing the current one."""
+        async with self._lock:
+            self._rebuilding = True
+            try:
+                started = datetime.now(timezone.utc)
+                count = await db.scalar(select(func.count()).select_from(models.Profile).filter(models.Profile.handle.isnot(None)))
+                # Headroom for handles added before the next rebuild
+                bloom = BloomFilter(capacity=count * 2 + 1000, error_rate=self.error_rate)
+                last_handle = ""
+                while True: # Keyset batches over the handle index keep memory bounded
+                    handles = (await db.scalars(
+                        select(models.Profile.handle).filter(models.Profile.handle > last_handle)
+                        .order_by(models.Profile.handle).limit(LOAD_BATCH_SIZE)
+                    )).all()
+                    if not handles:
+                        break
+                    for handle in handles:
+                        bloom.add(self.key(handle))
+                    last_handle = handles[-1]
+                for key in self._added_during_rebuild:
+                    bloom.add(key)
+                self._bloom, self._written_since = bloom, started
+            finally:
+                self._rebuilding = False
+                self._added_during_rebuild.clear()
+
+    async def keep_current(self, session_factory) -> None:
+        """Build the filter now, then refresh it every refresh_interval seconds and rebuild it every ttl
+        seconds; run as a task from the app's lifespan. A failed pass is retried at the next interval."""
+        rebuild_at = 0.0
+        while True:
+            try:
+                async with session_factory() as db:
+                    if self._bloom is None or time.monotonic() >= rebuild_at:
+                        await self.rebuild(db)
+                        rebuild_at = time.monotonic() + self.ttl
+                    else:
+                        await self.refresh(db)
+            except (OSError, SQLAlchemyError) as e:
+                logger.warning("Handle filter update failed, retrying: %s", e)
+            except Exception:
+                logger.exception("Handle filter update failed, retrying") # A bug: keep the loop alive, but loudly
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> dict:
+        return {"checks": self.checks, "database_checks": self.database_checks}
+
+
+handle_filter = HandleFilter(
+    ttl=float(os.environ.get("HANDLE_FILTER_TTL", "300")),
+    refresh_interval=float(os.environ.get("HANDLE_FILTER_REFRESH", "10")),
+    error_rate=float(os.environ.get("HANDLE_FILTER_FP_RATE", "0.01")),
+)
@@ -0,0 +1,221 @@
+"""Request and database instrumentation, exported in Prometheus text format.
+
+MetricsMiddleware times every HTTP request and labels it with the route template
+(/profiles/handle/{handle_value}, not the raw path). The engine hooks installed by
+instrument_engine() time every statement and add it to the current request's
+RequestTimings (held in a context variable, which SQLAlchemy's async adaption carries
+into the hooks). Per request this yields the query count, total DB time and slowest
+statement, which go both into histograms and into a Server-Timing response header:
+
+    Server-Timing: app;dur=4.1, db;dur=1.2;desc="3 queries", db-slowest;dur=0.6
+
+Everything is kept in process, so each worker exports its own series; scrape every
+worker. METRICS_ENABLED=0 turns the recording off (and with it the query budgets).
+
+Query budgets: an endpoint decorated with @query_budget(n) may execute at most n
+statements per request, which catches N+1 regressions (a dropped selectinload, a new
+relationship serialized lazily). QUERY_BUDGET_MODE decides what an overrun does:
+"log" (default) logs a warning and counts it in http_request_query_budget_exceeded_total,
+"raise" fails the statement that goes over with QueryBudgetExceeded (for
+benchmarks/query_budgets.py and local runs), "off" ignores budgets.
+"""
+import bisect
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+enabled = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", "log").lower() # log | raise | off
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {} # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels: tuple, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1 # Non-cumulative here; summed on export
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            suffix = f"{{{label_text}}}" if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple, int] = {}
+
+    def inc(self, labels: tuple) -> None:
+        self._values[labels] = self._values.get(labels, 0) + 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            label_text = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_text}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"), LATENCY_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Total database time per HTTP request.", ("method", "route"), LATENCY_BUCKETS)
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "Statements executed per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS)
+REQUEST_DB_SLOWEST = Histogram(
+    "http_request_db_slowest_statement_seconds", "Slowest statement of each HTTP request.", ("method", "route"), LATENCY_BUCKETS)
+STATEMENT_LATENCY = Histogram("db_statement_duration_seconds", "Database statement latency (all statements).", (), LATENCY_BUCKETS)
+BUDGET_EXCEEDED = Counter(
+    "http_request_query_budget_exceeded_total", "Requests that executed more statements than their endpoint's budget.", ("method", "route"))
+
+DB_SESSION_ROUTING = Counter(
+    "db_read_sessions_total", "Read-only sessions by the database they went to (primary, replica) and why.", ("target", "reason"))
+
+AUTH_ADMISSION = Counter(
+    "auth_admission_total", "Sign-in and sign-up attempts by admission outcome (admitted, overloaded, ip_limited, account_limited).",
+    ("endpoint", "outcome"))
+
+METRICS = (REQUESTS, REQUEST_LATENCY, REQUEST_DB_TIME, REQUEST_DB_QUERIES, REQUEST_DB_SLOWEST, STATEMENT_LATENCY, BUDGET_EXCEEDED,
+           DB_SESSION_ROUTING, AUTH_ADMISSION)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(max_queries: int):
+    """Declare the most statements one request to the decorated endpoint may execute.
+
+    Place it below the @app.<method>() decorator.
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+
+def endpoint_budget(route) -> int | None:
+    return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+
+class RequestTimings:
+    __slots__ = ("scope", "queries", "db_seconds", "slowest_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope # Routing fills in scope["route"], which carries the endpoint's budget
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def instrument_engine(sync_engine) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if enabled:
+            conn.info["metrics_statement_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("metrics_statement_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        STATEMENT_LATENCY.observe((), elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.db_seconds += elapsed
+            if elapsed > timings.slowest_seconds:
+                timings.slowest_seconds = elapsed
+            if QUERY_BUDGET_MODE == "raise":
+                budget = endpoint_budget(timings.scope.get("route"))
+                if budget is not None and timings.queries > budget:
+                    raise QueryBudgetExceeded(
+                        f"{timings.scope['method']} {timings.scope['route'].path}: statement {timings.queries} "
+                        f"exceeds the budget of {budget}: {statement}"
+                    )
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering, unlike BaseHTTPMiddleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled:
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        timings = RequestTimings(scope)
+        token = _current.set(timings)
+        status_code = 500
+
+        async def send_with_server_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = (
+                    f"app;dur={(time.perf_counter() - start) * 1000:.1f}, "
+                    f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.queries} queries", '
+                    f"db-slowest;dur={timings.slowest_seconds * 1000:.1f}"
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched")) # Raw paths would explode the label set
+            REQUESTS.inc((*labels, status_code))
+            REQUEST_LATENCY.observe(labels, time.perf_counter() - start)
+            REQUEST_DB_TIME.observe(labels, timings.db_seconds)
+            REQUEST_DB_QUERIES.observe(labels, timings.queries)
+            REQUEST_DB_SLOWEST.observe(labels, timings.slowest_seconds)
+            budget = endpoint_budget(route)
+            if budget is not None and timings.queries > budget and QUERY_BUDGET_MODE != "off":
+                BUDGET_EXCEEDED.inc(labels)
+                logger.warning("%s %s executed %d statements, over its query budget of %d",
+                               *labels, timings.queries, budget)
@@ -1,17 +1,37 @@
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, Table
+import json
+from datetime import datetime, timezone
+from sqlalchemy import DDL, Column, Integer, String, Text, Date, DateTime, ForeignKey, Index, Table, event, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import TypeDecorator
 
 from .database import Base # Ensure this import works based on your file structure
 
-# Association table for Profile to Skills (if you want a many-to-many for skills)
-# For now, skills_used in Experience is a simple Text field (e.g., comma-separated or JSON string)
-# If you want a proper many-to-many for skills on Profile or Experience, you'd define a Skill model and association tables.
+class SkillList(TypeDecorator):
+    """List of skill names stored in a Text column as a JSON array.
+
+    Reads also accept the legacy comma-separated format.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return json.dumps(list(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if value.startswith("["):
+            return json.loads(value)
+        return [skill.strip() for skill in value.split(",") if skill.strip()]
+
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
 
@@ -21,7 +41,7 @@ class User(Base):
 class Profile(Base):
     __tablename__ = "profiles"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     handle = Column(String, unique=True, index=True, nullable=True) # New field
 
@@ -32,15 +52,25 @@ class Profile(Base):
     github_url = Column(String, nullable=True)
     website_url = Column(String, nullable=True)
 
+    # Bumped by every write to the profile, its experiences or its education (crud.rebuild_profile_snapshot);
+    # the ETag and Last-Modified of the profile endpoints, and what If-Match is checked against
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime(timezone=True), nullable=True, default=lambda: datetime.now(timezone.utc))
+
     user = relationship("User", back_populates="profile")
     experiences = relationship("Experience", back_populates="profile", cascade="all, delete-orphan")
     education_history = relationship("Education", back_populates="profile", cascade="all, delete-orphan")
 
+# Handles are unique ignoring case; lookups filter on lower(handle) so they use this index
+Index("ix_profiles_handle_lower", func.lower(Profile.handle), unique=True)
+# The handle filter's refresh reads the profiles written since its last one (app/handles.py)
+Index("ix_profiles_updated_at", Profile.updated_at)
+
 
 class Experience(Base):
     __tablename__ = "experiences"
 
-    id = Column(Integer, primary_key=True, index=True) # Auto-incrementing integer ID
+    id = Column(Integer, primary_key=True) # Auto-incrementing integer ID
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
 
     title = Column(String, nullable=False)
@@ -49,15 +79,18 @@ class Experience(Base):
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=True) # Nullable if current job
     description = Column(Text, nullable=True)
-    skills_used = Column(Text, nullable=True) # Could be comma-separated, JSON, or related to a Skills table
+    skills_used = Column(SkillList, nullable=True) # As entered, for display; normalized copy in experience_skills
 
     profile = relationship("Profile", back_populates="experiences")
 
+    # Serves the selectinload on Profile.experiences and the profile_id ownership filters
+    __table_args__ = (Index("ix_experiences_profile_id_start_date", "profile_id", "start_date"),)
+
 
 class Education(Base):
     __tablename__ = "education_history" # Changed from "education" to avoid potential SQL keyword conflicts
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
 
     institution_name = Column(String, nullable=False)
@@ -68,3 +101,56 @@ class Education(Base):
     description = Column(Text, nullable=True)
 
     profile = relationship("Profile", back_populates="education_history")
+
+    __table_args__ = (Index("ix_education_history_profile_id_start_date", "profile_id", "start_date"),)
+
+
+class Skill(Base):
+    __tablename__ = "skills"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False) # Canonical form, see crud.canonical_skill_name
+
+
+class ExperienceSkill(Base):
+    # Experience <-> skill association, maintained by crud from Experience.skills_used.
+    # profile_id is copied from the experience so that (skill_id, profile_id) is a posting
+    # list of the profiles that have a skill, readable from the index alone.
+    __tablename__ = "experience_skills"
+
+    experience_id = Column(Integer, ForeignKey("experiences.id", ondelete="CASCADE"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), primary_key=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (Index("ix_experience_skills_skill_id_profile_id", "skill_id", "profile_id"),)
+
+
+class ProfileSnapshot(Base):
+    # Public profile JSON (schemas.Profile), rebuilt by crud in the same transaction as every write
+    __tablename__ = "profile_snapshots"
+
+    profile_id = Column(Integer, ForeignKey("profiles.id", ondelete="CASCADE"), primary_key=True)
+    body = Column(Text, nullable=False)
+
+
+# Full-text search document per profile, maintained by app/search.py. The storage is
+# dialect-specific (a tsvector column with a GIN index on PostgreSQL, an FTS5 virtual
+# table on SQLite), so it is not a mapped table; create_all()/drop_all() run this DDL.
+PROFILE_SEARCH_DDL = {
+    "postgresql": (
+        "CREATE TABLE IF NOT EXISTS profile_search ("
+        "profile_id INTEGER PRIMARY KEY REFERENCES profiles (id) ON DELETE CASCADE, "
+        "document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_profile_search_document ON profile_search USING gin (document)",
+    ),
+    "sqlite": (
+        # rowid is the profile id; columns are the weighted fields (see app/search.py)
+        "CREATE VIRTUAL TABLE IF NOT EXISTS profile_search USING fts5("
+        "name, headline, body, tokenize = 'unicode61 remove_diacritics 2')",
+    ),
+}
+
+for _dialect, _statements in PROFILE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+    event.listen(Base.metadata, "before_drop", DDL("DROP TABLE IF EXISTS profile_search").execute_if(dialect=_dialect))
@@ -0,0 +1,95 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache
+
+from fastapi import HTTPException, status
+
+# bcrypt costs tens of milliseconds of CPU per call, so hashing and verification run in a
+# worker pool instead of on the event loop. All settings come from the environment:
+#   BCRYPT_ROUNDS               bcrypt cost factor; hashes with a different cost are upgraded on login
+#   PASSWORD_HASH_EXECUTOR      "thread" (default, bcrypt releases the GIL), "process" or "inline"
+#   PASSWORD_HASH_WORKERS       pool size (default: CPU count)
+#   PASSWORD_HASH_QUEUE_LIMIT   max hash/verify jobs running or waiting before new ones get a 503
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", str(PASSWORD_HASH_WORKERS * 8)))
+
+@cache
+def get_pwd_context():
+    # Built on first use: passlib and its bcrypt backend are only needed to sign up or in,
+    # so importing the app (or the CLI) doesn't pay for them. The app's lifespan warms it.
+    from passlib.context import CryptContext
+
+    # min/max rounds pinned to the configured cost so that verify_and_update() flags hashes
+    # made with any other cost (higher or lower) for a transparent rehash.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+# Module-level so they can be pickled into a process pool.
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return get_pwd_context().verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    def __init__(self, kind: str = PASSWORD_HASH_EXECUTOR, workers: int = PASSWORD_HASH_WORKERS,
+                 queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0 # Jobs submitted and not yet finished, across all event loops
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.kind == "inline":
+            return fn(*args)
+        if self.pending >= self.queue_limit:
+            # Shed load instead of letting a login burst queue up unbounded work
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Returns (is_valid, new_hash); new_hash is set when the stored hash should be replaced."""
+        return await self._run(_verify_and_update, password, hashed_password)
+
+    def warm_up(self):
+        # Import passlib and load the bcrypt backend now rather than in the first sign-in
+        get_pwd_context().handler("bcrypt").get_backend()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
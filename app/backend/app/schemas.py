@@ -1,6 +1,6 @@
 import uuid
-from pydantic import BaseModel, Field, HttpUrl
-from typing import List, Optional
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from typing import Annotated, List, Literal, Optional, Union
 from datetime import date # For date fields
 
 # --- User Schemas ---
@@ -53,6 +53,12 @@ class Experience(ExperienceBase): # For returning experience from API
         from_attributes = True
 
 
+# Upper bound on items accepted by the batch create endpoints
+MAX_BATCH_ITEMS = 100
+
+ExperienceBatchCreate = Annotated[List[ExperienceCreate], Field(min_length=1, max_length=MAX_BATCH_ITEMS)]
+
+
 # --- Education Schemas ---
 class EducationBase(BaseModel):
     institution_name: str
@@ -79,6 +85,9 @@ class Education(EducationBase): # For returning education from API
         from_attributes = True
 
 
+EducationBatchCreate = Annotated[List[EducationCreate], Field(min_length=1, max_length=MAX_BATCH_ITEMS)]
+
+
 # --- Profile Schemas ---
 class ProfileBase(BaseModel):
     handle: Optional[str] = None # New field
@@ -100,6 +109,62 @@ class ProfileUpdate(ProfileBase): # For PUT request, all fields are optional
     # education_history: Optional[List[EducationCreate]] = Field(default_factory=list)
     # Note: Experiences and Education are handled by their own CRUD endpoints typically
 
+# --- Profile Batch Schemas (PATCH /profiles/me/batch) ---
+# One editor save as a list of operations, applied in one transaction
+class UpdateProfileOperation(BaseModel):
+    op: Literal["update_profile"]
+    data: ProfileUpdate
+
+class CreateExperienceOperation(BaseModel):
+    op: Literal["create_experience"]
+    data: ExperienceCreate
+
+def _reject_nulls(data: BaseModel, fields: tuple[str, ...]) -> BaseModel:
+    # Fields left out are unchanged, but a null can't be stored in these NOT NULL columns
+    if nulls := [name for name in fields if name in data.model_fields_set and getattr(data, name) is None]:
+        raise ValueError(f"{', '.join(nulls)} cannot be null")
+    return data
+
+class UpdateExperienceOperation(BaseModel):
+    op: Literal["update_experience"]
+    id: int
+    data: ExperienceUpdate
+
+    @field_validator("data")
+    @classmethod
+    def required_fields_not_null(cls, data: ExperienceUpdate) -> ExperienceUpdate:
+        return _reject_nulls(data, ("title", "company_name", "start_date"))
+
+class DeleteExperienceOperation(BaseModel):
+    op: Literal["delete_experience"]
+    id: int
+
+class CreateEducationOperation(BaseModel):
+    op: Literal["create_education"]
+    data: EducationCreate
+
+class UpdateEducationOperation(BaseModel):
+    op: Literal["update_education"]
+    id: int
+    data: EducationUpdate
+
+    @field_validator("data")
+    @classmethod
+    def required_fields_not_null(cls, data: EducationUpdate) -> EducationUpdate:
+        return _reject_nulls(data, ("institution_name", "degree", "start_date"))
+
+class DeleteEducationOperation(BaseModel):
+    op: Literal["delete_education"]
+    id: int
+
+ProfileBatchOperation = Annotated[Union[
+    UpdateProfileOperation,
+    CreateExperienceOperation, UpdateExperienceOperation, DeleteExperienceOperation,
+    CreateEducationOperation, UpdateEducationOperation, DeleteEducationOperation,
+], Field(discriminator="op")]
+
+ProfileBatch = Annotated[List[ProfileBatchOperation], Field(min_length=1, max_length=MAX_BATCH_ITEMS)]
+
 class Profile(ProfileBase): # For returning full profile from API
     id: int
     user_id: int
@@ -111,6 +176,34 @@ class Profile(ProfileBase): # For returning full profile from API
         from_attributes = True
 
 
+# Profile listing entry (directory, search results): a few columns, no experiences/education
+class ProfileCard(BaseModel):
+    handle: str
+    full_name: Optional[str] = None
+    profile_picture_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class ProfileCardPage(BaseModel): # GET /profiles and GET /search
+    items: List[ProfileCard]
+    next_cursor: Optional[str] = None # Pass back as ?cursor= for the next page; null on the last page
+
+
+class SkillMatch(ProfileCard):
+    matched_skills: int # How many of the requested skills the profile lists
+
+class SkillMatchPage(BaseModel): # GET /skills/profiles
+    items: List[SkillMatch]
+    total: int # Matching profiles across all pages
+    next_cursor: Optional[str] = None
+
+
+class HandleAvailability(BaseModel): # GET /handles/{handle}/available
+    handle: str
+    available: bool
+
+
 # --- Token Schemas (already in main.py, can be moved here too) ---
 class Token(BaseModel):
     access_token: str
@@ -119,3 +212,8 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     user_id: Optional[int] = None # Changed from email/username to user_id
     # email: Optional[str] = None # Kept if needed, but user_id is primary for DB lookups now
+
+# Authenticated caller, built from the JWT claims alone (no DB lookup)
+class Principal(BaseModel):
+    user_id: int
+    profile_id: Optional[int] = None # Missing in tokens issued before the "pid" claim existed
@@ -0,0 +1,97 @@
+"""Full-text search over profiles, their experiences and their education.
+
+Each profile has one search document (the profile_search table, see models.PROFILE_SEARCH_DDL)
+with three weighted fields:
+
+    name      full name and handle                                  (highest weight)
+    headline  job titles, companies, skills, institutions
+    body      bio, locations, degrees, fields of study, descriptions (lowest weight)
+
+crud.rebuild_profile_snapshot() re-indexes the profile inside every write transaction, so
+the index is as current as the public snapshot. `python -m app.cli rebuild-search` rebuilds
+it from scratch.
+
+Queries are reduced to plain word tokens, all of which must match; the last token also
+matches as a prefix so partial words typed into a search box find results.
+"""
+import re
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+MAX_QUERY_TOKENS = 8
+_TOKEN = re.compile(r"\w+")
+
+# bm25() column weights for FTS5; ts_rank() uses PostgreSQL's default A/B/C weights
+_SQLITE_WEIGHTS = "10.0, 4.0, 1.0"
+
+
+def profile_document(db_profile: models.Profile) -> tuple[str, str, str]:
+    # Expects experiences and education_history to be loaded
+    name = [db_profile.full_name, db_profile.handle]
+    headline, body = [], [db_profile.bio]
+    for experience in db_profile.experiences:
+        headline += [experience.title, experience.company_name, *(experience.skills_used or [])]
+        body += [experience.location, experience.description]
+    for education in db_profile.education_history:
+        headline.append(education.institution_name)
+        body += [education.degree, education.field_of_study, education.description]
+    return tuple(" ".join(part for part in parts if part) for parts in (name, headline, body))
+
+
+def query_tokens(query: str) -> list[str]:
+    return _TOKEN.findall(query.lower())[:MAX_QUERY_TOKENS]
+
+
+async def index_profiles(db: AsyncSession, profiles: list[models.Profile]) -> None:
+    """Replace the search documents of `profiles` in the caller's transaction."""
+    if not profiles:
+        return
+    rows = [dict(zip(("name", "headline", "body"), profile_document(p)), profile_id=p.id) for p in profiles]
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text(
+            "INSERT INTO profile_search (profile_id, document) VALUES (:profile_id, "
+            "setweight(to_tsvector('simple', :name), 'A') || "
+            "setweight(to_tsvector('simple', :headline), 'B') || "
+            "setweight(to_tsvector('simple', :body), 'C')) "
+            "ON CONFLICT (profile_id) DO UPDATE SET document = excluded.document"
+        ), rows)
+    else:
+        # FTS5 tables have no upsert; delete and re-insert by rowid
+        await db.execute(
+            text("DELETE FROM profile_search WHERE rowid IN :profile_ids").bindparams(bindparam("profile_ids", expanding=True)),
+            {"profile_ids": [row["profile_id"] for row in rows]},
+        )
+        await db.execute(text(
+            "INSERT INTO profile_search (rowid, name, headline, body) VALUES (:profile_id, :name, :headline, :body)"
+        ), rows)
+
+
+async def optimize_index(db: AsyncSession) -> None:
+    # After a bulk rebuild: merge FTS5's incremental b-tree segments into one
+    if db.get_bind().dialect.name == "sqlite":
+        await db.execute(text("INSERT INTO profile_search (profile_search) VALUES ('optimize')"))
+
+
+async def search_profile_cards(db: AsyncSession, tokens: list[str], limit: int, offset: int):
+    """Best-ranked profile cards (handle, full_name, profile_picture_url) matching every token."""
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = text(
+            "SELECT p.handle, p.full_name, p.profile_picture_url "
+            "FROM profile_search s JOIN profiles p ON p.id = s.profile_id, to_tsquery('simple', :query) q "
+            "WHERE s.document @@ q AND p.handle IS NOT NULL "
+            "ORDER BY ts_rank(s.document, q) DESC, p.id LIMIT :limit OFFSET :offset"
+        )
+        query = " & ".join(tokens) + ":*"
+    else:
+        stmt = text(
+            "SELECT p.handle, p.full_name, p.profile_picture_url "
+            "FROM profile_search JOIN profiles p ON p.id = profile_search.rowid "
+            "WHERE profile_search MATCH :query AND p.handle IS NOT NULL "
+            f"ORDER BY bm25(profile_search, {_SQLITE_WEIGHTS}), p.id LIMIT :limit OFFSET :offset"
+        )
+        # Tokens are \w+ only, so quoting them is enough to keep FTS5 syntax out
+        query = " ".join(f'"{token}"' for token in tokens) + "*"
+    return (await db.execute(stmt, {"query": query, "limit": limit, "offset": offset})).all()
@@ -0,0 +1,75 @@
+import os
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+from . import models, schemas
+
+# Opt-in fast path (FAST_RESPONSES=1): ORM rows are copied straight into dicts and encoded with
+# orjson, skipping schemas.* validation on the way out. The ORM columns already hold the response
+# types (dates as datetime.date, skills_used as a list via models.SkillList), which orjson encodes
+# the same way Pydantic does, so the JSON is identical to the response_model path.
+FAST_RESPONSES = os.environ.get("FAST_RESPONSES", "").lower() in ("1", "true", "yes")
+
+# Field order follows the schemas so the output matches model_dump_json() byte for byte
+_USER_FIELDS = tuple(schemas.User.model_fields)
+_EXPERIENCE_FIELDS = tuple(schemas.Experience.model_fields)
+_EDUCATION_FIELDS = tuple(schemas.Education.model_fields)
+_PROFILE_FIELDS = tuple(name for name in schemas.Profile.model_fields if name not in ("experiences", "education_history"))
+
+
+def _row_dict(obj: Any, fields: tuple[str, ...]) -> dict:
+    return {name: getattr(obj, name) for name in fields}
+
+
+def user_dict(db_user: models.User) -> dict:
+    return _row_dict(db_user, _USER_FIELDS)
+
+
+def experience_dict(db_experience: models.Experience) -> dict:
+    return _row_dict(db_experience, _EXPERIENCE_FIELDS)
+
+
+def education_dict(db_education: models.Education) -> dict:
+    return _row_dict(db_education, _EDUCATION_FIELDS)
+
+
+def profile_dict(db_profile: models.Profile) -> dict:
+    # Expects experiences and education_history to be loaded already
+    data = _row_dict(db_profile, _PROFILE_FIELDS)
+    data["experiences"] = [experience_dict(e) for e in db_profile.experiences]
+    data["education_history"] = [education_dict(e) for e in db_profile.education_history]
+    return data
+
+
+def dumps(data: Any) -> bytes:
+    return orjson.dumps(data)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else orjson.dumps(content)
+
+
+_SERIALIZERS = {
+    models.User: user_dict,
+    models.Profile: profile_dict,
+    models.Experience: experience_dict,
+    models.Education: education_dict,
+}
+
+
+def respond(obj: Any, status_code: int = 200) -> Any:
+    """Return value for an endpoint with an ORM response (a row or a list of rows).
+
+    In fast mode this is a pre-encoded response (FastAPI skips response_model for Response
+    objects); otherwise the ORM object is returned for response_model to validate as usual.
+    """
+    if not FAST_RESPONSES:
+        return obj
+    if isinstance(obj, list):
+        return FastJSONResponse(content=[_SERIALIZERS[type(item)](item) for item in obj], status_code=status_code)
+    return FastJSONResponse(content=_SERIALIZERS[type(obj)](obj), status_code=status_code)
@@ -0,0 +1,168 @@
+"""Static export of public profiles, for serving /p/<handle> without the backend.
+
+Each profile with a handle is written as OUTPUT/p/<handle>.json, the same
+schemas.Profile JSON GET /profiles/handle/{handle} returns, next to gzip and
+brotli precompressed copies (.json.gz, .json.br) that a web server or CDN hands
+out as they are (nginx: gzip_static / brotli_static). File names are the
+lowercased handle, percent-encoded, since handles resolve case-insensitively.
+
+OUTPUT/manifest.json records, per handle, the profile id and version that was
+exported and the SHA-256 of its JSON. A run compares the versions in the
+database (bumped by every write, see crud.rebuild_profile_snapshot) with the
+manifest and only loads the profiles that moved on; of those, only the ones
+whose JSON hash changed are compressed and written. Files of profiles deleted
+or renamed since the last run are removed. Every file is replaced atomically,
+so a server never sees a partial one. Compression, the expensive part, runs in
+a pool of worker processes.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from urllib.parse import quote
+
+from sqlalchemy import select
+
+from . import crud, models
+from .database import get_sessionmaker
+
+MANIFEST = "manifest.json"
+MANIFEST_FORMAT = 1
+VARIANTS = (".json", ".json.gz", ".json.br")
+WORKER_CHUNK = 50 # Profiles per task sent to a worker process
+
+
+def profile_path(output_dir: str, handle: str) -> str:
+    # Lowercased (handles are unique ignoring case) and percent-encoded, so any handle is one safe file name
+    return os.path.join(output_dir, "p", quote(handle.lower(), safe=""))
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def write_profile_files(files: list[tuple[str, bytes]]) -> None:
+    """Write profiles' JSON and precompressed variants, as (path without suffix, JSON) pairs (runs in a worker process)."""
+    import brotli # Only the workers compress
+
+    for path, body in files:
+        # Maximum compression: it is paid once per change and saved on every download.
+        # mtime=0 keeps the .gz bytes a function of the JSON alone.
+        _write_atomic(path + ".json.gz", gzip.compress(body, compresslevel=9, mtime=0))
+        _write_atomic(path + ".json.br", brotli.compress(body, mode=brotli.MODE_TEXT, quality=11))
+        _write_atomic(path + ".json", body) # Last: its presence means the variants are in place
+
+
+def load_manifest(output_dir: str) -> dict[str, dict]:
+    """{lowercased handle: {"handle", "id", "version", "sha256"}} of the last run, or {}."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return {} # Written by another version of the exporter: start over
+    return manifest["profiles"]
+
+
+def _save_manifest(output_dir: str, profiles: dict[str, dict]) -> None:
+    data = {"format": MANIFEST_FORMAT, "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "profiles": profiles}
+    _write_atomic(os.path.join(output_dir, MANIFEST), json.dumps(data, sort_keys=True).encode())
+
+
+async def _current_versions() -> dict[str, tuple[str, int, int]]:
+    # {lowercased handle: (handle, profile id, version)} of every public profile: one narrow scan
+    async with get_sessionmaker()() as db:
+        rows = await db.stream(select(models.Profile.handle, models.Profile.id, models.Profile.version)
+                               .filter(models.Profile.handle.is_not(None)))
+        return {handle.lower(): (handle, profile_id, version) async for handle, profile_id, version in rows}
+
+
+async def _load_bodies(handles: list[str]) -> dict[str, bytes]:
+    # {handle: JSON} from the stored snapshots; a profile without one is rendered from schemas.Profile
+    async with get_sessionmaker()() as db:
+        rows = (await db.execute(
+            select(models.Profile.handle, models.ProfileSnapshot.body)
+            .join(models.ProfileSnapshot, models.ProfileSnapshot.profile_id == models.Profile.id)
+            .filter(models.Profile.handle.in_(handles))
+        )).all()
+        bodies = {handle: body.encode() for handle, body in rows}
+        missing = [handle for handle in handles if handle not in bodies]
+        if missing: # Those deleted or renamed since the version scan aren't found
+            for db_profile in await crud.get_profiles_by_handles(db, missing):
+                bodies[db_profile.handle] = crud.render_profile_json(db_profile).encode()
+    return bodies
+
+
+async def export_profiles(output_dir: str, workers: int, batch_size: int, full: bool = False) -> dict[str, int]:
+    """Bring output_dir up to date with the database; returns counts of what was done."""
+    os.makedirs(os.path.join(output_dir, "p"), exist_ok=True)
+    previous = load_manifest(output_dir)
+    current = await _current_versions()
+    stats = {"profiles": len(current), "loaded": 0, "written": 0, "unchanged": 0, "removed": 0}
+
+    for key in previous.keys() - current.keys():
+        # Deleted, renamed, or lost its handle
+        for suffix in VARIANTS:
+            try:
+                os.remove(profile_path(output_dir, key) + suffix)
+            except FileNotFoundError:
+                pass
+        stats["removed"] += 1
+
+    manifest = {key: entry for key, entry in previous.items() if key in current}
+    # full: every profile is loaded again, but the hashes still keep unchanged files from being rewritten
+    stale = [key for key, (handle, profile_id, version) in current.items()
+             if full or (entry := previous.get(key)) is None or (entry["id"], entry["version"]) != (profile_id, version)]
+
+    # Spawned, not forked: a forked worker would share the parent's pooled database connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = set()
+        for start in range(0, len(stale), batch_size):
+            keys = stale[start:start + batch_size]
+            bodies = await _load_bodies([current[key][0] for key in keys])
+            stats["loaded"] += len(bodies)
+            files = []
+            for key in keys:
+                handle, profile_id, version = current[key]
+                body = bodies.get(handle)
+                if body is None:
+                    continue
+                sha256 = hashlib.sha256(body).hexdigest()
+                entry = previous.get(key)
+                if entry is not None and entry["sha256"] == sha256 and os.path.exists(profile_path(output_dir, key) + ".json"):
+                    stats["unchanged"] += 1 # New version, same JSON (e.g. a no-op save): the files stay as they are
+                else:
+                    files.append((profile_path(output_dir, key), body))
+                manifest[key] = {"handle": handle, "id": profile_id, "version": version, "sha256": sha256}
+            stats["written"] += len(files)
+            for chunk in range(0, len(files), WORKER_CHUNK):
+                pending.add(asyncio.wrap_future(pool.submit(write_profile_files, files[chunk:chunk + WORKER_CHUNK])))
+            # Bounded backlog: batches are only read from the database as fast as the workers compress them.
+            # Awaited, not waited on, so the event loop keeps running meanwhile.
+            while len(pending) > workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            print(f"exported {min(start + batch_size, len(stale))}/{len(stale)} changed profiles", file=sys.stderr)
+        await asyncio.gather(*pending) # Raises the first worker's error, if any
+
+    _save_manifest(output_dir, manifest)
+    return stats
+
+
+async def export_static(output_dir: str, workers: int, batch_size: int, full: bool) -> int:
+    started = time.perf_counter()
+    stats = await export_profiles(output_dir, workers=workers, batch_size=batch_size, full=full)
+    print(f"{stats['profiles']} public profiles: {stats['loaded']} changed since the last export, {stats['written']} written, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed in {time.perf_counter() - started:.1f}s")
+    return 0
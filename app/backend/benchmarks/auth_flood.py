@@ -0,0 +1,153 @@
+"""Latency of GET /profiles/handle/{handle} while a flood of POST /signin requests runs.
+
+The first rows run the same reader workload with auth admission off and bcrypt
+executed inline on the event loop (the previous behaviour), in the thread pool,
+or in the process pool. The last ones turn admission on (app/admission.py, at
+its configured limits) against a flood from one address on one account, and
+against a credential-stuffing flood spread over many addresses and accounts,
+which only the concurrency cap holds back. Readers come from an address of
+their own. The flood is paced to --flood-rate attempts per second in total (a
+client that gets its answer early waits for its next slot), so every row sees
+the same offered load: an unpaced in-process flood would spin on cheap
+rejections, and its client side runs in this process too.
+
+Exits 1 unless, with admission on, the floods are turned away with 429 or 503,
+every rejection carries Retry-After and ran no statement (so neither the user
+lookup nor bcrypt), and no more sign-ins get through than the limits allow.
+
+    python -m benchmarks.auth_flood [--reads 200] [--flood-clients 16] [--flood-rate 200] [--rounds 12]
+"""
+import argparse
+import asyncio
+import re
+import sys
+
+from benchmarks.common import configure_database, create_schema, seed_profiles, summarize
+
+FLOOD_PASSWORD = "correct horse battery staple"
+READER_ADDRESS = "198.51.100.1"
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+def flood_email(n: int) -> str:
+    return f"flood{n}@example.com"
+
+
+async def measure(app, handles: list[str], reads: int, flood_clients: int, flood_rate: float, addresses: int, accounts: int) -> dict:
+    import httpx
+
+    def client_from(address: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(address, 40000)), base_url="http://bench")
+
+    reader = client_from(READER_ADDRESS)
+    flood_from = [client_from(f"203.0.{n // 250}.{n % 250 + 1}") for n in range(addresses)]
+    stop = asyncio.Event()
+    signin_statuses: dict[int, int] = {}
+    bad_rejections: list[str] = []
+    attempts = 0
+
+    loop = asyncio.get_running_loop()
+
+    async def flood():
+        nonlocal attempts
+        interval = flood_clients / flood_rate
+        next_at = loop.time()
+        while not stop.is_set():
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            # Each attempt from the next address, for the next account
+            attempts += 1
+            client = flood_from[attempts % addresses]
+            response = await client.post("/signin", data={"username": flood_email(attempts % accounts), "password": FLOOD_PASSWORD})
+            signin_statuses[response.status_code] = signin_statuses.get(response.status_code, 0) + 1
+            if response.status_code in (429, 503):
+                match = QUERY_COUNT.search(response.headers.get("server-timing", ""))
+                if "retry-after" not in response.headers or (match and int(match.group(1))):
+                    bad_rejections.append(f"{response.status_code} with Retry-After {response.headers.get('retry-after')} "
+                                          f"and {response.headers.get('server-timing')}")
+
+    flooders = [asyncio.create_task(flood()) for _ in range(flood_clients)]
+    await asyncio.sleep(0.2) # Let the flood saturate the hasher first
+    latencies = []
+    for i in range(reads):
+        start = loop.time()
+        response = await reader.get(f"/profiles/handle/{handles[i % len(handles)]}")
+        response.raise_for_status()
+        latencies.append(loop.time() - start)
+    stop.set()
+    await asyncio.gather(*flooders)
+    for client in [reader, *flood_from]:
+        await client.aclose()
+    return {**summarize(latencies), "signins": signin_statuses, "bad_rejections": bad_rejections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--flood-clients", type=int, default=16)
+    parser.add_argument("--flood-rate", type=float, default=200, help="sign-in attempts per second, across all flood clients")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS for the flood accounts")
+    parser.add_argument("--addresses", type=int, default=500, help="client addresses of the distributed flood")
+    parser.add_argument("--accounts", type=int, default=1000, help="accounts the distributed flood tries")
+    args = parser.parse_args()
+
+    import os
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    url = configure_database()
+    sync_engine = create_schema(url)
+    handles = seed_profiles(sync_engine, args.profiles)
+
+    from sqlalchemy import insert
+    from app import models
+    from app.admission import AuthAdmission
+    from app.passwords import _hash, password_hasher
+    import main as api
+
+    hashed_password = _hash(FLOOD_PASSWORD) # One hash for every account: verifying each still costs a full bcrypt
+    first_id = len(handles) + 1
+    with sync_engine.begin() as conn:
+        # With profiles, as /signup creates them, so that signing in writes nothing
+        conn.execute(insert(models.User), [
+            {"id": first_id + n, "email": flood_email(n), "hashed_password": hashed_password} for n in range(args.accounts)])
+        conn.execute(insert(models.Profile), [{"user_id": first_id + n} for n in range(args.accounts)])
+
+    off = dict(ip_per_minute=0, account_per_minute=0, max_concurrent=0)
+    scenarios = [
+        # name, executor, admission settings (None: configured), flood clients, addresses, accounts
+        ("no flood", "thread", off, 0, 1, 1),
+        ("inline (before)", "inline", off, args.flood_clients, 1, 1),
+        ("thread pool", "thread", off, args.flood_clients, 1, 1),
+        ("process pool", "process", off, args.flood_clients, 1, 1),
+        ("admission, 1 address", "thread", None, args.flood_clients, 1, 1),
+        (f"admission, {args.addresses} addresses", "thread", None, args.flood_clients, args.addresses, args.accounts),
+    ]
+    failures: list[str] = []
+
+    async def run_all():
+        await measure(api.app, handles, args.reads, 0, args.flood_rate, 1, 1) # Warm-up: the first row isn't measured cold
+        print(f"{'scenario':<28}{'p50 ms':>10}{'p99 ms':>10}  signin responses")
+        for name, kind, admission, flood_clients, addresses, accounts in scenarios:
+            password_hasher.shutdown()
+            password_hasher.kind = kind
+            api.auth_admission = AuthAdmission(**(admission or {})) # Fresh buckets for every scenario
+            result = await measure(api.app, handles, args.reads, flood_clients, args.flood_rate, addresses, accounts)
+            print(f"{name:<28}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}  {result['signins']}")
+            if admission is None:
+                signins = result["signins"]
+                rejected = signins.get(429, 0) + signins.get(503, 0)
+                if not rejected:
+                    failures.append(f"{name}: the flood was not rejected ({signins})")
+                failures.extend(f"{name}: rejected with {rejection}" for rejection in result["bad_rejections"][:5])
+                if addresses == 1 and signins.get(200, 0) > api.auth_admission.account_buckets.burst + 1:
+                    failures.append(f"{name}: {signins[200]} sign-ins to one account got through its bucket")
+        password_hasher.shutdown()
+
+    asyncio.run(run_all())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
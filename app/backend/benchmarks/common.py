@@ -0,0 +1,219 @@
+"""Shared helpers for the offline benchmarks.
+
+Benchmarks run against a throwaway SQLite file unless BENCH_DB_URL points at a
+(local) PostgreSQL database. The URL is exported as SUPABASE_DB_URL before any
+`app` module is imported, so call `configure_database()` first.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def configure_database() -> str:
+    url = os.environ.get("BENCH_DB_URL")
+    if url is None:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lavendar-bench-"), "bench.db")
+    os.environ["SUPABASE_DB_URL"] = url
+    return url
+
+
+def create_schema(url: str):
+    from sqlalchemy import create_engine
+    from app.database import Base
+
+    sync_engine = create_engine(url)
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    return sync_engine
+
+
+def seed_profiles(sync_engine, count: int, experiences: int = 5, education: int = 2, seed: int = 42,
+                  skills: list[str] | None = None) -> list[str]:
+    """Insert `count` users with profiles and return their handles.
+
+    With `skills`, each experience lists three of them, earlier names being more common.
+    """
+    from sqlalchemy import insert
+    from app import models
+
+    rng = random.Random(seed)
+    handles = [f"member{i}" for i in range(count)]
+    with sync_engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i + 1, "email": f"member{i}@example.com", "hashed_password": "x"} for i in range(count)
+        ])
+        conn.execute(insert(models.Profile), [
+            {"id": i + 1, "user_id": i + 1, "handle": handles[i], "full_name": f"Member {i}", "bio": "Bio " * 20}
+            for i in range(count)
+        ])
+        if experiences:
+            conn.execute(insert(models.Experience), [
+                {"profile_id": i + 1, "title": "Engineer", "company_name": f"Company {rng.randrange(1000)}",
+                 "start_date": date(2010 + j % 10, 1, 1), "description": "Worked on things. " * 10,
+                 "skills_used": sorted({skills[int(len(skills) * rng.random() ** 3)] for _ in range(3)}) if skills else None}
+                for i in range(count) for j in range(experiences)
+            ])
+        if education:
+            conn.execute(insert(models.Education), [
+                {"profile_id": i + 1, "institution_name": f"University {rng.randrange(100)}", "degree": "BSc",
+                 "start_date": date(2005 + j, 9, 1)}
+                for i in range(count) for j in range(education)
+            ])
+    return handles
+
+
+REALISTIC_SKILLS = [
+    "Python", "SQL", "JavaScript", "TypeScript", "React", "Java", "Go", "AWS", "Docker", "Kubernetes",
+    "PostgreSQL", "Git", "Linux", "C++", "Rust", "Terraform", "GraphQL", "Kafka", "Spark", "Figma",
+] + [f"Skill {i}" for i in range(480)]
+
+
+def _words(rng: random.Random, median: int) -> str:
+    # Log-normal lengths: most texts are short, a few are very long
+    return " ".join(rng.choice(("built", "led", "shipped", "the", "data", "platform", "team", "api", "users", "scaled"))
+                    for _ in range(int(rng.lognormvariate(0, 0.8) * median)))
+
+
+def seed_realistic_profiles(sync_engine, count: int, seed: int = 42, hashed_password: str = "x") -> list[str]:
+    """Insert `count` users with profiles of long-tailed sizes and return the handles.
+
+    Experiences per profile are exponentially distributed (mean 4, capped at 40),
+    education is 0-3 items, bio and description lengths are log-normal, 5% of
+    profiles have no handle and skills follow a power law over REALISTIC_SKILLS.
+    The same `seed` always yields the same data.
+    """
+    from sqlalchemy import insert
+    from app import models
+
+    rng = random.Random(seed)
+    handles = []
+    users, profiles, experiences, education = [], [], [], []
+    for i in range(count):
+        users.append({"id": i + 1, "email": f"member{i}@example.com", "hashed_password": hashed_password})
+        handle = f"member{i}" if rng.random() >= 0.05 else None
+        if handle:
+            handles.append(handle)
+        profiles.append({"id": i + 1, "user_id": i + 1, "handle": handle, "full_name": f"Member {i}",
+                         "bio": _words(rng, 40) or None, "github_url": f"https://github.com/member{i}" if rng.random() < 0.4 else None})
+        for j in range(min(int(rng.expovariate(1 / 4)), 40)):
+            experiences.append({
+                "profile_id": i + 1, "title": rng.choice(("Engineer", "Senior Engineer", "Designer", "Manager", "Analyst")),
+                "company_name": f"Company {int(1000 * rng.random() ** 2)}", "location": rng.choice((None, "London", "Berlin", "Remote")),
+                "start_date": date(2000 + rng.randrange(25), 1 + j % 12, 1),
+                "description": _words(rng, 30) or None,
+                "skills_used": sorted({REALISTIC_SKILLS[int(len(REALISTIC_SKILLS) * rng.random() ** 4)]
+                                       for _ in range(rng.randrange(9))}) or None,
+            })
+        for j in range(rng.choices((0, 1, 2, 3), weights=(15, 45, 35, 5))[0]):
+            education.append({"profile_id": i + 1, "institution_name": f"University {rng.randrange(300)}",
+                              "degree": rng.choice(("BSc", "MSc", "PhD", "BA")), "start_date": date(1995 + rng.randrange(25), 9, 1)})
+    with sync_engine.begin() as conn:
+        for model, rows in ((models.User, users), (models.Profile, profiles),
+                            (models.Experience, experiences), (models.Education, education)):
+            for start in range(0, len(rows), 10000):
+                conn.execute(insert(model), rows[start:start + 10000])
+    return handles
+
+
+def record_routes(app):
+    """Wrap an ASGI app to record, per (method, route template), each request's server-side
+    latency and statement count (from the Server-Timing header app.metrics adds).
+
+    Returns (wrapped app, samples) with samples[(method, path)] = [(seconds, statements), ...].
+    """
+    import re
+    from fastapi.routing import APIRoute
+
+    query_count = re.compile(rb'desc="(\d+) queries"')
+    samples: dict[tuple[str, str], list[tuple[float, int]]] = {}
+
+    async def recording_app(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        statements = 0
+
+        async def record(message):
+            nonlocal statements
+            if message["type"] == "http.response.start":
+                match = query_count.search(dict(message["headers"]).get(b"server-timing", b""))
+                statements = int(match.group(1)) if match else 0
+            await send(message)
+
+        start = time.perf_counter()
+        await app(scope, receive, record)
+        elapsed = time.perf_counter() - start
+        route = scope.get("route")
+        if isinstance(route, APIRoute):
+            samples.setdefault((scope["method"], route.path), []).append((elapsed, statements))
+
+    return recording_app, samples
+
+
+def api_routes(app) -> list[tuple[str, str]]:
+    from fastapi.routing import APIRoute
+
+    return [(method, route.path) for route in app.routes if isinstance(route, APIRoute) for method in sorted(route.methods)]
+
+
+def add_round_trip_latency(engine, seconds: float):
+    """Make every statement on a SQLite engine (sync or async) take `seconds` longer.
+
+    Local SQLite answers in microseconds, which hides what a network round trip
+    to PostgreSQL costs. The delay runs in the thread that executes the
+    statement, so it blocks the event loop exactly when a real driver would.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if seconds <= 0 or sync_engine.dialect.name != "sqlite":
+        return
+
+    def delay(statement):
+        time.sleep(seconds)
+
+    @event.listens_for(sync_engine, "connect")
+    def install_delay(dbapi_connection, connection_record):
+        if sync_engine.dialect.is_async:
+            from sqlalchemy.util import await_
+            await_(dbapi_connection.driver_connection.set_trace_callback(delay))
+        else:
+            dbapi_connection.set_trace_callback(delay)
+
+
+def summarize(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+async def run_clients(send, concurrency: int, total: int) -> tuple[float, list[float]]:
+    """Run `total` calls of the coroutine `send(i)` from `concurrency` clients.
+
+    Returns (elapsed seconds, per-request latencies).
+    """
+    import asyncio
+
+    latencies: list[float] = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await send(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
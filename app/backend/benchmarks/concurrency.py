@@ -0,0 +1,93 @@
+"""Requests/sec of GET /profiles/handle/{handle} at 1, 16 and 128 concurrent clients.
+
+Compares the async database layer ("after") with the previous pattern of an
+`async def` route calling a synchronous Session ("before"), which blocks the
+event loop for every round trip.
+
+    python -m benchmarks.concurrency [--requests 2000] [--profiles 500] [--latency-ms 2]
+    BENCH_DB_URL=postgresql://localhost/bench python -m benchmarks.concurrency
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import add_round_trip_latency, configure_database, create_schema, run_clients, seed_profiles
+
+CONCURRENCY_LEVELS = (1, 16, 128)
+
+
+def build_blocking_app(url: str, latency: float):
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session, selectinload, sessionmaker
+
+    from app import models, schemas
+
+    engine = create_engine(url, pool_size=20, max_overflow=120)
+    add_round_trip_latency(engine, latency)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.get("/profiles/handle/{handle_value}", response_model=schemas.Profile)
+    async def read_profile_by_handle(handle_value: str, db: Session = Depends(get_db)):
+        db_profile = db.scalar(select(models.Profile).options(
+            selectinload(models.Profile.experiences),
+            selectinload(models.Profile.education_history)
+        ).filter(models.Profile.handle == handle_value))
+        if db_profile is None:
+            raise HTTPException(status_code=404, detail="Profile not found for this handle")
+        return db_profile
+
+    return app
+
+
+async def measure(app, handles: list[str], concurrency: int, total: int) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(i: int):
+            response = await client.get(f"/profiles/handle/{handles[i % len(handles)]}")
+            response.raise_for_status()
+
+        elapsed, _ = await run_clients(send, concurrency, total)
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="simulated round trip per statement (SQLite only)")
+    args = parser.parse_args()
+
+    url = configure_database()
+    handles = seed_profiles(create_schema(url), args.profiles)
+
+    import main as api
+    from app.database import engine
+
+    latency = args.latency_ms / 1000
+    add_round_trip_latency(engine, latency)
+    apps = {"before (sync Session)": build_blocking_app(url, latency), "after (AsyncSession)": api.app}
+
+    async def run_all():
+        print(f"{'mode':<24}" + "".join(f"{f'c={c}':>12}" for c in CONCURRENCY_LEVELS))
+        for name, app in apps.items():
+            rates = [await measure(app, handles, c, args.requests) for c in CONCURRENCY_LEVELS]
+            print(f"{name:<24}" + "".join(f"{rate:>10.0f}/s" for rate in rates))
+
+    # One event loop for every run: pooled async connections are bound to the loop that opened them.
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Conditional request and optimistic concurrency check, with the savings it brings.
+
+Drives the app in process and fails (exit code 1) unless:
+
+  * GET /profiles/me/ and /profiles/handle/{handle} carry the profile's ETag and
+    Last-Modified, and answer If-None-Match / If-Modified-Since with an empty
+    304: /profiles/me/ in one statement (the version, no children), a cached
+    public profile in none,
+  * every write to the profile, an experience or an education item changes the
+    ETag, so a revalidation after it gets the new profile,
+  * a public profile read that loaded the profile before a write, and fills the
+    cache after the write's invalidation, doesn't bring the old version back,
+  * PUT and DELETE with an outdated If-Match fail with 412 and change nothing
+    (a PUT with nothing to change too), while the current ETag (or "*") lets them through: of two tabs editing from
+    the same version, the second is refused instead of overwriting the first.
+
+Then repeats a client's profile fetches with and without revalidation and
+prints the bytes and statements each costs.
+
+    python -m benchmarks.conditional [--profiles 200] [--fetches 200] [--experiences 10]
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+def statements(response) -> int:
+    # From the Server-Timing header app.metrics adds
+    match = QUERY_COUNT.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--fetches", type=int, default=200, help="repeated fetches per endpoint in the savings table")
+    parser.add_argument("--experiences", type=int, default=10, help="experiences on the measured profile")
+    args = parser.parse_args()
+
+    url = configure_database()
+    seed_profiles(create_schema(url), args.profiles)
+
+    import httpx
+    from app import crud, database
+    import main as api
+
+    failures: list[str] = []
+
+    def check(condition: bool, failure: str):
+        if not condition:
+            failures.append(failure)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://conditional") as client:
+            await client.post("/signup", json={"email": "etag@example.com", "password": "pw"})
+            token = (await client.post("/signin", data={"username": "etag@example.com", "password": "pw"})).json()["access_token"]
+            auth = {"Authorization": f"Bearer {token}"}
+            await client.put("/profiles/me/", headers=auth, json={"handle": "etag-check", "full_name": "Before"})
+
+            # Revalidating an unchanged profile
+            me = await client.get("/profiles/me/", headers=auth)
+            etag, last_modified = me.headers.get("etag"), me.headers.get("last-modified")
+            check(etag is not None and last_modified is not None, "GET /profiles/me/ has no ETag or Last-Modified")
+            check("private" in me.headers.get("cache-control", ""), "GET /profiles/me/ is not Cache-Control: private")
+            revalidated = await client.get("/profiles/me/", headers=auth | {"If-None-Match": etag})
+            check(revalidated.status_code == 304 and not revalidated.content, f"If-None-Match on /profiles/me/ returned {revalidated.status_code}")
+            check(statements(revalidated) == 1, f"a 304 from /profiles/me/ ran {statements(revalidated)} statements, expected 1")
+            since = await client.get("/profiles/me/", headers=auth | {"If-Modified-Since": last_modified})
+            check(since.status_code == 304, f"If-Modified-Since on /profiles/me/ returned {since.status_code}")
+            public = await client.get("/profiles/handle/etag-check")
+            check(public.headers.get("etag") == etag, f"public profile ETag {public.headers.get('etag')} differs from /profiles/me/ {etag}")
+            cached = await client.get("/profiles/handle/ETAG-check", headers={"If-None-Match": f'W/{etag}'})
+            check(cached.status_code == 304 and statements(cached) == 0, f"If-None-Match on a cached public profile returned {cached.status_code} "
+                                                                        f"after {statements(cached)} statements")
+
+            # Every kind of write moves the ETag on
+            writes = [
+                ("PUT /profiles/me/", lambda: client.put("/profiles/me/", headers=auth, json={"bio": "Edited"})),
+                ("POST experience", lambda: client.post("/profiles/me/experiences/", headers=auth, json={
+                    "title": "Engineer", "company_name": "Acme", "start_date": "2020-01-01"})),
+                ("POST education", lambda: client.post("/profiles/me/education/", headers=auth, json={
+                    "institution_name": "MIT", "degree": "BSc", "start_date": "2015-09-01"})),
+            ]
+            for name, write in writes:
+                before = (await client.get("/profiles/me/", headers=auth)).headers["etag"]
+                written = await write()
+                after = await client.get("/profiles/me/", headers=auth | {"If-None-Match": before})
+                check(after.status_code == 200 and after.headers["etag"] != before, f"{name} did not change the ETag")
+                check(written.headers.get("etag") == after.headers["etag"], f"{name} did not answer with the new ETag")
+                public = await client.get("/profiles/handle/etag-check", headers={"If-None-Match": before})
+                check(public.status_code == 200 and public.headers["etag"] == after.headers["etag"], f"public profile still at {before} after {name}")
+
+            # A public read that loaded the profile before a write fills the cache after the write's invalidation:
+            # the stale copy must be refused, not served until PROFILE_CACHE_TTL
+            loaded, invalidated = asyncio.Event(), asyncio.Event()
+            load_snapshot = crud.get_profile_snapshot_by_handle
+
+            async def load_then_wait(db, handle):
+                snapshot = await load_snapshot(db, handle=handle)
+                await db.rollback() # End the read transaction, so the write doesn't wait on it (SQLite)
+                loaded.set()
+                await invalidated.wait()
+                return snapshot
+
+            await client.put("/profiles/me/", headers=auth, json={"bio": "Read during a write"}) # So the read misses the cache
+            crud.get_profile_snapshot_by_handle = load_then_wait
+            slow_read = asyncio.create_task(client.get("/profiles/handle/etag-check"))
+            await asyncio.wait_for(loaded.wait(), timeout=10)
+            crud.get_profile_snapshot_by_handle = load_snapshot
+            await client.put("/profiles/me/", headers=auth, json={"bio": "Written during a read"})
+            invalidated.set()
+            await slow_read
+            bio = (await client.get("/profiles/handle/etag-check")).json()["bio"]
+            check(bio == "Written during a read", f"a read that raced a write cached the old public profile (bio {bio!r})")
+
+            me = (await client.get("/profiles/me/", headers=auth)).json()
+            experience_path = f"/profiles/me/experiences/{me['experiences'][0]['id']}"
+            education_path = f"/profiles/me/education/{me['education_history'][0]['id']}"
+
+            # Two tabs loaded the same version; the first save wins, the second is refused
+            seen = (await client.get("/profiles/me/", headers=auth)).headers["etag"]
+            first = await client.put("/profiles/me/", headers=auth | {"If-Match": seen}, json={"full_name": "Tab one"})
+            second = await client.put("/profiles/me/", headers=auth | {"If-Match": seen}, json={"full_name": "Tab two"})
+            check(first.status_code == 200, f"PUT /profiles/me/ with the current If-Match returned {first.status_code}")
+            check(second.status_code == 412, f"PUT /profiles/me/ with an outdated If-Match returned {second.status_code}")
+            full_name = (await client.get("/profiles/me/", headers=auth)).json()["full_name"]
+            check(full_name == "Tab one", f"the refused PUT still wrote: full_name is {full_name!r}")
+            weak = await client.put("/profiles/me/", headers=auth | {"If-Match": f"W/{first.headers['etag']}"}, json={"bio": "Weak"})
+            check(weak.status_code == 412, f"a weak If-Match ETag was accepted ({weak.status_code})")
+            anything = await client.put("/profiles/me/", headers=auth | {"If-Match": "*"}, json={"bio": "Any version"})
+            check(anything.status_code == 200, f"If-Match: * returned {anything.status_code}")
+
+            # The same on experience and education writes, which bump the profile's version too
+            for path, change in ((experience_path, {"title": "Lead"}), (education_path, {"degree": "PhD"})):
+                current = (await client.get("/profiles/me/", headers=auth)).headers["etag"]
+                refused = await client.put(path, headers=auth | {"If-Match": first.headers["etag"]}, json=change)
+                check(refused.status_code == 412, f"PUT {path} with an outdated If-Match returned {refused.status_code}")
+                after = (await client.get("/profiles/me/", headers=auth)).headers["etag"]
+                check(after == current, f"the refused PUT {path} changed the profile version")
+                empty = await client.put(path, headers=auth | {"If-Match": first.headers["etag"]}, json={})
+                check(empty.status_code == 412, f"PUT {path} with nothing to change and an outdated If-Match returned {empty.status_code}")
+                updated = await client.put(path, headers=auth | {"If-Match": current}, json=change)
+                check(updated.status_code == 200, f"PUT {path} with the current If-Match returned {updated.status_code}")
+                refused = await client.delete(path, headers=auth | {"If-Match": current})
+                check(refused.status_code == 412, f"DELETE {path} with an outdated If-Match returned {refused.status_code}")
+                check((await client.get(path, headers=auth)).status_code == 200, f"the refused DELETE {path} still deleted it")
+                deleted = await client.delete(path, headers=auth | {"If-Match": updated.headers["etag"]})
+                check(deleted.status_code == 204 and deleted.headers.get("etag") not in (None, updated.headers["etag"]),
+                      f"DELETE {path} with the current If-Match returned {deleted.status_code} (ETag {deleted.headers.get('etag')})")
+
+            # Savings: a client refetching a profile that rarely changes
+            for start in range(0, args.experiences, 3): # Batches of 3 stay within the route's query budget on SQLite
+                await client.post("/profiles/me/experiences/batch", headers=auth, json=[{
+                    "title": "Engineer", "company_name": f"Company {n}", "start_date": "2020-01-01",
+                    "description": "Built things. " * 20, "skills_used": ["Python", "SQL"]} for n in range(start, min(start + 3, args.experiences))])
+            print(f"{'repeated fetches of an unchanged profile':<52}{'bytes/req':>10}{'stmts/req':>10}{'ms/req':>8}")
+            for name, path, headers in (("GET /profiles/me/", "/profiles/me/", auth), ("GET /profiles/handle/{handle}", "/profiles/handle/etag-check", {})):
+                etag = (await client.get(path, headers=headers)).headers["etag"]
+                for mode, extra in (("full", {}), ("If-None-Match", {"If-None-Match": etag})):
+                    sent = queries = 0
+                    start = time.perf_counter()
+                    for _ in range(args.fetches):
+                        response = await client.get(path, headers=headers | extra)
+                        sent += len(response.content)
+                        queries += statements(response)
+                    elapsed = time.perf_counter() - start
+                    print(f"{name + ', ' + mode:<52}{sent / args.fetches:>10,.0f}{queries / args.fetches:>10.1f}"
+                          f"{elapsed / args.fetches * 1000:>8.2f}")
+        await database.dispose_engine()
+
+    asyncio.run(run())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Micro-benchmarks for every public function in app/crud.py.
+
+Each function is called `--iterations` times in a fresh session (as a request
+would), against a database seeded by seed_realistic_profiles() with snapshots,
+search documents and skills derived the way the CLI does. Writes are chained:
+what one benchmark creates, later ones read, update and delete, spread over
+many members so no single profile keeps growing. bcrypt runs at BCRYPT_ROUNDS
+(4 unless set) so password hashing doesn't drown the database work;
+benchmarks.auth_flood covers bcrypt itself.
+
+    python -m benchmarks.crud [--profiles 2000] [--iterations 200] [--rounds 3] [--json results.json]
+
+benchmarks.suite runs this together with the load scenarios and compares the
+results to a baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import date
+
+from benchmarks.common import configure_database, create_schema, seed_realistic_profiles, summarize
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+async def prepare_database(profiles: int, seed: int = 42) -> list[str]:
+    """Seed, then derive what the app keeps alongside the rows (as after a bulk load)."""
+    from app import cli
+    from app.passwords import password_hasher
+
+    url = os.environ["SUPABASE_DB_URL"]
+    # Every seeded member can sign in with the password "benchmark"
+    handles = seed_realistic_profiles(create_schema(url), profiles, seed=seed, hashed_password=await password_hasher.hash("benchmark"))
+    await cli.rebuild_snapshots(batch_size=1000)
+    await cli.rebuild_skills(batch_size=1000)
+    return handles
+
+
+def crud_benchmarks(handles: list[str], seed: int = 42):
+    """(name, coroutine function taking (db, i)) in the order they must run."""
+    from app import crud, schemas
+
+    rng = random.Random(seed)
+    members = [int(handle.removeprefix("member")) + 1 for handle in handles] # Seeded user id == profile id
+    member = lambda i: members[(i * 7919) % len(members)] # Spread over the table, same sequence every run
+    handle = lambda i: f"member{member(i) - 1}"
+    stored_hash = None
+    experience = schemas.ExperienceCreate(title="Engineer", company_name="Acme", start_date=date(2020, 1, 1),
+                                          description="Benchmarking. " * 10, skills_used=["Python", "SQL", "Go"])
+    education = schemas.EducationCreate(institution_name="MIT", degree="BSc", start_date=date(2015, 9, 1))
+    created_users: list[int] = []
+    created_experiences: list[tuple[int, int]] = [] # (experience id, member id)
+    created_batches: list[tuple[int, int]] = []
+    created_education: list[tuple[int, int]] = []
+    created_education_batches: list[tuple[int, int]] = []
+
+    async def hash_password(db, i):
+        nonlocal stored_hash
+        stored_hash = await crud.get_password_hash("benchmark")
+
+    async def create_user(db, i):
+        created_users.append((await crud.create_user(db, schemas.UserCreate(email=f"bench-user-{i}@example.com", password="pw"))).id)
+
+    async def create_user_profile(db, i):
+        await crud.create_user_profile(db, schemas.ProfileCreate(handle=f"bench-new-{i}", full_name="New Member"), user_id=created_users[i])
+
+    async def create_experience(db, i):
+        created_experiences.append(((await crud.create_profile_experience(db, experience, profile_id=member(i))).id, member(i)))
+
+    async def create_experiences(db, i):
+        for db_experience in await crud.create_profile_experiences(db, [experience] * 5, profile_id=member(i)):
+            created_batches.append((db_experience.id, member(i)))
+
+    async def update_experience(db, i):
+        experience_id, profile_id = created_experiences[i]
+        db_experience = await crud.get_experience(db, experience_id=experience_id, profile_id=profile_id)
+        await crud.update_profile_experience(db, schemas.ExperienceUpdate(title=f"Lead {i}"), db_experience=db_experience)
+
+    async def create_education(db, i):
+        created_education.append(((await crud.create_profile_education(db, education, profile_id=member(i))).id, member(i)))
+
+    async def create_education_batch(db, i):
+        for db_education in await crud.create_profile_education_batch(db, [education] * 5, profile_id=member(i)):
+            created_education_batches.append((db_education.id, member(i)))
+
+    async def update_education(db, i):
+        education_id, profile_id = created_education[i]
+        db_education = await crud.get_education_item(db, education_id=education_id, profile_id=profile_id)
+        await crud.update_profile_education(db, schemas.EducationUpdate(degree=f"MSc {i}"), db_education=db_education)
+
+    async def update_profile(db, i):
+        db_profile = await crud.get_profile_by_user_id(db, user_id=member(i))
+        await crud.update_user_profile(db, schemas.ProfileUpdate(bio=f"Updated bio {i}. " * 5), existing_profile=db_profile)
+
+    async def update_password_hash(db, i):
+        db_user = await crud.get_user(db, user_id=member(i))
+        await crud.update_user_password_hash(db, db_user=db_user, hashed_password=db_user.hashed_password)
+
+    async def public_profile_uncached(db, i):
+        crud.profile_cache.delete(crud._profile_cache_key(handle(i)))
+        await crud.get_public_profile_json(db, handle=handle(i))
+
+    async def sync_skills(db, i):
+        db_profile = await crud.get_profile_by_user_id(db, user_id=member(i))
+        await crud.sync_experience_skills(db, db_profile.experiences)
+        await db.commit()
+
+    async def rebuild_snapshot(db, i):
+        await crud.rebuild_profile_snapshot(db, member(i))
+        await db.commit()
+
+    skill_names = ["python", "sql", "go", "rust", "kubernetes", "skill 300"]
+    return [
+        ("get_password_hash", hash_password),
+        ("verify_password", lambda db, i: crud.verify_password("benchmark", stored_hash)),
+        ("get_user", lambda db, i: crud.get_user(db, user_id=member(i))),
+        ("get_user_by_email", lambda db, i: crud.get_user_by_email(db, email=f"member{member(i) - 1}@example.com")),
+        ("get_profile_id_by_user_id", lambda db, i: crud.get_profile_id_by_user_id(db, user_id=member(i))),
+        ("get_profile_by_user_id", lambda db, i: crud.get_profile_by_user_id(db, user_id=member(i))),
+        ("get_profile_by_handle", lambda db, i: crud.get_profile_by_handle(db, handle=handle(i).upper())),
+        ("get_profiles_by_handles (10)", lambda db, i: crud.get_profiles_by_handles(db, handles=[handle(i + n) for n in range(10)])),
+        ("get_or_create_profile", lambda db, i: crud.get_or_create_profile(db, user_id=member(i))),
+        ("get_profile_snapshot_by_handle", lambda db, i: crud.get_profile_snapshot_by_handle(db, handle=handle(i))),
+        ("get_public_profile_json (snapshot)", public_profile_uncached),
+        ("get_public_profile_json (cached)", lambda db, i: crud.get_public_profile_json(db, handle=handle(i % 50))),
+        ("get_profile_directory_page", lambda db, i: crud.get_profile_directory_page(db, limit=20, cursor=crud._encode_cursor(handle(i)))),
+        ("search_profiles", lambda db, i: crud.search_profiles(db, query=rng.choice(("engineer", "company 7", "led platform", handle(i))), limit=20)),
+        ("find_profiles_by_skills (all)", lambda db, i: crud.find_profiles_by_skills(db, skills=rng.sample(skill_names, 2), match_all=True, limit=20)),
+        ("find_profiles_by_skills (any)", lambda db, i: crud.find_profiles_by_skills(db, skills=rng.sample(skill_names, 2), match_all=False, limit=20)),
+        ("is_handle_available", lambda db, i: crud.is_handle_available(db, handle=rng.choice((handle(i), f"free-{i}")))),
+        ("create_user", create_user),
+        ("create_user_profile", create_user_profile),
+        ("create_user_with_profile", lambda db, i: crud.create_user_with_profile(db, schemas.UserCreate(email=f"bench-signup-{i}@example.com", password="pw"))),
+        ("update_user_password_hash", update_password_hash),
+        ("update_user_profile", update_profile),
+        ("rebuild_profile_snapshot", rebuild_snapshot),
+        ("sync_experience_skills", sync_skills),
+        ("invalidate_profile_cache", lambda db, i: crud.invalidate_profile_cache(db, member(i))),
+        ("create_profile_experience", create_experience),
+        ("create_profile_experiences (5)", create_experiences),
+        ("get_experience", lambda db, i: crud.get_experience(db, experience_id=created_experiences[i][0], profile_id=created_experiences[i][1])),
+        ("get_user_experience", lambda db, i: crud.get_user_experience(db, experience_id=created_experiences[i][0], user_id=created_experiences[i][1])),
+        ("update_profile_experience", update_experience),
+        ("update_user_experience", lambda db, i: crud.update_user_experience(
+            db, experience_id=created_experiences[i][0], user_id=created_experiences[i][1], experience_data=schemas.ExperienceUpdate(skills_used=["Rust"]))),
+        ("delete_profile_experience", lambda db, i: crud.delete_profile_experience(db, experience_id=created_experiences[i][0], profile_id=created_experiences[i][1])),
+        ("delete_user_experience", lambda db, i: crud.delete_user_experience(db, experience_id=created_batches[i][0], user_id=created_batches[i][1])),
+        ("create_profile_education", create_education),
+        ("create_profile_education_batch (5)", create_education_batch),
+        ("get_education_item", lambda db, i: crud.get_education_item(db, education_id=created_education[i][0], profile_id=created_education[i][1])),
+        ("get_user_education_item", lambda db, i: crud.get_user_education_item(db, education_id=created_education[i][0], user_id=created_education[i][1])),
+        ("update_profile_education", update_education),
+        ("update_user_education", lambda db, i: crud.update_user_education(
+            db, education_id=created_education[i][0], user_id=created_education[i][1], education_data=schemas.EducationUpdate(degree="PhD"))),
+        ("delete_profile_education", lambda db, i: crud.delete_profile_education(db, education_id=created_education[i][0], profile_id=created_education[i][1])),
+        ("delete_user_education", lambda db, i: crud.delete_user_education(
+            db, education_id=created_education_batches[i][0], user_id=created_education_batches[i][1])),
+    ]
+
+
+async def run_crud_benchmarks(handles: list[str], iterations: int, rounds: int = 3, seed: int = 42) -> dict[str, dict]:
+    """Run every benchmark `rounds` times over; p50_ms is the best round's median.
+
+    Like timeit's best-of-repeats, taking the fastest round keeps a burst of
+    machine noise in one round out of the comparison with a baseline.
+    """
+    from app.database import SessionLocal
+
+    benchmarks = crud_benchmarks(handles, seed=seed)
+    latencies = {name: [] for name, _ in benchmarks}
+    round_medians = {name: [] for name, _ in benchmarks}
+    for round_index in range(rounds):
+        for name, benchmark in benchmarks:
+            round_latencies = []
+            for i in range(round_index * iterations, (round_index + 1) * iterations):
+                async with SessionLocal() as db:
+                    start = time.perf_counter()
+                    await benchmark(db, i)
+                    round_latencies.append(time.perf_counter() - start)
+            latencies[name] += round_latencies
+            round_medians[name].append(summarize(round_latencies)["p50_ms"])
+    return {f"crud.{name}": dict(summarize(latencies[name]), p50_ms=min(round_medians[name])) for name, _ in benchmarks}
+
+
+def print_results(results: dict[str, dict]):
+    print(f"{'benchmark':<52}{'p50 (ms)':>10}{'p99 (ms)':>10}{'mean (ms)':>11}")
+    for name, result in results.items():
+        if "p50_ms" in result:
+            print(f"{name:<52}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}{result['mean_ms']:>11.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per benchmark per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    configure_database()
+
+    async def run():
+        from app.database import engine
+        handles = await prepare_database(args.profiles)
+        try:
+            return await run_crud_benchmarks(handles, args.iterations, rounds=args.rounds)
+        finally:
+            await engine.dispose()
+
+    results = asyncio.run(run())
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""GET /profiles latency by page depth: keyset cursor vs. the OFFSET equivalent.
+
+Seeds a large profiles table (no experiences/education), then for pages 1, 10,
+100, 1,000 and 10,000 measures GET /profiles?cursor=... through the app and the
+same projection fetched directly with the keyset filter and with LIMIT/OFFSET. The cursor for page N is
+built from the last handle of page N-1 outside the timed section.
+
+    python -m benchmarks.directory [--profiles 1000000] [--page-size 20] [--repeat 20]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles, summarize
+
+PAGES = (1, 10, 100, 1_000, 10_000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20, help="requests per page depth")
+    args = parser.parse_args()
+
+    url = configure_database()
+    sync_engine = create_schema(url)
+    started = time.perf_counter()
+    seed_profiles(sync_engine, args.profiles, experiences=0, education=0)
+    print(f"seeded {args.profiles} profiles in {time.perf_counter() - started:.1f}s")
+
+    import httpx
+    from sqlalchemy import select
+    from app import crud, models
+    from app.database import SessionLocal, engine
+    import main as api
+
+    pages = [page for page in PAGES if (page - 1) * args.page_size < args.profiles]
+    card = select(models.Profile.handle, models.Profile.full_name, models.Profile.profile_picture_url).filter(
+        models.Profile.handle.isnot(None)).order_by(models.Profile.handle)
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"{'':>8}{'GET /profiles (ms)':>24}{'keyset SQL (ms)':>24}{'OFFSET SQL (ms)':>24}")
+            print(f"{'page':>8}" + f"{'p50':>12}{'p99':>12}" * 3)
+            for page in pages:
+                skipped = (page - 1) * args.page_size
+                params = {"limit": args.page_size}
+                keyset_stmt = card
+                async with SessionLocal() as db:
+                    if skipped:
+                        last_handle = await db.scalar(card.with_only_columns(models.Profile.handle).offset(skipped - 1).limit(1))
+                        params["cursor"] = crud._encode_cursor(last_handle)
+                        keyset_stmt = card.filter(models.Profile.handle > last_handle)
+
+                keyset = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = await client.get("/profiles", params=params)
+                    response.raise_for_status()
+                    keyset.append(time.perf_counter() - start)
+
+                keyset_sql, offset = [], []
+                async with SessionLocal() as db:
+                    for stmt, latencies in ((keyset_stmt.limit(args.page_size), keyset_sql), (card.offset(skipped).limit(args.page_size), offset)):
+                        for _ in range(args.repeat):
+                            start = time.perf_counter()
+                            rows = (await db.execute(stmt)).all()
+                            latencies.append(time.perf_counter() - start)
+                        assert [row.handle for row in rows] == [item["handle"] for item in response.json()["items"]]
+
+                print(f"{page:>8}" + "".join(f"{summarize(latencies)[key]:>12.2f}" for latencies in (keyset, keyset_sql, offset) for key in ("p50_ms", "p99_ms")))
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""GET /handles/{handle}/available: how many checks reach the database, and latency.
+
+Seeds profiles, then replays the checks a signup form makes while someone types
+a handle (every prefix of a random word, mostly free) plus checks of taken
+handles in mixed case. Reports the share answered by the in-memory filter and
+the latency of filtered vs. database-confirmed answers.
+
+Fails (exit code 1) unless a handle another worker takes (inserted here behind
+the app's back) is reported as taken once the filter's next refresh (run by the
+lifespan's task in the app, directly here) has run.
+
+    python -m benchmarks.handles [--profiles 100000] [--typists 500]
+"""
+import argparse
+import asyncio
+import random
+import string
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import configure_database, create_schema, seed_profiles, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=100_000)
+    parser.add_argument("--typists", type=int, default=500, help="simulated handles typed letter by letter")
+    args = parser.parse_args()
+
+    url = configure_database()
+    sync_engine = create_schema(url)
+    handles = seed_profiles(sync_engine, args.profiles, experiences=0, education=0)
+
+    import httpx
+    from sqlalchemy import insert
+    from app import database, models
+    from app.handles import handle_filter
+    import main as api
+
+    failures: list[str] = []
+
+    rng = random.Random(7)
+    typed = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12))) for _ in range(args.typists)]
+    checks = [word[:n] for word in typed for n in range(3, len(word) + 1)]
+    checks += [rng.choice(handles).upper() for _ in range(len(checks) // 10)] # Some taken ones
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            async with database.read_session() as db: # What the lifespan's task does, off the request path
+                await handle_filter.rebuild(db)
+            print(f"filter built from {args.profiles} handles in {(time.perf_counter() - started) * 1000:.0f} ms")
+            by_path = {"filter only": [], "database": []}
+            for handle in checks:
+                before = handle_filter.database_checks
+                start = time.perf_counter()
+                response = await client.get(f"/handles/{handle}/available")
+                response.raise_for_status()
+                by_path["database" if handle_filter.database_checks > before else "filter only"].append(time.perf_counter() - start)
+
+            # Another worker takes a handle: this one's filter learns of it at its next refresh
+            taken_elsewhere = typed[0] + "x"
+            with sync_engine.begin() as conn:
+                user_id = conn.execute(insert(models.User).values(email="elsewhere@example.com", hashed_password="-")
+                                       .returning(models.User.id)).scalar_one()
+                conn.execute(insert(models.Profile).values(user_id=user_id, handle=taken_elsewhere, updated_at=datetime.now(timezone.utc)))
+            start = time.perf_counter()
+            async with database.read_session() as db: # The lifespan task's next pass
+                await handle_filter.refresh(db)
+            print(f"refresh after another worker's write (off the request path): {(time.perf_counter() - start) * 1000:.2f} ms")
+            response = await client.get(f"/handles/{taken_elsewhere.upper()}/available")
+            if response.json()["available"]:
+                failures.append(f"{taken_elsewhere}, taken by another worker, is still available after a refresh")
+        await database.dispose_engine()
+        print(f"{len(checks)} checks, {len(by_path['filter only']) / len(checks):.1%} answered without a query")
+        for path, latencies in by_path.items():
+            if latencies:
+                result = summarize(latencies)
+                print(f"  {path:<12} {result['count']:>7} checks  p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms")
+
+    asyncio.run(run())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
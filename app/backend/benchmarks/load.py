@@ -0,0 +1,262 @@
+"""ASGI-level load driver: mixed read/write scenarios over every route in main.py.
+
+Concurrent simulated members (seeded accounts, signed in through /signin) each
+pick weighted actions: browsing public profiles (skewed towards popular ones),
+the directory, search, skills and handle checks, editing their own profile,
+experiences and education, signing up and in, and a metrics scraper. The app is
+driven in process through httpx's ASGI transport, so there is no network or
+server in the measurement. Latency is measured around the app per route
+template, together with the statements each request ran.
+
+    python -m benchmarks.load [--profiles 2000] [--requests 3000] [--clients 16] [--scenarios read_heavy,write_heavy]
+
+Exits 1 if a route in main.py is not exercised by any scenario or a request
+fails unexpectedly. When adding a route, add an action for it below.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from benchmarks.common import api_routes, configure_database, record_routes, summarize
+
+os.environ.setdefault("INTERNAL_API_TOKEN", "load-test")
+# Every simulated member signs in from the same test address; auth admission is measured by benchmarks.auth_flood
+for name in ("AUTH_IP_PER_MINUTE", "AUTH_ACCOUNT_PER_MINUTE", "AUTH_MAX_CONCURRENT"):
+    os.environ.setdefault(name, "0")
+
+SCENARIOS = {
+    # Mostly anonymous browsing, as on a public profile site
+    "read_heavy": {
+        "public_profile": 40, "directory": 8, "search": 8, "skills": 6, "handle_check": 8, "root": 1,
+        "my_profile": 10, "update_profile": 2, "signin": 2, "signup": 1,
+        "add_experience": 2, "add_experiences": 1, "read_experience": 3, "edit_experience": 2, "remove_experience": 2,
+        "add_education": 1, "add_education_batch": 1, "read_education": 2, "edit_education": 1, "remove_education": 1,
+        "save_profile_batch": 1, "scrape": 1,
+    },
+    # Members filling in and editing their profiles
+    "write_heavy": {
+        "public_profile": 15, "directory": 3, "search": 3, "skills": 2, "handle_check": 5, "root": 1,
+        "my_profile": 8, "update_profile": 10, "signin": 4, "signup": 3,
+        "add_experience": 10, "add_experiences": 4, "read_experience": 6, "edit_experience": 8, "remove_experience": 8,
+        "add_education": 6, "add_education_batch": 2, "read_education": 4, "edit_education": 5, "remove_education": 5,
+        "save_profile_batch": 6, "scrape": 1,
+    },
+}
+
+SEARCH_QUERIES = ("engineer", "company 7", "led platform", "designer berlin", "univ")
+SKILLS = ("python", "sql", "go", "rust", "kubernetes", "react", "skill 300")
+
+
+class Member:
+    def __init__(self, email: str, headers: dict):
+        self.email = email
+        self.headers = headers
+        self.experience_ids: list[int] = []
+        self.education_ids: list[int] = []
+
+
+class Driver:
+    """Runs one action at a time for a member; counts responses it didn't expect."""
+
+    def __init__(self, client, handles: list[str], seed: int, write_lock: asyncio.Lock | None = None):
+        self.client = client
+        self.handles = handles
+        self.write_lock = write_lock
+        self.rng = random.Random(seed)
+        self.errors: list[str] = []
+        self.signups = 0
+
+    async def request(self, method: str, path: str, expect: tuple[int, ...] = (200,), **kwargs):
+        if method != "GET" and self.write_lock is not None:
+            async with self.write_lock:
+                response = await self.client.request(method, path, **kwargs)
+        else:
+            response = await self.client.request(method, path, **kwargs)
+        if response.status_code not in expect:
+            self.errors.append(f"{method} {path}: {response.status_code} {response.text[:120]}")
+        return response
+
+    def popular_handle(self) -> str:
+        return self.handles[int(len(self.handles) * self.rng.random() ** 3)]
+
+    async def sign_in(self, email: str) -> Member:
+        response = await self.request("POST", "/signin", data={"username": email, "password": "benchmark"})
+        return Member(email, {"Authorization": f"Bearer {response.json()['access_token']}"})
+
+    def experience(self) -> dict:
+        return {"title": self.rng.choice(("Engineer", "Lead", "Designer")), "company_name": f"Company {self.rng.randrange(1000)}",
+                "start_date": "2021-03-01", "description": "Load testing. " * self.rng.randrange(1, 20),
+                "skills_used": self.rng.sample(SKILLS, self.rng.randrange(4))}
+
+    def education(self) -> dict:
+        return {"institution_name": f"University {self.rng.randrange(300)}", "degree": "MSc", "start_date": "2012-09-01"}
+
+    async def run(self, action: str, member: Member):
+        rng = self.rng
+        if action == "public_profile":
+            await self.request("GET", f"/profiles/handle/{self.popular_handle()}")
+        elif action == "directory":
+            from app.crud import _encode_cursor
+            params = {"limit": 20} if rng.random() < 0.5 else {"limit": 20, "cursor": _encode_cursor(rng.choice(self.handles))}
+            await self.request("GET", "/profiles", params=params)
+        elif action == "search":
+            await self.request("GET", "/search", params={"q": rng.choice(SEARCH_QUERIES + (self.popular_handle(),))})
+        elif action == "skills":
+            await self.request("GET", "/skills/profiles", params={"skill": rng.sample(SKILLS, 2), "match": rng.choice(("all", "any"))})
+        elif action == "handle_check":
+            typed = rng.choice((self.popular_handle(), f"new-{rng.randrange(10**6)}"))
+            await self.request("GET", f"/handles/{typed[:rng.randrange(3, len(typed) + 1)]}/available")
+        elif action == "root":
+            await self.request("GET", "/")
+        elif action == "my_profile":
+            await self.request("GET", "/profiles/me/", headers=member.headers)
+        elif action == "update_profile":
+            await self.request("PUT", "/profiles/me/", headers=member.headers, json={"bio": f"Updated {rng.random()}. " * rng.randrange(1, 30)})
+        elif action == "signin":
+            await self.sign_in(member.email)
+        elif action == "signup":
+            self.signups += 1
+            await self.request("POST", "/signup", json={"email": f"load-{id(self)}-{self.signups}@example.com", "password": "benchmark"})
+        elif action == "add_experience":
+            response = await self.request("POST", "/profiles/me/experiences/", (201,), headers=member.headers, json=self.experience())
+            member.experience_ids.append(response.json()["id"])
+        elif action == "add_experiences":
+            response = await self.request("POST", "/profiles/me/experiences/batch", (201,), headers=member.headers,
+                                          json=[self.experience() for _ in range(3)])
+            member.experience_ids += [item["id"] for item in response.json()]
+        elif action in ("read_experience", "edit_experience", "remove_experience"):
+            if not member.experience_ids:
+                return await self.run("add_experience", member)
+            experience_id = rng.choice(member.experience_ids)
+            path = f"/profiles/me/experiences/{experience_id}"
+            if action == "read_experience":
+                await self.request("GET", path, headers=member.headers)
+            elif action == "edit_experience":
+                await self.request("PUT", path, headers=member.headers, json={"title": "Staff Engineer", "skills_used": rng.sample(SKILLS, 2)})
+            else:
+                member.experience_ids.remove(experience_id)
+                await self.request("DELETE", path, (204,), headers=member.headers)
+        elif action == "add_education":
+            response = await self.request("POST", "/profiles/me/education/", (201,), headers=member.headers, json=self.education())
+            member.education_ids.append(response.json()["id"])
+        elif action == "add_education_batch":
+            response = await self.request("POST", "/profiles/me/education/batch", (201,), headers=member.headers,
+                                          json=[self.education() for _ in range(2)])
+            member.education_ids += [item["id"] for item in response.json()]
+        elif action in ("read_education", "edit_education", "remove_education"):
+            if not member.education_ids:
+                return await self.run("add_education", member)
+            education_id = rng.choice(member.education_ids)
+            path = f"/profiles/me/education/{education_id}"
+            if action == "read_education":
+                await self.request("GET", path, headers=member.headers)
+            elif action == "edit_education":
+                await self.request("PUT", path, headers=member.headers, json={"degree": "PhD"})
+            else:
+                member.education_ids.remove(education_id)
+                await self.request("DELETE", path, (204,), headers=member.headers)
+        elif action == "save_profile_batch":
+            # The profile editor's save: profile fields plus an edit, a removal and an addition in one request
+            operations = [{"op": "update_profile", "data": {"bio": f"Saved {rng.random()}."}},
+                          {"op": "create_experience", "data": self.experience()}]
+            if member.experience_ids:
+                operations.append({"op": "update_experience", "id": rng.choice(member.experience_ids), "data": {"title": "Principal"}})
+            if member.education_ids:
+                operations.append({"op": "delete_education", "id": member.education_ids.pop()})
+            response = await self.request("PATCH", "/profiles/me/batch", headers=member.headers, json=operations)
+            member.experience_ids = [item["id"] for item in response.json()["experiences"]]
+        elif action == "scrape":
+            token = {"X-Internal-Token": os.environ["INTERNAL_API_TOKEN"]}
+            await self.request("GET", "/metrics", headers=token)
+            await self.request("GET", "/internal/pool", headers=token)
+        else:
+            raise ValueError(f"unknown action {action}")
+
+
+async def run_load(handles: list[str], scenarios: list[str], requests: int, clients: int, seed: int = 42) -> tuple[dict, list[str]]:
+    """Run each scenario; returns (results by metric name, problems found)."""
+    import httpx
+    from app.database import engine
+    import main as api
+
+    app, samples = record_routes(api.app)
+    # SQLite has a single writer and concurrent write transactions fail with "database is locked"
+    # instead of waiting, so writes are serialized in the driver (outside the measured latency)
+    write_lock = asyncio.Lock() if engine.dialect.name == "sqlite" else None
+    results, problems, covered = {}, [], set()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load") as client:
+        for scenario in scenarios:
+            weights = SCENARIOS[scenario]
+            drivers = [Driver(client, handles, seed=seed * 1000 + n, write_lock=write_lock) for n in range(clients)]
+            # Each simulated member is a seeded account spread over the table
+            members = [await driver.sign_in(f"{handles[(n * 7919) % len(handles)]}@example.com")
+                       for n, driver in enumerate(drivers)]
+            samples.clear()
+            remaining = iter(range(requests))
+
+            async def simulate(driver: Driver, member: Member):
+                for _ in remaining:
+                    await driver.run(driver.rng.choices(list(weights), weights=list(weights.values()))[0], member)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(simulate(driver, member) for driver, member in zip(drivers, members)))
+            elapsed = time.perf_counter() - start
+
+            total = sum(len(route_samples) for route_samples in samples.values())
+            errors = [error for driver in drivers for error in driver.errors]
+            results[f"load.{scenario}"] = {"requests": total, "requests_per_s": total / elapsed, "errors": len(errors)}
+            for (method, path), route_samples in sorted(samples.items(), key=lambda item: item[0][1]):
+                result = summarize([latency for latency, _ in route_samples])
+                result["statements_max"] = max(statements for _, statements in route_samples)
+                results[f"load.{scenario}.{method} {path}"] = result
+            covered |= set(samples)
+            problems += [f"{scenario}: {error}" for error in errors[:20]]
+    problems += [f"{method} {path}: not exercised by any scenario" for method, path in api_routes(api.app) if (method, path) not in covered]
+    return results, problems
+
+
+def print_results(results: dict[str, dict]):
+    for name, result in results.items():
+        if "requests_per_s" in result:
+            print(f"\n{name}: {result['requests']} requests, {result['requests_per_s']:,.0f} req/s, {result['errors']} errors")
+            print(f"  {'route':<58}{'count':>7}{'p50 (ms)':>10}{'p99 (ms)':>10}{'stmts':>7}")
+        elif name.startswith("load."):
+            route = name.split(".", 2)[2]
+            print(f"  {route:<58}{result['count']:>7}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['statements_max']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=3000, help="actions per scenario")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    configure_database()
+    from benchmarks.crud import prepare_database
+
+    async def run():
+        from app.database import engine
+        handles = await prepare_database(args.profiles)
+        try:
+            return await run_load(handles, args.scenarios.split(","), args.requests, args.clients)
+        finally:
+            await engine.dispose()
+
+    results, problems = asyncio.run(run())
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    raise SystemExit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
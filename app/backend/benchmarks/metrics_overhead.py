@@ -0,0 +1,75 @@
+"""Per-request cost of the metrics instrumentation (app.metrics).
+
+Drives the app in process through httpx's ASGI transport and times the same
+requests with metrics.enabled switched on and off, alternating rounds so drift
+affects both sides equally. Covers a request with no database work (GET /), a
+public profile read and GET /profiles/me.
+
+    python -m benchmarks.metrics_overhead [--profiles 1000] [--requests 2000] [--rounds 6]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint per round")
+    parser.add_argument("--rounds", type=int, default=6, help="rounds per setting, alternating on/off")
+    args = parser.parse_args()
+
+    url = configure_database()
+    handles = seed_profiles(create_schema(url), args.profiles)
+
+    import httpx
+    from app import metrics
+    from app.database import engine
+    import main as api
+
+    rng = random.Random(3)
+    token = api.create_access_token(data={"sub": "1", "pid": 1})
+    endpoints = {
+        "GET / (no database)": lambda: ("/", {}),
+        "GET /profiles/handle/{h}": lambda: (f"/profiles/handle/{rng.choice(handles)}", {}),
+        "GET /profiles/me/": lambda: ("/profiles/me/", {"Authorization": f"Bearer {token}"}),
+    }
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        latencies = {(name, on): [] for name in endpoints for on in (True, False)}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, request in endpoints.items(): # Warm caches and the pool
+                for _ in range(200):
+                    path, headers = request()
+                    (await client.get(path, headers=headers)).raise_for_status()
+            for round_index in range(args.rounds * 2):
+                metrics.enabled = round_index % 2 == 0
+                for name, request in endpoints.items():
+                    for _ in range(args.requests):
+                        path, headers = request()
+                        start = time.perf_counter()
+                        response = await client.get(path, headers=headers)
+                        latencies[name, metrics.enabled].append(time.perf_counter() - start)
+                        response.raise_for_status()
+        await engine.dispose()
+        metrics.enabled = True
+
+        print(f"{'endpoint':<28}{'off p50 (us)':>14}{'on p50 (us)':>14}{'overhead (us)':>15}{'off mean':>11}{'on mean':>11}")
+        for name in endpoints:
+            off, on = summarize(latencies[name, False]), summarize(latencies[name, True])
+            print(f"{name:<28}{off['p50_ms'] * 1000:>14.1f}{on['p50_ms'] * 1000:>14.1f}"
+                  f"{(on['p50_ms'] - off['p50_ms']) * 1000:>15.1f}{off['mean_ms'] * 1000:>11.1f}{on['mean_ms'] * 1000:>11.1f}")
+
+        start = time.perf_counter()
+        exposition = metrics.render_metrics()
+        print(f"/metrics render: {len(exposition.splitlines())} lines in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
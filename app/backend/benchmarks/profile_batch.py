@@ -0,0 +1,174 @@
+"""PATCH /profiles/me/batch check, and what it saves over one request per change.
+
+Replays the same profile editor saves (profile fields plus experience and
+education edits, removals and additions) twice: with the per-item endpoints,
+one request each, and as one batch. Fails (exit code 1) unless:
+
+  * both ways end with the same profile, and the batch answers with it and
+    its new ETag,
+  * a batch with an operation on an item of another profile, a taken handle,
+    an outdated If-Match or a null for a required field is refused (404, 409,
+    412, 422) and writes nothing,
+  * a batch's statement count doesn't grow with the number of items it
+    touches (as long as its updates change the same fields).
+
+Prints the requests, statements and time per save both ways.
+
+    python -m benchmarks.profile_batch [--profiles 200] [--saves 20] [--items 1]
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+def statements(response) -> int:
+    # From the Server-Timing header app.metrics adds
+    match = QUERY_COUNT.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else 0
+
+
+def comparable(profile: dict) -> dict:
+    # Item ids differ between the two accounts, as do the handle and owner
+    return {
+        "bio": profile["bio"], "full_name": profile["full_name"],
+        "experiences": sorted((e["title"], e["company_name"], tuple(e["skills_used"] or ())) for e in profile["experiences"]),
+        "education_history": sorted((e["institution_name"], e["degree"]) for e in profile["education_history"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--saves", type=int, default=20, help="editor saves replayed each way")
+    parser.add_argument("--items", type=int, default=1, help="experiences and education items edited and removed per save (twice as many "
+                        "added); on SQLite, which inserts the added rows one by one, more than 1 goes over the route's query budget")
+    args = parser.parse_args()
+
+    url = configure_database()
+    handles = seed_profiles(create_schema(url), args.profiles)
+
+    import httpx
+    from app import database
+    import main as api
+
+    failures: list[str] = []
+
+    def check(condition: bool, failure: str):
+        if not condition:
+            failures.append(failure)
+
+    def experience(save: int, n: int) -> dict:
+        return {"title": f"Engineer {save}.{n}", "company_name": f"Company {n}", "start_date": "2020-01-01",
+                "description": "Built things. " * 10, "skills_used": ["Python", f"Skill {n}"]}
+
+    def education(save: int, n: int) -> dict:
+        return {"institution_name": f"University {save}.{n}", "degree": "BSc", "start_date": "2012-09-01"}
+
+    def changes(save: int, profile: dict) -> list[dict]:
+        # One save: the profile fields, then each of `items` experiences and education items edited, removed and added
+        experiences = [e["id"] for e in profile["experiences"]]
+        education_items = [e["id"] for e in profile["education_history"]]
+        items = args.items
+        return [
+            {"op": "update_profile", "data": {"full_name": f"Editor {save}", "bio": f"Save number {save}"}},
+            *({"op": "update_experience", "id": item_id, "data": {"title": f"Lead {save}", "skills_used": ["Go"]}} for item_id in experiences[:items]),
+            *({"op": "delete_experience", "id": item_id} for item_id in experiences[items:2 * items]),
+            *({"op": "create_experience", "data": experience(save, n)} for n in range(2 * items)),
+            *({"op": "update_education", "id": item_id, "data": {"degree": f"MSc {save}"}} for item_id in education_items[:items]),
+            *({"op": "delete_education", "id": item_id} for item_id in education_items[items:2 * items]),
+            *({"op": "create_education", "data": education(save, n)} for n in range(2 * items)),
+        ]
+
+    async def per_item(client, auth: dict, operations: list[dict]) -> list:
+        # What the editor did before: one request per change
+        responses = []
+        for operation in operations:
+            kind = operation["op"].split("_", 1)[1]
+            path = {"experience": "/profiles/me/experiences/", "education": "/profiles/me/education/"}.get(kind)
+            if operation["op"] == "update_profile":
+                responses.append(await client.put("/profiles/me/", headers=auth, json=operation["data"]))
+            elif operation["op"].startswith("create"):
+                responses.append(await client.post(path, headers=auth, json=operation["data"]))
+            elif operation["op"].startswith("update"):
+                responses.append(await client.put(f"{path.rstrip('/')}/{operation['id']}", headers=auth, json=operation["data"]))
+            else:
+                responses.append(await client.delete(f"{path.rstrip('/')}/{operation['id']}", headers=auth))
+        responses.append(await client.get("/profiles/me/", headers=auth)) # And reloaded the profile to show the result
+        return responses
+
+    async def sign_up(client, email: str) -> dict:
+        await client.post("/signup", json={"email": email, "password": "pw"})
+        token = (await client.post("/signin", data={"username": email, "password": "pw"})).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://batch") as client:
+            accounts = {"per item": await sign_up(client, "items@example.com"), "batch": await sign_up(client, "batch@example.com")}
+            totals = {name: [0, 0, 0.0] for name in accounts} # requests, statements, seconds
+            batch_statements: dict[int, int] = {}
+            for save in range(args.saves):
+                profiles = {}
+                for name, auth in accounts.items():
+                    profile = (await client.get("/profiles/me/", headers=auth)).json()
+                    operations = changes(save, profile)
+                    start = time.perf_counter()
+                    if name == "batch":
+                        responses = [await client.patch("/profiles/me/batch", headers=auth, json=operations)]
+                        batch_statements[len(operations)] = statements(responses[0])
+                    else:
+                        responses = await per_item(client, auth, operations)
+                    totals[name][2] += time.perf_counter() - start
+                    totals[name][0] += len(responses)
+                    totals[name][1] += sum(statements(response) for response in responses)
+                    bad = [f"{r.request.method} {r.request.url.path}: {r.status_code}" for r in responses if r.status_code >= 400]
+                    check(not bad, f"save {save} ({name}) failed: {bad}")
+                    profiles[name] = responses[-1]
+                check(comparable(profiles["batch"].json()) == comparable(profiles["per item"].json()),
+                      f"save {save}: the batch and the per-item requests left different profiles")
+                current = await client.get("/profiles/me/", headers=accounts["batch"])
+                check(profiles["batch"].headers.get("etag") == current.headers["etag"], f"save {save}: the batch did not answer with the new ETag")
+            # Updates changing the same fields share one statement, so sizes differ only by the rows written one at a time on SQLite
+            sizes = sorted(batch_statements)
+            print(f"batch statements by operations in the save: {batch_statements}")
+            if url.startswith("postgresql") and len(sizes) > 1:
+                check(batch_statements[sizes[0]] == batch_statements[sizes[-1]], f"batch statements grow with its size: {batch_statements}")
+
+            # All or nothing
+            auth = accounts["batch"]
+            before = await client.get("/profiles/me/", headers=auth)
+            refused = {
+                "another profile's item": (404, {}, [{"op": "update_profile", "data": {"bio": "Never"}}, {"op": "delete_experience", "id": 1}]),
+                "a taken handle": (409, {}, [{"op": "create_experience", "data": experience(0, 0)},
+                                            {"op": "update_profile", "data": {"handle": handles[0].upper()}}]),
+                "an outdated If-Match": (412, {"If-Match": '"0.1"'}, [{"op": "create_education", "data": education(0, 0)}]),
+                "a null title": (422, {}, [{"op": "update_profile", "data": {"bio": "Never"}},
+                                           {"op": "update_experience", "id": before.json()["experiences"][0]["id"], "data": {"title": None}}]),
+            }
+            for name, (expected, headers, operations) in refused.items():
+                response = await client.patch("/profiles/me/batch", headers=auth | headers, json=operations)
+                check(response.status_code == expected, f"a batch with {name} returned {response.status_code}, expected {expected}")
+                after = await client.get("/profiles/me/", headers=auth | {"If-None-Match": before.headers["etag"]})
+                check(after.status_code == 304, f"a batch refused for {name} still changed the profile")
+
+            print(f"{f'{args.saves} editor saves':<24}{'requests/save':>14}{'stmts/save':>12}{'ms/save':>10}")
+            for name, (requests, queries, seconds) in totals.items():
+                print(f"{name:<24}{requests / args.saves:>14.1f}{queries / args.saves:>12.1f}{seconds / args.saves * 1000:>10.1f}")
+        await database.dispose_engine()
+
+    asyncio.run(run())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Query budget check for every route in main.py.
+
+Runs each endpoint through the ASGI app on a seeded database with
+QUERY_BUDGET_MODE=raise and FORBID_LAZY_LOADS=1, covering its costliest paths
+(cache misses, profiles without a stored snapshot, 404s). Prints the statements
+each route executed against its @query_budget and fails (exit code 1) if a route
+went over budget, hit a lazy load, has no budget, or was not exercised, or if an
+authenticated /profiles/me/ request read the users table (the caller comes from
+the token's claims, so that lookup would be a statement per request for nothing),
+or if an experience or education item route loaded the caller's profile row to
+check ownership (the item statement checks it through a profiles.user_id subquery).
+The item GETs' budget of 1 holds them to that single statement.
+
+    python -m benchmarks.query_budgets [--profiles 200]
+
+When adding a route, give it a @query_budget and call it from exercise_routes() below.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+from benchmarks.common import configure_database, create_schema, seed_profiles
+
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ["FORBID_LAZY_LOADS"] = "1"
+os.environ["INTERNAL_API_TOKEN"] = "budget-check"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+_QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+_READS_USERS = re.compile(r"\bFROM users\b")
+_LOADS_PROFILE_ROW = re.compile(r"^SELECT profiles\.id, profiles\.user_id\b")
+
+
+async def exercise_routes(call, handles: list[str]):
+    experience = {"title": "Engineer", "company_name": "Acme", "start_date": "2020-01-01", "skills_used": ["Python", "SQL"]}
+    education = {"institution_name": "MIT", "degree": "BSc", "start_date": "2015-09-01"}
+    internal = {"X-Internal-Token": "budget-check"}
+
+    await call("GET", "/")
+    await call("POST", "/signup", json={"email": "budget@example.com", "password": "pw"})
+    await call("POST", "/signup", json={"email": "budget@example.com", "password": "pw"}, expect=400)
+    token = (await call("POST", "/signin", data={"username": "budget@example.com", "password": "pw"})).json()["access_token"]
+    await call("POST", "/signin", data={"username": "budget@example.com", "password": "wrong"}, expect=401)
+    await call("POST", "/signin", data={"username": "legacy@example.com", "password": "pw"}) # Rehash + create the profile
+    auth = {"Authorization": f"Bearer {token}"}
+
+    await call("GET", "/profiles/me/", headers=auth)
+    await call("PUT", "/profiles/me/", headers=auth, json={"handle": "budget", "full_name": "Budget Check"})
+    await call("PUT", "/profiles/me/", headers=auth, json={"handle": handles[0]}, expect=409)
+
+    experience_id = (await call("POST", "/profiles/me/experiences/", headers=auth, json=experience, expect=201)).json()["id"]
+    await call("POST", "/profiles/me/experiences/batch", headers=auth, json=[experience] * 3, expect=201)
+    await call("GET", f"/profiles/me/experiences/{experience_id}", headers=auth)
+    await call("GET", "/profiles/me/experiences/0", headers=auth, expect=404)
+    await call("PUT", f"/profiles/me/experiences/{experience_id}", headers=auth, json={"title": "Lead", "skills_used": ["Go"]})
+    await call("PUT", "/profiles/me/experiences/0", headers=auth, json={"title": "Lead"}, expect=404)
+    await call("DELETE", f"/profiles/me/experiences/{experience_id}", headers=auth, expect=204)
+    await call("DELETE", "/profiles/me/experiences/0", headers=auth, expect=404)
+
+    education_id = (await call("POST", "/profiles/me/education/", headers=auth, json=education, expect=201)).json()["id"]
+    await call("POST", "/profiles/me/education/batch", headers=auth, json=[education] * 3, expect=201)
+    await call("GET", f"/profiles/me/education/{education_id}", headers=auth)
+    await call("GET", "/profiles/me/education/0", headers=auth, expect=404)
+    await call("PUT", f"/profiles/me/education/{education_id}", headers=auth, json={"degree": "MSc"})
+    await call("PUT", "/profiles/me/education/0", headers=auth, json={"degree": "MSc"}, expect=404)
+    await call("DELETE", f"/profiles/me/education/{education_id}", headers=auth, expect=204)
+    await call("DELETE", "/profiles/me/education/0", headers=auth, expect=404)
+
+    # One editor save: every kind of operation (SQLite inserts batch rows one by one, so one create of each)
+    saved = (await call("PATCH", "/profiles/me/batch", headers=auth, json=[
+        {"op": "update_profile", "data": {"handle": "Budget", "bio": "Saved in one batch"}},
+        {"op": "create_experience", "data": experience}, {"op": "create_education", "data": education},
+    ])).json()
+    experience_ids = [item["id"] for item in saved["experiences"]]
+    education_ids = [item["id"] for item in saved["education_history"]]
+    await call("PATCH", "/profiles/me/batch", headers=auth, json=[
+        {"op": "update_profile", "data": {"full_name": "Budget Batch"}},
+        {"op": "update_experience", "id": experience_ids[0], "data": {"title": "Lead", "skills_used": ["Rust"]}},
+        {"op": "delete_experience", "id": experience_ids[1]}, {"op": "create_experience", "data": experience},
+        {"op": "update_education", "id": education_ids[0], "data": {"degree": "MSc"}},
+        {"op": "delete_education", "id": education_ids[1]}, {"op": "create_education", "data": education},
+    ])
+    await call("PATCH", "/profiles/me/batch", headers=auth, json=[{"op": "delete_experience", "id": 0}], expect=404)
+
+    await call("GET", f"/profiles/handle/{handles[1]}") # Seeded without a snapshot: rendered from the ORM graph
+    await call("GET", "/profiles/handle/BUDGET") # Stored snapshot
+    await call("GET", "/profiles/handle/budget") # Cached
+    await call("GET", "/profiles/handle/nobody", expect=404)
+    next_cursor = (await call("GET", "/profiles", params={"limit": 50})).json()["next_cursor"]
+    await call("GET", "/profiles", params={"limit": 50, "cursor": next_cursor})
+    await call("GET", "/search", params={"q": "budget check"})
+    await call("GET", "/search", params={"q": "member", "limit": 50})
+    await call("GET", "/skills/profiles", params={"skill": ["python", "sql"]})
+    await call("GET", "/skills/profiles", params={"skill": ["python", "go"], "match": "any"})
+    await call("GET", f"/handles/{handles[2].upper()}/available")
+    await call("GET", "/handles/surely-free-handle/available")
+
+    await call("GET", "/internal/pool", headers=internal)
+    await call("GET", "/metrics", headers=internal)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=200)
+    args = parser.parse_args()
+
+    url = configure_database()
+    handles = seed_profiles(create_schema(url), args.profiles, skills=["Python", "SQL", "Go", "Rust"])
+
+    import httpx
+    from fastapi.routing import APIRoute
+    from sqlalchemy import event
+    from passlib.hash import bcrypt
+    from app import cli, metrics, models
+    from app.database import SessionLocal, engine
+    from app.handles import handle_filter
+    import main as api
+
+    observed: dict[tuple[str, str], int] = {}
+    failures: list[str] = []
+    executed: list[str] = [] # Statements of the current request (requests run one at a time)
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: executed.append(statement))
+
+    async def recording_app(scope, receive, send):
+        # Reads the matched route and the Server-Timing query count of each request
+        async def record(message):
+            if message["type"] == "http.response.start":
+                header = dict(message["headers"]).get(b"server-timing", b"").decode()
+                match = _QUERY_COUNT.search(header)
+                scope["query_count"] = int(match.group(1)) if match else 0
+            await send(message)
+        executed.clear()
+        await api.app(scope, receive, record)
+        route = scope.get("route")
+        if isinstance(route, APIRoute):
+            key = (scope["method"], route.path)
+            observed[key] = max(observed.get(key, 0), scope.get("query_count", 0))
+            if route.path.startswith("/profiles/me/") and any(_READS_USERS.search(statement) for statement in executed):
+                failures.append(f"{scope['method']} {route.path}: looked up the user the token already identifies")
+            if route.path.endswith(("{experience_id}", "{education_id}")) and any(_LOADS_PROFILE_ROW.search(statement) for statement in executed):
+                failures.append(f"{scope['method']} {route.path}: loaded the caller's profile to check the item's ownership")
+
+    async def run():
+        await cli.rebuild_skills(batch_size=500)
+        async with SessionLocal() as db: # An account from before profiles, with a hash of another bcrypt cost
+            db.add(models.User(email="legacy@example.com", hashed_password=bcrypt.using(rounds=5).hash("pw")))
+            await db.commit()
+            await handle_filter.rebuild(db) # What the lifespan's task does, off the request path
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=recording_app), base_url="http://budget") as client:
+            async def call(method: str, path: str, expect: int = 200, **kwargs):
+                try:
+                    response = await client.request(method, path, **kwargs)
+                except Exception as e: # QueryBudgetExceeded, or a raiseload() hit
+                    failures.append(f"{method} {path}: {type(e).__name__}: {e}")
+                    return None
+                if response.status_code != expect:
+                    failures.append(f"{method} {path}: expected {expect}, got {response.status_code}: {response.text[:200]}")
+                return response
+            try:
+                await exercise_routes(call, handles)
+            except Exception as e: # A failed call whose response a later step needed
+                failures.append(f"exercise_routes() stopped early: {type(e).__name__}: {e}")
+        await engine.dispose()
+
+    asyncio.run(run())
+
+    print(f"{'route':<50}{'budget':>8}{'max seen':>10}")
+    for route in api.app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for method in sorted(route.methods):
+            budget = metrics.endpoint_budget(route)
+            seen = observed.get((method, route.path))
+            print(f"{method + ' ' + route.path:<50}{'-' if budget is None else budget:>8}{'-' if seen is None else seen:>10}")
+            if budget is None:
+                failures.append(f"{method} {route.path}: no @query_budget")
+            if seen is None:
+                failures.append(f"{method} {route.path}: not exercised by exercise_routes()")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
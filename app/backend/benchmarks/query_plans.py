@@ -0,0 +1,172 @@
+"""Query plan regression check for app/crud.py.
+
+Seeds a database, runs every crud function while recording the SQL it emits,
+then EXPLAINs each SELECT/UPDATE/DELETE and fails (exit code 1) if any of them
+scans a large table sequentially. Uses EXPLAIN QUERY PLAN on SQLite and
+EXPLAIN (FORMAT JSON) on PostgreSQL (BENCH_DB_URL).
+
+    python -m benchmarks.query_plans [--profiles 5000] [--large-table-rows 1000]
+
+When adding a crud function, call it from exercise_crud() below.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.common import configure_database, create_schema, seed_profiles
+
+
+async def exercise_crud(profile_count: int):
+    from datetime import date
+    from app import cli, crud, schemas
+    from app.database import SessionLocal
+    from app.handles import handle_filter
+
+    user_id = profile_count // 2
+    await cli.rebuild_skills(batch_size=500) # Derive experience_skills for the seeded experiences
+    async with SessionLocal() as db:
+        await crud.get_user(db, user_id=user_id)
+        db_user = await crud.get_user_by_email(db, email=f"member{user_id}@example.com")
+        await crud.update_user_password_hash(db, db_user=db_user, hashed_password="x")
+        await crud.get_profile_id_by_user_id(db, user_id=user_id)
+        await crud.get_profile_by_handle(db, handle=f"Member{user_id}")
+        await crud.get_profiles_by_handles(db, handles=[f"member{user_id}", f"member{user_id + 1}"])
+        await handle_filter.rebuild(db)
+        await handle_filter.refresh(db)
+        await crud.is_handle_available(db, handle=f"MEMBER{user_id}")
+        await crud.get_profile_snapshot_by_handle(db, handle=f"member{user_id}")
+        await crud.get_public_profile_json(db, handle=f"member{user_id + 2}")
+        await crud.search_profiles(db, query=f"member{user_id}", limit=20)
+        page = await crud.get_profile_directory_page(db, limit=20)
+        await crud.get_profile_directory_page(db, limit=20, cursor=page.next_cursor)
+        profile = await crud.get_or_create_profile(db, user_id=user_id)
+        await crud.update_user_profile(db, profile_data=schemas.ProfileUpdate(handle=f"renamed{user_id}"), existing_profile=profile)
+
+        experience = await crud.create_profile_experience(
+            db, experience=schemas.ExperienceCreate(title="Engineer", company_name="Acme", start_date=date(2020, 1, 1), skills_used=["Python", "SQL"]), profile_id=profile.id)
+        experience = await crud.get_experience(db, experience_id=experience.id, profile_id=profile.id)
+        await crud.update_profile_experience(db, experience_data=schemas.ExperienceUpdate(title="Lead"), db_experience=experience)
+        await crud.delete_profile_experience(db, experience_id=experience.id, profile_id=profile.id)
+        experience = await crud.create_profile_experience(
+            db, experience=schemas.ExperienceCreate(title="Engineer", company_name="Acme", start_date=date(2020, 1, 1)), profile_id=profile.id)
+        await crud.find_profiles_by_skills(db, skills=["python", "sql"], match_all=True, limit=20)
+        await crud.find_profiles_by_skills(db, skills=["rust", "go"], match_all=False, limit=20)
+        await crud.get_user_experience(db, experience_id=experience.id, user_id=user_id)
+        await crud.update_user_experience(db, experience_id=experience.id, user_id=user_id, experience_data=schemas.ExperienceUpdate(title="Lead"))
+        await crud.delete_user_experience(db, experience_id=experience.id, user_id=user_id)
+
+        education = await crud.create_profile_education(
+            db, education=schemas.EducationCreate(institution_name="MIT", degree="BSc", start_date=date(2015, 9, 1)), profile_id=profile.id)
+        education = await crud.get_education_item(db, education_id=education.id, profile_id=profile.id)
+        await crud.update_profile_education(db, education_data=schemas.EducationUpdate(degree="MSc"), db_education=education)
+        await crud.delete_profile_education(db, education_id=education.id, profile_id=profile.id)
+        education = await crud.create_profile_education(
+            db, education=schemas.EducationCreate(institution_name="MIT", degree="BSc", start_date=date(2015, 9, 1)), profile_id=profile.id)
+        await crud.get_user_education_item(db, education_id=education.id, user_id=user_id)
+        await crud.update_user_education(db, education_id=education.id, user_id=user_id, education_data=schemas.EducationUpdate(degree="MSc"))
+        await crud.delete_user_education(db, education_id=education.id, user_id=user_id)
+
+        await crud.create_profile_experiences(
+            db, experiences=[schemas.ExperienceCreate(title="Engineer", company_name="Acme", start_date=date(2020, 1, 1))] * 3, profile_id=profile.id)
+        await crud.create_profile_education_batch(
+            db, education_items=[schemas.EducationCreate(institution_name="MIT", degree="BSc", start_date=date(2015, 9, 1))] * 3, profile_id=profile.id)
+
+        saved = await crud.apply_profile_batch(db, profile_id=profile.id, operations=[
+            schemas.UpdateProfileOperation(op="update_profile", data=schemas.ProfileUpdate(handle=f"batch{user_id}")),
+            schemas.CreateExperienceOperation(op="create_experience", data=schemas.ExperienceCreate(
+                title="Engineer", company_name="Acme", start_date=date(2020, 1, 1), skills_used=["Python"])),
+        ])
+        await crud.apply_profile_batch(db, profile_id=profile.id, operations=[
+            schemas.UpdateExperienceOperation(op="update_experience", id=saved.experiences[0].id, data=schemas.ExperienceUpdate(title="Lead")),
+            schemas.DeleteExperienceOperation(op="delete_experience", id=saved.experiences[1].id),
+            schemas.DeleteEducationOperation(op="delete_education", id=saved.education_history[0].id),
+        ])
+
+        new_user = await crud.create_user(db, user=schemas.UserCreate(email="plans@example.com", password="x"))
+        await crud.get_or_create_profile(db, user_id=new_user.id)
+        await crud.create_user_with_profile(db, user=schemas.UserCreate(email="plans2@example.com", password="x"))
+
+
+def _sqlite_seq_scans(rows, large_tables: set[str]) -> list[str]:
+    # EXPLAIN QUERY PLAN detail: "SCAN experiences" is a full scan,
+    # "SEARCH experiences USING INDEX ..." and "SCAN t USING COVERING INDEX ..." are not
+    scans = []
+    for row in rows:
+        words = row[-1].split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in large_tables and "INDEX" not in words:
+            scans.append(words[1])
+    return scans
+
+
+def _postgres_seq_scans(plan: dict, large_tables: set[str]) -> list[str]:
+    scans = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in large_tables:
+        scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans.extend(_postgres_seq_scans(child, large_tables))
+    return scans
+
+
+async def check_plans(statements: list[tuple[str, object]], large_table_rows: int) -> int:
+    from sqlalchemy import inspect
+    from app.database import Base, engine
+
+    async with engine.connect() as conn:
+        dialect = conn.dialect.name
+        table_names = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        large_tables = set()
+        for name in table_names:
+            if name in Base.metadata.tables:
+                if (await conn.exec_driver_sql(f"SELECT count(*) FROM {name}")).scalar() >= large_table_rows:
+                    large_tables.add(name)
+        await conn.exec_driver_sql("ANALYZE")
+
+        failures = 0
+        for statement, parameters in statements:
+            if dialect == "postgresql":
+                result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                plan = result.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                scans = _postgres_seq_scans(plan[0]["Plan"], large_tables)
+            else:
+                scans = _sqlite_seq_scans((await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)).all(), large_tables)
+            status = f"SEQ SCAN on {', '.join(sorted(set(scans)))}" if scans else "ok"
+            failures += bool(scans)
+            print(f"{status:<32} {' '.join(statement.split())[:140]}")
+    print(f"\n{len(statements)} statements, {failures} with sequential scans on tables >= {large_table_rows} rows: {sorted(large_tables)}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--large-table-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    url = configure_database()
+    seed_profiles(create_schema(url), args.profiles, skills=["Python", "SQL", "Rust", "Go", "Kubernetes"])
+
+    from sqlalchemy import event
+    from app.database import engine
+
+    statements: dict[str, object] = {}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            statements.setdefault(statement, parameters) # One plan per distinct statement
+
+    async def run() -> int:
+        await exercise_crud(args.profiles)
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            return await check_plans(list(statements.items()), args.large_table_rows)
+        finally:
+            await engine.dispose()
+
+    sys.exit(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Read-replica routing check, on two local SQLite files.
+
+The replica is a copy of the primary's file that only catches up when the
+script copies it again, so replication lag is as long as the script wants.
+Drives the app in process and fails (exit code 1) unless:
+
+  * public and read-only endpoints read from the replica,
+  * a member who just wrote reads their own writes (profile, experience, public
+    profile) from the primary, even though the replica hasn't caught up,
+  * the public profile cache is not refilled from the stale replica,
+  * after DB_READ_PIN_SECONDS their reads go back to the replica.
+
+It also shows the control case (pins cleared, so the stale replica answers) and
+prints the routing counters from /metrics.
+
+    python -m benchmarks.replicas [--profiles 500] [--reads 2000]
+
+With BENCH_DB_URL and BENCH_REPLICA_URL pointing at a PostgreSQL primary and a
+streaming replica of it, the same checks run against real replication (the
+copying and the control case are skipped).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles
+
+PIN_SECONDS = 1.0
+os.environ["DB_READ_PIN_SECONDS"] = str(PIN_SECONDS)
+os.environ["INTERNAL_API_TOKEN"] = "replica-check"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=2000, help="anonymous public reads in the routing share check")
+    args = parser.parse_args()
+
+    url = configure_database()
+    handles = seed_profiles(create_schema(url), args.profiles)
+    replica_url = os.environ.get("BENCH_REPLICA_URL")
+    copy_files = replica_url is None
+    if copy_files:
+        if not url.startswith("sqlite:///"):
+            sys.exit("BENCH_DB_URL is not SQLite: set BENCH_REPLICA_URL to a replica of it")
+        primary_path = url.removeprefix("sqlite:///")
+        replica_path = os.path.join(os.path.dirname(primary_path), "replica.db")
+        replica_url = "sqlite:///" + replica_path
+    os.environ["SUPABASE_DB_REPLICA_URLS"] = replica_url
+
+    def replicate():
+        # The replica catches up: copy the primary's committed state over it
+        if copy_files:
+            with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+                source.backup(target)
+
+    import httpx
+    from app import database, metrics
+    import main as api
+
+    failures: list[str] = []
+
+    def check(condition: bool, failure: str):
+        if not condition:
+            failures.append(failure)
+
+    def routed() -> dict:
+        return dict(metrics.DB_SESSION_ROUTING._values)
+
+    def routed_since(before: dict) -> dict:
+        return {key: value - before.get(key, 0) for key, value in routed().items() if value != before.get(key, 0)}
+
+    async def run():
+        replicate()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://replicas") as client:
+            # Anonymous public reads: all on the replica
+            rng = random.Random(5)
+            before = routed()
+            for _ in range(args.reads):
+                path = rng.choice((f"/profiles/handle/{rng.choice(handles)}", "/profiles", "/search?q=member", f"/handles/{rng.choice(handles)}/available"))
+                check((await client.get(path)).status_code == 200, f"GET {path} failed")
+            public = routed_since(before)
+            check(set(public) == {("replica", "read")}, f"anonymous reads were routed {public}, expected only to the replica")
+
+            # A new member signs up and the replica catches up
+            await client.post("/signup", json={"email": "replica@example.com", "password": "pw"})
+            token = (await client.post("/signin", data={"username": "replica@example.com", "password": "pw"})).json()["access_token"]
+            auth = {"Authorization": f"Bearer {token}"}
+            await client.put("/profiles/me/", headers=auth, json={"handle": "replica-check", "full_name": "Before"})
+            replicate()
+            await asyncio.sleep(PIN_SECONDS + 0.1)
+
+            # They write; the replica has not caught up, yet they read their own writes
+            before = routed()
+            await client.put("/profiles/me/", headers=auth, json={"full_name": "After"})
+            experience_id = (await client.post("/profiles/me/experiences/", headers=auth, json={
+                "title": "Engineer", "company_name": "Acme", "start_date": "2020-01-01"})).json()["id"]
+            me = (await client.get("/profiles/me/", headers=auth)).json()
+            check(me["full_name"] == "After", f"GET /profiles/me/ right after a write returned {me['full_name']!r}")
+            experience = await client.get(f"/profiles/me/experiences/{experience_id}", headers=auth)
+            check(experience.status_code == 200, f"GET of a just-created experience returned {experience.status_code}")
+            public_profile = (await client.get("/profiles/handle/replica-check")).json()
+            check(public_profile["full_name"] == "After", f"public profile right after a write showed {public_profile['full_name']!r}")
+            pinned = routed_since(before)
+            check(("replica", "read") not in pinned, f"reads right after a write were routed {pinned}, expected only to the primary")
+
+            # Once the pin expires, the member's reads go back to the replica (stale until it catches up)
+            await asyncio.sleep(PIN_SECONDS + 0.1)
+            before = routed()
+            me = (await client.get("/profiles/me/", headers=auth)).json()
+            check(routed_since(before) == {("replica", "read"): 1}, f"GET /profiles/me/ after the pin expired was routed {routed_since(before)}")
+            if copy_files:
+                check(me["full_name"] == "Before", "the replica file was expected to be stale")
+                # Control: the same write and read with the pin cleared shows what the pins prevent
+                await client.put("/profiles/me/", headers=auth, json={"full_name": "Unpinned"})
+                database.read_pins.clear()
+                stale = (await client.get("/profiles/me/", headers=auth)).json()["full_name"]
+                print(f"control: without the pin, a read right after a write returned {stale!r} (expected 'Before')")
+                replicate()
+            public_profile = (await client.get("/profiles/handle/replica-check")).json()
+            check(public_profile["full_name"] in ("After", "Unpinned"), f"the profile cache was refilled from the stale replica: {public_profile['full_name']!r}")
+
+            print(f"\n{'db_read_sessions_total (target, reason)':<52}{'sessions':>10}")
+            for (target, reason), count in sorted(routed().items()):
+                print(f"{target + ', ' + reason:<52}{count:>10}")
+            pool = (await client.get("/internal/pool", headers={"X-Internal-Token": "replica-check"})).json()
+            check(len(pool.get("replicas", [])) == 1, "/internal/pool does not list the replica pool")
+        await database.dispose_engine()
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    print(f"\nchecked in {time.perf_counter() - start:.1f}s")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""GET /search latency at 100k and 1M profiles.
+
+For each size the database is seeded (one experience and one education item per
+profile), indexed with the same code path as `python -m app.cli rebuild-search`,
+then queried through the app with a selective query (one member's name), a
+medium one (one of 1,000 companies) and a broad one (a title every member has,
+so every document matches and must be ranked).
+
+    python -m benchmarks.search [--sizes 100000,1000000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles, summarize
+
+
+def queries(size: int) -> dict[str, str]:
+    return {
+        "selective": f"member{size // 2}",
+        "medium": "company 42",
+        "broad": "engineer",
+        "broad prefix": "eng",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000", help="comma-separated profile counts")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per query")
+    args = parser.parse_args()
+
+    url = configure_database()
+
+    import httpx
+    from app import cli
+    from app.database import engine
+    import main as api
+
+    async def run(size: int):
+        started = time.perf_counter()
+        await cli.rebuild_search(batch_size=2000)
+        print(f"indexed {size} profiles in {time.perf_counter() - started:.1f}s")
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, q in queries(size).items():
+                latencies = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = await client.get("/search", params={"q": q, "limit": 20})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                result = summarize(latencies)
+                print(f"  {name:<14}{q!r:<18}{len(response.json()['items']):>4} hits"
+                      f"  p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms")
+        await engine.dispose()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        seed_profiles(create_schema(url), size, experiences=1, education=1)
+        print(f"{size} profiles")
+        asyncio.run(run(size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Serialization cost of one profile with 0, 20 and 200 experiences.
+
+Compares the response_model path (validate schemas.Profile from attributes, then
+encode with Pydantic or with jsonable_encoder + stdlib json) against the
+FAST_RESPONSES path (copy ORM attributes into dicts, encode with orjson). No
+database is involved: the ORM objects are built in memory.
+
+    python -m benchmarks.serialization [--number 200]
+"""
+import argparse
+import json
+import timeit
+from datetime import date
+
+from benchmarks.common import configure_database
+
+EXPERIENCE_COUNTS = (0, 20, 200)
+
+
+def build_profile(experiences: int):
+    from app import models
+
+    return models.Profile(
+        id=1, user_id=1, handle="ada", full_name="Ada Lovelace", bio="Analyst. " * 30,
+        github_url="https://github.com/ada",
+        experiences=[
+            models.Experience(id=i, profile_id=1, title="Engineer", company_name=f"Company {i}", location="London",
+                              start_date=date(2000 + i % 20, 1, 1), end_date=None, description="Did things. " * 20,
+                              skills_used=["Python", "SQL", "Analytical Engines"])
+            for i in range(experiences)
+        ],
+        education_history=[
+            models.Education(id=1, profile_id=1, institution_name="University of London", degree="BSc",
+                             start_date=date(1990, 9, 1), end_date=date(1993, 6, 30))
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200, help="serializations per measurement")
+    args = parser.parse_args()
+
+    configure_database()
+    from fastapi.encoders import jsonable_encoder
+    from app import schemas, serialization
+
+    strategies = {
+        "validate + stdlib json": lambda p: json.dumps(jsonable_encoder(schemas.Profile.model_validate(p))).encode(),
+        "validate + pydantic": lambda p: schemas.Profile.model_validate(p).model_dump_json().encode(),
+        "fast (dict + orjson)": lambda p: serialization.dumps(serialization.profile_dict(p)),
+    }
+
+    print(f"{'strategy':<24}" + "".join(f"{f'{n} exp (us)':>16}" for n in EXPERIENCE_COUNTS))
+    profiles = {n: build_profile(n) for n in EXPERIENCE_COUNTS}
+    for n, profile in profiles.items():
+        outputs = {name: json.loads(fn(profile)) for name, fn in strategies.items()}
+        assert all(out == outputs["validate + pydantic"] for out in outputs.values()), f"outputs differ at {n} experiences"
+    for name, fn in strategies.items():
+        timings = []
+        for n in EXPERIENCE_COUNTS:
+            profile = profiles[n]
+            best = min(timeit.repeat(lambda: fn(profile), number=args.number, repeat=5))
+            timings.append(best / args.number * 1e6)
+        print(f"{name:<24}" + "".join(f"{t:>16.1f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
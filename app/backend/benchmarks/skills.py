@@ -0,0 +1,68 @@
+"""GET /skills/profiles latency against posting list size.
+
+Seeds profiles whose experiences list skills from a pool of 500 with a skewed
+distribution (skill0 is the most common), derives experience_skills the way
+`python -m app.cli rebuild-skills` does, then queries rare, medium and common
+skills, all-of and any-of. Latency should follow the number of postings read,
+not the number of profiles.
+
+    python -m benchmarks.skills [--profiles 200000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import configure_database, create_schema, seed_profiles, summarize
+
+SKILLS = [f"skill{i}" for i in range(500)]
+QUERIES = {
+    "rare": ["skill400"],
+    "rare & rare": ["skill300", "skill400"],
+    "medium": ["skill50"],
+    "common": ["skill0"],
+    "common & medium": ["skill0", "skill50"],
+    "common & common": ["skill0", "skill1"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    url = configure_database()
+    seed_profiles(create_schema(url), args.profiles, experiences=2, education=0, skills=SKILLS)
+
+    import httpx
+    from sqlalchemy import func, select
+    from app import cli, models
+    from app.database import SessionLocal, engine
+    import main as api
+
+    async def run():
+        started = time.perf_counter()
+        await cli.rebuild_skills(batch_size=5000)
+        print(f"{args.profiles} profiles, skills derived in {time.perf_counter() - started:.1f}s")
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"{'query':<18}{'match':<6}{'postings':>10}{'profiles':>10}{'p50 ms':>10}{'p99 ms':>10}")
+            for name, skills in QUERIES.items():
+                async with SessionLocal() as db:
+                    postings = await db.scalar(select(func.count()).select_from(models.ExperienceSkill).join(models.Skill).filter(models.Skill.name.in_(skills)))
+                for match in ("all", "any") if len(skills) > 1 else ("all",):
+                    latencies = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        response = await client.get("/skills/profiles", params={"skill": skills, "match": match})
+                        response.raise_for_status()
+                        latencies.append(time.perf_counter() - start)
+                    result = summarize(latencies)
+                    print(f"{name:<18}{match:<6}{postings:>10}{response.json()['total']:>10}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
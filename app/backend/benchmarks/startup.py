@@ -0,0 +1,132 @@
+"""Import and startup time of a fresh worker process.
+
+Each run starts a new interpreter (as a new worker would) and times, in order:
+importing main, create_app(), the lifespan's warmup (deferred imports, pooled
+connections) and the first requests, against a seeded SQLite file (or
+BENCH_DB_URL). Also times the imports the tools pay for: app.models (Alembic,
+the benchmarks' schema setup) and app.cli. Reports the median of --runs.
+
+    python -m benchmarks.startup [--runs 10] [--importtime 15]
+
+Exits 1 if importing main, app.cli or app.models without SUPABASE_DB_URL fails,
+or loads a database driver, passlib or python-jose. --importtime N also lists
+the N slowest modules of `import main` (python -X importtime, self time).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, configure_database, create_schema, seed_profiles
+
+# Modules that importing the app must leave for first use (or the lifespan)
+DEFERRED = ("aiosqlite", "asyncpg", "passlib", "jose")
+
+WORKER = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+
+async def serve():
+    import httpx
+    timings = {}
+    async with app.router.lifespan_context(app):
+        timings["lifespan_ms"] = (time.perf_counter() - created) * 1000
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+            for name, path in (("first_request_ms", "/profiles/handle/member1"), ("second_request_ms", "/profiles/handle/member2")):
+                request_start = time.perf_counter()
+                assert (await client.get(path)).status_code == 200
+                timings[name] = (time.perf_counter() - request_start) * 1000
+    return timings
+
+timings = asyncio.run(serve())
+timings.update(import_main_ms=(imported - start) * 1000, create_app_ms=(created - imported) * 1000,
+               ready_ms=(created - start) * 1000 + timings["lifespan_ms"])
+print(json.dumps(timings))
+"""
+
+IMPORT_ONLY = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from app import database
+print(json.dumps({{"ms": elapsed * 1000, "engine_created": database._engine is not None,
+                  "loaded": [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+
+def run_python(code: str, env: dict, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--profiles", type=int, default=1000)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="list the N slowest modules of `import main`")
+    args = parser.parse_args()
+
+    url = configure_database()
+    seed_profiles(create_schema(url), args.profiles)
+    with_url = dict(os.environ, BCRYPT_ROUNDS="4")
+    without_url = {key: value for key, value in with_url.items() if key != "SUPABASE_DB_URL"}
+
+    samples: dict[str, list[float]] = {}
+    failures: list[str] = []
+    for _ in range(args.runs):
+        # A bare interpreter's start and exit, for reference
+        start = time.perf_counter()
+        run_python("pass", without_url)
+        samples.setdefault("interpreter_ms", []).append((time.perf_counter() - start) * 1000)
+
+        for module in ("app.models", "app.cli", "main"):
+            result = run_python(IMPORT_ONLY.format(module=module, deferred=DEFERRED), without_url)
+            if result.returncode != 0:
+                failures.append(f"import {module} without SUPABASE_DB_URL failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+            imported = json.loads(result.stdout)
+            samples.setdefault(f"import {module}", []).append(imported["ms"])
+            if imported["engine_created"]:
+                failures.append(f"import {module} created the database engine")
+            if imported["loaded"]:
+                failures.append(f"import {module} loaded {', '.join(imported['loaded'])}")
+
+        result = run_python(WORKER, with_url)
+        if result.returncode != 0:
+            failures.append(f"worker startup failed: {result.stderr.strip()[-500:]}")
+            break
+        for name, value in json.loads(result.stdout).items():
+            samples.setdefault(name, []).append(value)
+
+    print(f"{'stage (fresh process, median of ' + str(args.runs) + ')':<52}{'ms':>10}")
+    # `import main` as timed inside the worker; the import-only run of it is there for the checks
+    for name in ("interpreter_ms", "import app.models", "import app.cli", "import_main_ms", "create_app_ms",
+                 "lifespan_ms", "ready_ms", "first_request_ms", "second_request_ms"):
+        if name in samples:
+            print(f"{name.removesuffix('_ms').replace('_', ' '):<52}{statistics.median(samples[name]):>10.1f}")
+
+    if args.importtime:
+        result = run_python("import main", with_url, "-X", "importtime")
+        rows = []
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line and "self" not in line:
+                self_us, _, module = line.removeprefix("import time:").split("|")
+                rows.append((int(self_us), module.strip()))
+        print(f"\n{'slowest modules of `import main`':<52}{'self ms':>10}")
+        for self_us, module in sorted(rows, reverse=True)[:args.importtime]:
+            print(f"{module:<52}{self_us / 1000:>10.1f}")
+
+    for failure in sorted(set(failures)):
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
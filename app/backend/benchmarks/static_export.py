@@ -0,0 +1,124 @@
+"""Static export check and timing (python -m app.cli export-static).
+
+On a seeded database, runs a full export, then again with nothing changed, then
+after a few edits, no-op saves and a rename, and fails (exit code 1) unless:
+
+  * every public profile is written, and its .json, .json.gz and .json.br all
+    hold the same bytes GET /profiles/handle/{handle} returns,
+  * a run with nothing changed loads no profile and rewrites no file,
+  * an incremental run loads just the profiles whose version changed, rewrites
+    just those whose JSON changed (not the no-op saves), removes the renamed
+    profile's old files and leaves every other file untouched,
+  * --full loads every profile again but still rewrites nothing unchanged.
+
+Prints each run's time and what it did, and the total size of each variant.
+
+    python -m benchmarks.static_export [--profiles 2000] [--workers N]
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import configure_database
+
+
+def file_times(output_dir: str) -> dict[str, int]:
+    directory = os.path.join(output_dir, "p")
+    return {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    configure_database()
+    import brotli
+    import httpx
+    from benchmarks.crud import prepare_database
+    from app import crud, schemas, static_export
+    from app.database import dispose_engine, get_sessionmaker
+    import main as api
+
+    output_dir = tempfile.mkdtemp(prefix="lavendar-export-")
+    failures: list[str] = []
+
+    def check(condition: bool, failure: str):
+        if not condition:
+            failures.append(failure)
+
+    async def export(name: str, full: bool = False) -> dict[str, int]:
+        start = time.perf_counter()
+        stats = await static_export.export_profiles(output_dir, workers=args.workers, batch_size=500, full=full)
+        print(f"{name:<40}{time.perf_counter() - start:>8.2f}s  " + ", ".join(f"{key} {value}" for key, value in stats.items()))
+        return stats
+
+    async def check_files(client, handles: list[str]):
+        for handle in handles:
+            served = (await client.get(f"/profiles/handle/{handle}")).content
+            path = static_export.profile_path(output_dir, handle)
+            with open(path + ".json", "rb") as f:
+                check(f.read() == served, f"{handle}.json differs from GET /profiles/handle/{handle}")
+            with open(path + ".json.gz", "rb") as f:
+                check(gzip.decompress(f.read()) == served, f"{handle}.json.gz does not decompress to the profile")
+            with open(path + ".json.br", "rb") as f:
+                check(brotli.decompress(f.read()) == served, f"{handle}.json.br does not decompress to the profile")
+
+    async def edit(handle: str, /, **changes) -> None:
+        async with get_sessionmaker()() as db:
+            db_profile = await crud.get_profile_by_handle(db, handle=handle)
+            await crud.update_user_profile(db, schemas.ProfileUpdate(**changes), existing_profile=db_profile)
+
+    async def run():
+        handles = await prepare_database(args.profiles)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://export") as client:
+            stats = await export("full export")
+            check(stats["written"] == len(handles), f"full export wrote {stats['written']} of {len(handles)} profiles")
+            await check_files(client, handles[::max(1, len(handles) // 50)])
+            sizes = {suffix: 0 for suffix in static_export.VARIANTS}
+            for name in os.listdir(os.path.join(output_dir, "p")):
+                for suffix in sizes:
+                    if name.endswith(suffix):
+                        sizes[suffix] += os.path.getsize(os.path.join(output_dir, "p", name))
+            print("total size: " + ", ".join(f"{suffix} {size / 1024:,.0f} KiB" for suffix, size in sizes.items()))
+
+            before = file_times(output_dir)
+            stats = await export("nothing changed")
+            check(stats["loaded"] == stats["written"] == 0, f"a run with nothing changed loaded {stats['loaded']} and wrote {stats['written']}")
+            check(file_times(output_dir) == before, "a run with nothing changed touched files")
+
+            edited, saved, (renamed, *_) = handles[10:15], handles[20:23], handles[30:31]
+            for handle in edited:
+                await edit(handle, bio=f"Edited after the export: {handle}")
+            for handle in saved:
+                await edit(handle) # Bumps the version, same JSON
+            await edit(renamed, handle=f"{renamed}-renamed")
+            stats = await export("after 5 edits, 3 no-op saves, 1 rename")
+            check(stats["loaded"] == 9, f"the incremental run loaded {stats['loaded']} profiles, expected the 9 changed")
+            check(stats["written"] == 6 and stats["unchanged"] == 3 and stats["removed"] == 1, f"the incremental run did {stats}, "
+                  "expected 6 written (edits and the rename), 3 unchanged (no-op saves), 1 removed")
+            await check_files(client, edited + [f"{renamed}-renamed"])
+            check(not os.path.exists(static_export.profile_path(output_dir, renamed) + ".json"), "the renamed profile's old file is still there")
+            after = file_times(output_dir)
+            rewritten = {name.split(".json")[0] for name in before if after.get(name) != before[name]}
+            check(rewritten == set(edited) | {renamed}, f"files rewritten besides the changed profiles: {sorted(rewritten - set(edited) - {renamed})}")
+
+            before = file_times(output_dir)
+            stats = await export("--full, nothing changed", full=True)
+            check(stats["loaded"] == len(handles) and stats["written"] == 0, f"--full loaded {stats['loaded']} and wrote {stats['written']}")
+            check(file_times(output_dir) == before, "--full rewrote unchanged files")
+        await dispose_engine()
+
+    asyncio.run(run())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
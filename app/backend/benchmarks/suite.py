@@ -0,0 +1,141 @@
+"""Full benchmark suite with JSON results and baseline comparison.
+
+Seeds a database with seed_realistic_profiles(), runs the app/crud.py
+micro-benchmarks (benchmarks.crud) and the ASGI load scenarios
+(benchmarks.load), writes everything to one JSON file and, given a baseline
+from an earlier run, fails (exit code 1) on regressions:
+
+    python -m benchmarks.suite --save-baseline bench-baseline.json    # on the base commit
+    python -m benchmarks.suite --baseline bench-baseline.json          # on the change
+
+A crud function regresses when its p50 grows by more than --tolerance (default
+50%, as wide as timing noise on a shared machine demands) beyond the drift of the
+whole machine (the median change over all crud benchmarks) and by at least
+--min-delta-ms (default 0.2 ms); a load scenario when its requests/s drops by more
+than --tolerance or any route runs more statements per request than before.
+
+Only compare runs from the same machine, database and arguments: the baseline
+records them and a mismatch is reported. Runs are deterministic apart from timing
+(fixed seeds), and BENCH_DB_URL selects PostgreSQL as for the other benchmarks.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.common import configure_database
+
+
+def environment(args: argparse.Namespace, url: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "database": url.split(":", 1)[0],
+        "arguments": {"profiles": args.profiles, "iterations": args.iterations, "rounds": args.rounds, "requests": args.requests,
+                      "clients": args.clients, "scenarios": args.scenarios, "seed": args.seed},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> tuple[list[str], list[str]]:
+    """(regressions, notes) of `results` against `baseline`.
+
+    Gated: crud p50 latencies, scenario throughput and statements per route. The
+    median crud slowdown is taken as drift of the machine itself (a busier host
+    slows everything by about the same factor) and timings are judged relative
+    to it, so only what got slower than the rest regresses. Per-route latencies
+    under concurrent load swing too much between identical runs to gate on, so
+    their changes are only noted.
+    """
+    regressions, notes = [], []
+    ratios = [results["results"][name]["p50_ms"] / before["p50_ms"] for name, before in baseline["results"].items()
+              if name.startswith("crud.") and name in results["results"] and before["p50_ms"] > 0]
+    drift = statistics.median(ratios) if ratios else 1.0
+    if abs(drift - 1) > tolerance:
+        notes.append(f"machine drift: crud benchmarks are {drift:.2f}x the baseline overall; timings are compared relative to that")
+    for name, before in baseline["results"].items():
+        after = results["results"].get(name)
+        if after is None:
+            notes.append(f"{name}: missing from this run")
+            continue
+        if "p50_ms" in before:
+            delta = after["p50_ms"] - before["p50_ms"] * drift
+            if after["p50_ms"] > before["p50_ms"] * drift * (1 + tolerance) and delta >= min_delta_ms:
+                line = f"{name}: p50 {before['p50_ms']:.3f} -> {after['p50_ms']:.3f} ms (+{after['p50_ms'] / before['p50_ms'] / drift - 1:.0%} after drift)"
+                (regressions if name.startswith("crud.") else notes).append(line)
+        if "requests_per_s" in before and after["requests_per_s"] * drift < before["requests_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {before['requests_per_s']:,.0f} -> {after['requests_per_s']:,.0f} req/s")
+        if "statements_max" in before and after["statements_max"] > before["statements_max"]:
+            regressions.append(f"{name}: {before['statements_max']} -> {after['statements_max']} statements per request")
+    return regressions, notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per crud micro-benchmark per round")
+    parser.add_argument("--rounds", type=int, default=3, help="crud micro-benchmark rounds (best round counts)")
+    parser.add_argument("--requests", type=int, default=3000, help="actions per load scenario")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent members per load scenario")
+    parser.add_argument("--scenarios", default="read_heavy,write_heavy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench-results.json", help="where to write this run's results")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--save-baseline", help="also write this run's results here")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--min-delta-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    url = configure_database()
+    from benchmarks.crud import prepare_database, print_results as print_crud_results, run_crud_benchmarks
+    from benchmarks.load import print_results as print_load_results, run_load
+
+    async def run():
+        from app.database import engine
+        handles = await prepare_database(args.profiles, seed=args.seed)
+        try:
+            crud_results = await run_crud_benchmarks(handles, args.iterations, rounds=args.rounds, seed=args.seed)
+            load_results, problems = await run_load(handles, args.scenarios.split(","), args.requests, args.clients, seed=args.seed)
+        finally:
+            await engine.dispose()
+        return crud_results, load_results, problems
+
+    crud_results, load_results, problems = asyncio.run(run())
+    print_crud_results(crud_results)
+    print_load_results(load_results)
+
+    results = {"environment": environment(args, url), "results": {**crud_results, **load_results}}
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        before, after = baseline["environment"], results["environment"]
+        for key in ("machine", "database", "arguments"):
+            if before.get(key) != after.get(key):
+                print(f"warning: baseline {key} differs ({before.get(key)} vs {after.get(key)}); comparison may be meaningless")
+        regressions, notes = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        for note in notes:
+            print(f"note {note}")
+        print(f"\n{len(regressions)} regressions against {args.baseline} (commit {before.get('commit')})")
+        problems += regressions
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,87 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import asyncio
+import logging
+import os
+import secrets
+from contextlib import asynccontextmanager, suppress
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime, timezone # Ensure all datetime components are imported
-from jose import JWTError, jwt # Ensure JWT components are imported
+from typing import List, Literal
 
 # Project imports
-from app import crud, models, schemas
-from app.database import get_db, engine # Removed SessionLocal, Base as they are not directly used in main
+from app import conditional, crud, database, metrics, models, schemas
+from app.admission import auth_admission
+from app.database import get_db, get_pool_status
+from app.handles import handle_filter
+from app.passwords import password_hasher
+from app.serialization import respond
+from app.metrics import query_budget
 
 # --- Configuration ---
 SECRET_KEY = "your-secret-key-please-change-in-prod"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Shared secret for the /internal/* and /metrics endpoints (X-Internal-Token header, or
+# Authorization: Bearer for scrapers); unset disables them
+INTERNAL_API_TOKEN = os.environ.get("INTERNAL_API_TOKEN")
+
+logger = logging.getLogger(__name__)
 
 # --- OAuth2 Scheme ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="signin")
 
+# Pooled connections each worker opens before it starts serving (capped at DB_POOL_SIZE; 0 = none)
+DB_WARMUP_CONNECTIONS = int(os.environ.get("DB_WARMUP_CONNECTIONS", str(database.POOL_SIZE)))
+
 # --- FastAPI app instance ---
-app = FastAPI(title="User Profile API with PostgreSQL - Full CRUD")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up before the server accepts requests, so the first ones don't pay for connects and
+    # deferred imports; a database that is down only costs the warmup, not the startup
+    import jose.jwt # Deferred at import (see create_access_token), loaded here once per worker
+    password_hasher.warm_up()
+    if DB_WARMUP_CONNECTIONS > 0:
+        try:
+            await database.warm_up(DB_WARMUP_CONNECTIONS)
+        except (OSError, sqlalchemy_exc.SQLAlchemyError) as e:
+            logger.warning("Connection warmup failed, starting without it: %s", e)
+    # The handle filter is refreshed and rebuilt off the request path; checks only read it
+    update_handles = asyncio.create_task(handle_filter.keep_current(database.read_session))
+    yield
+    update_handles.cancel()
+    with suppress(asyncio.CancelledError): # Let a pass in progress unwind before the engines are disposed
+        await update_handles
+    password_hasher.shutdown()
+    await database.dispose_engine()
+
+router = APIRouter()
+
+async def pool_timeout_handler(request: Request, exc: sqlalchemy_exc.TimeoutError):
+    # No connection freed up within DB_POOL_TIMEOUT: shed the request instead of failing with a 500
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+def create_app() -> FastAPI:
+    """Build the API. Serve it with `uvicorn --factory main:create_app` (or `main:app`).
+
+    Neither importing this module nor calling this connects to the database: the engine is
+    created on first use and warmed up in the lifespan, once the server starts.
+    """
+    # routes= shares the route objects declared on `router` below instead of rebuilding them
+    app = FastAPI(title="User Profile API with PostgreSQL - Full CRUD", lifespan=lifespan, routes=router.routes)
+    app.add_middleware(metrics.MetricsMiddleware) # Per-route latency and DB timing, see app.metrics
+    app.add_exception_handler(sqlalchemy_exc.TimeoutError, pool_timeout_handler)
+    return app
 
 # --- Token Utility ---
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    from jose import jwt # python-jose pulls in the cryptography backends; imported on first use
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -31,216 +92,409 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 # --- Authentication Dependencies ---
-async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> schemas.Principal:
+    # Built from the JWT claims alone, so authenticated endpoints don't pay a DB round trip for the user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str: str = payload.get("sub")
         if user_id_str is None:
             raise credentials_exception
         user_id = int(user_id_str)
+        profile_id = payload.get("pid")
+        profile_id = int(profile_id) if profile_id is not None else None
     except (JWTError, ValueError):
         raise credentials_exception
+    return schemas.Principal(user_id=user_id, profile_id=profile_id)
 
-    user = crud.get_user(db, user_id=user_id)
-    if user is None:
-        raise credentials_exception
-    return user
-
-async def get_current_active_user(current_user: models.User = Depends(get_current_user_from_token)) -> models.User:
+async def get_current_active_user(principal: schemas.Principal = Depends(get_current_principal)) -> schemas.Principal:
     # Add active/disabled check here if implemented in User model
-    return current_user
+    return principal
+
+async def require_internal_access(
+    x_internal_token: str | None = Header(None),
+    authorization: str | None = Header(None, include_in_schema=False),
+):
+    if INTERNAL_API_TOKEN is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_internal_token is None and authorization and authorization.lower().startswith("bearer "):
+        x_internal_token = authorization[7:]
+    if x_internal_token is None or not secrets.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token")
+
+# --- Database sessions ---
+# get_db (app.database) is the primary: sign-up/in and anything else that must see the latest
+# rows. The dependencies below route reads to a replica when SUPABASE_DB_REPLICA_URLS is set
+# (see app.database, "Read replicas"); without replicas they are all the primary.
+async def get_write_db(principal: schemas.Principal = Depends(get_current_active_user)):
+    # The caller's own writes, on the primary. Their reads then stay on the primary for
+    # DB_READ_PIN_SECONDS, so they see what they wrote (read-your-writes).
+    pin = database.user_pin_key(principal.user_id)
+    database.pin_reads(pin) # Before too: the client may send its next request as soon as the response arrives
+    async with database.get_sessionmaker()() as db:
+        yield db
+    database.pin_reads(pin) # Counted from the commit
+
+async def get_my_read_db(principal: schemas.Principal = Depends(get_current_active_user)):
+    # The caller's own rows: a replica, unless they wrote recently
+    async with database.read_session(database.user_pin_key(principal.user_id)) as db:
+        yield db
+
+async def get_profile_read_db(handle_value: str):
+    # A public profile: a replica, unless the profile changed recently (the response is cached)
+    async with database.read_session(database.handle_pin_key(handle_value)) as db:
+        yield db
+
+async def get_read_db():
+    # Public listings and checks, where a replica's lag is acceptable
+    async with database.read_session() as db:
+        yield db
+
+# --- Conditional requests ---
+# Profile responses carry the profile's ETag and Last-Modified (app.conditional); writes answer
+# with the new ones, so a client can send If-Match with its next write without fetching again.
+def with_headers(result, response: Response, headers: dict[str, str]):
+    # respond() gives a Response in fast mode and an ORM object (serialized by FastAPI) otherwise
+    (result if isinstance(result, Response) else response).headers.update(headers)
+    return result
+
+def written_profile_headers(db: AsyncSession) -> dict[str, str]:
+    written = crud.written_profile_version(db)
+    return conditional.validator_headers(*written) if written else {}
+
+def client_ip(request: Request) -> str | None:
+    # The peer address; behind a proxy, run uvicorn with --proxy-headers so this is the real client's
+    return request.client.host if request.client else None
 
 # --- Auth Endpoints ---
-@app.post("/signup", response_model=schemas.User)
-async def signup(user_create: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user_create.email)
-    if db_user:
+@router.post("/signup", response_model=schemas.User)
+@query_budget(5)
+async def signup(request: Request, user_create: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    # Rate limits and the concurrency cap are checked before the email lookup and the bcrypt hash
+    with auth_admission.admit("signup", client_ip(request), user_create.email):
+        # Creates the user and their profile in one transaction; None means the email is taken
+        created_user = await crud.create_user_with_profile(db=db, user=user_create)
+    if created_user is None:
         raise HTTPException(status_code=400, detail="Email already registered")
-    created_user = crud.create_user(db=db, user=user_create)
-    # Automatically create a profile for the new user
-    crud.get_or_create_profile(db, user_id=created_user.id)
-    return created_user
-
-@app.post("/signin", response_model=schemas.Token)
-async def signin(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = crud.get_user_by_email(db, email=form_data.username)
-    # Using pwd_context from crud.py (imported as crud.pwd_context implicitly)
-    if not user or not crud.pwd_context.verify(form_data.password, user.hashed_password):
+    return respond(created_user)
+
+@router.post("/signin", response_model=schemas.Token)
+@query_budget(8) # 2 normally; rehashing and creating a missing profile add the rest
+async def signin(request: Request, db: AsyncSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    with auth_admission.admit("signin", client_ip(request), form_data.username):
+        user = await crud.get_user_by_email(db, email=form_data.username)
+        # bcrypt runs in the password worker pool (app/passwords.py), not on the event loop
+        is_valid, new_hash = (await crud.verify_password(form_data.password, user.hashed_password)) if user else (False, None)
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash was made with a different BCRYPT_ROUNDS; upgrade it transparently
+        await crud.update_user_password_hash(db, db_user=user, hashed_password=new_hash)
+    user_id = user.id # Read now: losing a race to create the profile rolls back, which expires `user`
+    profile_id = await crud.get_profile_id_by_user_id(db, user_id=user_id)
+    if profile_id is None:
+        profile_id = (await crud.get_or_create_profile(db, user_id=user_id)).id
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": str(user_id), "pid": profile_id},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 # --- Profile Endpoints ---
-@app.get("/profiles/me/", response_model=schemas.Profile)
+@router.get("/profiles/me/", response_model=schemas.Profile)
+@query_budget(7) # 1 SELECT + 2 selectinloads (+1 to revalidate); the first access misses (possibly on a replica) and creates the profile
 async def get_my_profile(
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    read_db: AsyncSession = Depends(get_my_read_db),
+    db: AsyncSession = Depends(get_db)
 ):
-    profile = crud.get_or_create_profile(db, user_id=current_user.id)
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        # Revalidation reads the version alone; experiences and education are only loaded if it changed
+        current = await crud.get_profile_version(read_db, user_id=current_user.user_id)
+        if current is not None:
+            headers = conditional.validator_headers(*current) | conditional.PRIVATE_CACHE_HEADERS
+            if conditional.is_not_modified(request.headers, headers["ETag"], current.updated_at):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    profile = await crud.get_profile_by_user_id(read_db, user_id=current_user.user_id)
+    if profile is None:
+        # First access, or a replica that hasn't caught up with the sign-up: the primary decides
+        profile = await crud.get_or_create_profile(db, user_id=current_user.user_id)
     # The profile object from CRUD is an SQLAlchemy model.
     # FastAPI will convert it to schemas.Profile based on response_model.
-    return profile
+    headers = conditional.validator_headers(profile.id, profile.version, profile.updated_at) | conditional.PRIVATE_CACHE_HEADERS
+    return with_headers(respond(profile), response, headers)
 
-@app.put("/profiles/me/", response_model=schemas.Profile)
+@router.put("/profiles/me/", response_model=schemas.Profile)
+@query_budget(9)
 async def update_my_profile(
     profile_data: schemas.ProfileUpdate, # Using ProfileUpdate schema
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: str | None = Header(None),
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    existing_profile = crud.get_or_create_profile(db, user_id=current_user.id)
-    updated_profile = crud.update_user_profile(db, profile_data=profile_data, existing_profile=existing_profile)
-    return updated_profile
+    # With If-Match, the update only applies to the version the client last saw (else 412)
+    existing_profile = await crud.get_or_create_profile(db, user_id=current_user.user_id)
+    updated_profile = await crud.update_user_profile(db, profile_data=profile_data, existing_profile=existing_profile,
+                                                     if_match=conditional.parse_if_match(if_match))
+    return with_headers(respond(updated_profile), response, written_profile_headers(db))
+
+@router.patch("/profiles/me/batch", response_model=schemas.Profile)
+@query_budget(24) # One statement per kind of operation, whatever the number of items; see crud.apply_profile_batch
+async def batch_update_my_profile(
+    operations: schemas.ProfileBatch,
+    response: Response,
+    if_match: str | None = Header(None),
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
+):
+    # Profile fields, experiences and education from one editor save, in one transaction (all or nothing)
+    profile_id = current_user.profile_id or (await crud.get_or_create_profile(db, user_id=current_user.user_id)).id
+    profile = await crud.apply_profile_batch(db, profile_id=profile_id, operations=operations, if_match=conditional.parse_if_match(if_match))
+    return with_headers(respond(profile), response, written_profile_headers(db))
 
 # --- Experience Endpoints ---
-@app.post("/profiles/me/experiences/", response_model=schemas.Experience, status_code=status.HTTP_201_CREATED)
+@router.post("/profiles/me/experiences/", response_model=schemas.Experience, status_code=status.HTTP_201_CREATED)
+@query_budget(10)
 async def add_my_experience(
     experience_data: schemas.ExperienceCreate,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
+):
+    profile_id = current_user.profile_id or (await crud.get_or_create_profile(db, user_id=current_user.user_id)).id
+    new_experience = await crud.create_profile_experience(db, experience=experience_data, profile_id=profile_id)
+    return with_headers(respond(new_experience, status_code=status.HTTP_201_CREATED), response, written_profile_headers(db))
+
+@router.post("/profiles/me/experiences/batch", response_model=List[schemas.Experience], status_code=status.HTTP_201_CREATED)
+@query_budget(12)
+async def add_my_experiences(
+    experiences_data: schemas.ExperienceBatchCreate,
+    response: Response,
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    profile = crud.get_or_create_profile(db, user_id=current_user.id)
-    new_experience = crud.create_profile_experience(db, experience=experience_data, profile_id=profile.id)
-    return new_experience
+    # Up to schemas.MAX_BATCH_ITEMS experiences in one INSERT and one commit
+    profile_id = current_user.profile_id or (await crud.get_or_create_profile(db, user_id=current_user.user_id)).id
+    new_experiences = await crud.create_profile_experiences(db, experiences=experiences_data, profile_id=profile_id)
+    return with_headers(respond(new_experiences, status_code=status.HTTP_201_CREATED), response, written_profile_headers(db))
 
-@app.get("/profiles/me/experiences/{experience_id}", response_model=schemas.Experience)
+@router.get("/profiles/me/experiences/{experience_id}", response_model=schemas.Experience)
+@query_budget(1)
 async def get_my_experience_item(
     experience_id: int,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_my_read_db)
 ):
-    profile = crud.get_profile_by_user_id(db, user_id=current_user.id)
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
-
-    experience = crud.get_experience(db, experience_id=experience_id, profile_id=profile.id)
+    # Ownership is checked through profiles.user_id in the same query
+    experience = await crud.get_user_experience(db, experience_id=experience_id, user_id=current_user.user_id)
     if not experience:
         raise HTTPException(status_code=404, detail="Experience not found or does not belong to user")
-    return experience
+    return respond(experience)
 
-@app.put("/profiles/me/experiences/{experience_id}", response_model=schemas.Experience)
+@router.put("/profiles/me/experiences/{experience_id}", response_model=schemas.Experience)
+@query_budget(11)
 async def update_my_experience(
     experience_id: int,
     experience_data: schemas.ExperienceUpdate,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: str | None = Header(None),
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    profile = crud.get_profile_by_user_id(db, user_id=current_user.id)
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found for current user")
-
-    db_experience = crud.get_experience(db, experience_id=experience_id, profile_id=profile.id)
-    if not db_experience:
+    # Single UPDATE ... RETURNING, restricted to the caller's profile
+    updated_experience = await crud.update_user_experience(db, experience_id=experience_id, user_id=current_user.user_id,
+                                                           experience_data=experience_data, if_match=conditional.parse_if_match(if_match))
+    if not updated_experience:
         raise HTTPException(status_code=404, detail="Experience not found or not owned by user")
+    return with_headers(respond(updated_experience), response, written_profile_headers(db))
 
-    updated_experience = crud.update_profile_experience(db, experience_data=experience_data, db_experience=db_experience)
-    return updated_experience
-
-@app.delete("/profiles/me/experiences/{experience_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/profiles/me/experiences/{experience_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(8)
 async def delete_my_experience(
     experience_id: int,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: str | None = Header(None),
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    profile = crud.get_profile_by_user_id(db, user_id=current_user.id)
-    if not profile:
-        # This case should ideally not happen if user is authenticated and profile is auto-created
-        raise HTTPException(status_code=404, detail="Profile not found for current user")
-
-    deleted_experience = crud.delete_profile_experience(db, experience_id=experience_id, profile_id=profile.id)
-    if not deleted_experience: # If it didn't exist or wasn't owned
+    # Single DELETE ... RETURNING, restricted to the caller's profile
+    deleted_experience_id = await crud.delete_user_experience(db, experience_id=experience_id, user_id=current_user.user_id,
+                                                              if_match=conditional.parse_if_match(if_match))
+    if deleted_experience_id is None: # If it didn't exist or wasn't owned
         raise HTTPException(status_code=404, detail="Experience not found or not owned by user")
+    response.headers.update(written_profile_headers(db))
     return # FastAPI handles 204 No Content response
 
 # --- Public Profile Endpoint ---
-@app.get("/profiles/handle/{handle_value}", response_model=schemas.Profile, tags=["Public Profiles"])
+@router.get("/profiles", response_model=schemas.ProfileCardPage, tags=["Public Profiles"])
+@query_budget(1)
+async def list_profiles(
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=crud.DIRECTORY_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Public directory ordered by handle; follow next_cursor for the next page
+    return await crud.get_profile_directory_page(db, limit=limit, cursor=cursor)
+
+@router.get("/search", response_model=schemas.ProfileCardPage, tags=["Public Profiles"])
+@query_budget(1)
+async def search_profiles(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=crud.DIRECTORY_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Ranked by relevance over names, bios, job titles, companies, institutions and skills
+    return await crud.search_profiles(db, query=q, limit=limit, cursor=cursor)
+
+@router.get("/skills/profiles", response_model=schemas.SkillMatchPage, tags=["Public Profiles"])
+@query_budget(4)
+async def find_profiles_by_skills(
+    skill: List[str] = Query(..., min_length=1, max_length=10),
+    match: Literal["all", "any"] = "all",
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=crud.DIRECTORY_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # ?skill=rust&skill=kubernetes: profiles listing all (or, with match=any, any) of the skills,
+    # most matched skills first; matching ignores case and extra whitespace
+    return await crud.find_profiles_by_skills(db, skills=skill, match_all=match == "all", limit=limit, cursor=cursor)
+
+@router.get("/handles/{handle}/available", response_model=schemas.HandleAvailability, tags=["Public Profiles"])
+@query_budget(1)
+async def check_handle_available(handle: str, db: AsyncSession = Depends(get_read_db)):
+    # Live check for signup/profile forms; handles are unique ignoring case
+    return schemas.HandleAvailability(handle=handle, available=await crud.is_handle_available(db, handle))
+
+@router.get("/profiles/handle/{handle_value}", response_model=schemas.Profile, tags=["Public Profiles"])
+@query_budget(4)
 async def read_profile_by_handle(
     handle_value: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_profile_read_db)
 ):
-    # Ensure handle is treated case-insensitively or as per defined policy
-    # For now, assuming case-sensitive match as per default DB behavior
-    db_profile = crud.get_profile_by_handle(db, handle=handle_value)
-    if db_profile is None:
+    # Handles resolve case-insensitively (/profiles/handle/Alice finds alice)
+    profile = await crud.get_public_profile_json(db, handle=handle_value)
+    if profile is None:
         raise HTTPException(status_code=404, detail="Profile not found for this handle")
-    # The schemas.Profile response_model will automatically serialize the data,
-    # including experiences and education history due to eager loading in CRUD
-    # and `from_attributes = True` in schemas.
-    return db_profile
+    headers = conditional.validator_headers(profile.profile_id, profile.version, profile.updated_at) | conditional.PUBLIC_CACHE_HEADERS
+    if conditional.is_not_modified(request.headers, headers["ETag"], profile.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Already-serialized schemas.Profile (possibly from crud.profile_cache), so it is
+    # returned as-is instead of going through response_model validation again.
+    return Response(content=profile.body, media_type="application/json", headers=headers)
 
 # --- Education Endpoints (Following similar pattern to Experience) ---
 # These are protected endpoints for the authenticated user to manage their own education
-@app.post("/profiles/me/education/", response_model=schemas.Education, status_code=status.HTTP_201_CREATED, tags=["Education Management"])
+@router.post("/profiles/me/education/", response_model=schemas.Education, status_code=status.HTTP_201_CREATED, tags=["Education Management"])
+@query_budget(7)
 async def add_my_education(
     education_data: schemas.EducationCreate,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
+):
+    profile_id = current_user.profile_id or (await crud.get_or_create_profile(db, user_id=current_user.user_id)).id # Ensures profile exists
+    new_education = await crud.create_profile_education(db, education=education_data, profile_id=profile_id)
+    return with_headers(respond(new_education, status_code=status.HTTP_201_CREATED), response, written_profile_headers(db))
+
+@router.post("/profiles/me/education/batch", response_model=List[schemas.Education], status_code=status.HTTP_201_CREATED, tags=["Education Management"])
+@query_budget(9)
+async def add_my_education_batch(
+    education_data: schemas.EducationBatchCreate,
+    response: Response,
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    profile = crud.get_or_create_profile(db, user_id=current_user.id) # Ensures profile exists
-    new_education = crud.create_profile_education(db, education=education_data, profile_id=profile.id)
-    return new_education
+    # Up to schemas.MAX_BATCH_ITEMS education items in one INSERT and one commit
+    profile_id = current_user.profile_id or (await crud.get_or_create_profile(db, user_id=current_user.user_id)).id
+    new_education_items = await crud.create_profile_education_batch(db, education_items=education_data, profile_id=profile_id)
+    return with_headers(respond(new_education_items, status_code=status.HTTP_201_CREATED), response, written_profile_headers(db))
 
-@app.get("/profiles/me/education/{education_id}", response_model=schemas.Education, tags=["Education Management"])
+@router.get("/profiles/me/education/{education_id}", response_model=schemas.Education, tags=["Education Management"])
+@query_budget(1)
 async def get_my_education_item(
     education_id: int,
-    current_user: models.User = Depends(get_current_active_user), # Protected
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(get_current_active_user), # Protected
+    db: AsyncSession = Depends(get_my_read_db)
 ):
-    profile = crud.get_profile_by_user_id(db, user_id=current_user.id) # Get existing profile
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found for current user") # Should not happen if profile auto-created
-
-    education_item = crud.get_education_item(db, education_id=education_id, profile_id=profile.id)
+    # Ownership is checked through profiles.user_id in the same query
+    education_item = await crud.get_user_education_item(db, education_id=education_id, user_id=current_user.user_id)
     if not education_item:
         raise HTTPException(status_code=404, detail="Education item not found or does not belong to the current user's profile")
-    return education_item
+    return respond(education_item)
 
-@app.put("/profiles/me/education/{education_id}", response_model=schemas.Education, tags=["Education Management"])
+@router.put("/profiles/me/education/{education_id}", response_model=schemas.Education, tags=["Education Management"])
+@query_budget(7)
 async def update_my_education(
     education_id: int,
     education_data: schemas.EducationUpdate,
-    current_user: models.User = Depends(get_current_active_user), # Protected
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: str | None = Header(None),
+    current_user: schemas.Principal = Depends(get_current_active_user), # Protected
+    db: AsyncSession = Depends(get_write_db)
 ):
-    profile = crud.get_profile_by_user_id(db, user_id=current_user.id)
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found for current user")
-
-    db_education_item = crud.get_education_item(db, education_id=education_id, profile_id=profile.id)
-    if not db_education_item:
+    # Single UPDATE ... RETURNING, restricted to the caller's profile
+    updated_education_item = await crud.update_user_education(db, education_id=education_id, user_id=current_user.user_id,
+                                                              education_data=education_data, if_match=conditional.parse_if_match(if_match))
+    if not updated_education_item:
         raise HTTPException(status_code=404, detail="Education item not found or does not belong to current user's profile")
+    return with_headers(respond(updated_education_item), response, written_profile_headers(db))
 
-    updated_education_item = crud.update_profile_education(db, education_data=education_data, db_education=db_education_item)
-    return updated_education_item
-
-@app.delete("/profiles/me/education/{education_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Education Management"])
+@router.delete("/profiles/me/education/{education_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Education Management"])
+@query_budget(7)
 async def delete_my_education(
     education_id: int,
-    current_user: models.User = Depends(get_current_active_user), # Protected
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: str | None = Header(None),
+    current_user: schemas.Principal = Depends(get_current_active_user), # Protected
+    db: AsyncSession = Depends(get_write_db)
 ):
-    profile = crud.get_profile_by_user_id(db, user_id=current_user.id)
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found for current user")
-
-    deleted_education_item = crud.delete_profile_education(db, education_id=education_id, profile_id=profile.id)
-    if not deleted_education_item: # Check if deletion was successful (item existed and belonged to profile)
+    # Single DELETE ... RETURNING, restricted to the caller's profile
+    deleted_education_id = await crud.delete_user_education(db, education_id=education_id, user_id=current_user.user_id,
+                                                            if_match=conditional.parse_if_match(if_match))
+    if deleted_education_id is None: # Check if deletion was successful (item existed and belonged to profile)
         raise HTTPException(status_code=404, detail="Education item not found or does not belong to current user's profile")
+    response.headers.update(written_profile_headers(db))
     return
 
+# --- Internal Endpoints ---
+@router.get("/internal/pool", include_in_schema=False, dependencies=[Depends(require_internal_access)])
+@query_budget(0)
+async def read_pool_status():
+    # Connection pool occupancy and checkout wait times (see app.database)
+    return get_pool_status()
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_internal_access)])
+@query_budget(0)
+async def read_metrics():
+    # Prometheus text exposition of this worker's request and DB timings
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
 # --- Root Endpoint ---
-@app.get("/", tags=["General"])
+@router.get("/", tags=["General"])
+@query_budget(0)
 async def root():
     return {"message": "Welcome to the User Profile API - Full CRUD with Database!"}
+
+
+def __getattr__(name: str):
+    # `main:app` (uvicorn, benchmarks) builds the app on first access, not at import
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
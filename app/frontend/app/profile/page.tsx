@@ -4,14 +4,12 @@ import { useEffect, useState, FormEvent } from 'react';
 import { useRouter } from 'next/navigation';
 import {
   getProfile,
-  updateProfile,
-  addExperience,
-  updateExperience,
-  deleteExperience,
+  saveProfileChanges,
   UserProfile,
   Experience,
   ExperienceCreateData,
   UserProfileUpdateData,
+  ProfileBatchOperation,
 } from '@/services/api';
 import Link from 'next/link'; // Import Link for navigation
 
@@ -99,17 +97,17 @@ export default function ProfilePage() {
     setHandleError(null); // Clear previous handle error
 
     try {
-      const dataToUpdate: UserProfileUpdateData = {
-        handle: profileEditData.handle, // Add handle
-        full_name: profileEditData.full_name,
-        bio: profileEditData.bio,
-        profile_picture_url: profileEditData.profile_picture_url,
-        linkedin_url: profileEditData.linkedin_url,
-        github_url: profileEditData.github_url,
-        website_url: profileEditData.website_url,
-      };
-      const updatedProfile = await updateProfile(dataToUpdate, token);
-      setProfile(updatedProfile);
+      // Only the fields that changed are sent; with none, there is nothing to save
+      const dataToUpdate: UserProfileUpdateData = {};
+      (Object.keys(profileEditData) as (keyof UserProfileUpdateData)[]).forEach((key) => {
+        if ((profileEditData[key] || '') !== (profile[key] || '')) {
+          dataToUpdate[key] = profileEditData[key];
+        }
+      });
+      if (Object.keys(dataToUpdate).length > 0) {
+        const updatedProfile = await saveProfileChanges([{ op: 'update_profile', data: dataToUpdate }], token);
+        setProfile(updatedProfile);
+      }
       setIsEditingProfile(false);
       setError(null); // Clear general error
     } catch (err: any) {
@@ -150,15 +148,14 @@ export default function ProfilePage() {
     if (!token || !currentExperience) return;
 
     try {
-      if (editingExperienceId) {
-        await updateExperience(editingExperienceId, currentExperience, token);
-      } else {
-        await addExperience(currentExperience, token);
-      }
+      const operation: ProfileBatchOperation = editingExperienceId
+        ? { op: 'update_experience', id: editingExperienceId, data: currentExperience }
+        : { op: 'create_experience', data: currentExperience };
+      const updatedProfile = await saveProfileChanges([operation], token);
+      setProfile(updatedProfile); // The save answers with the whole profile, so no refetch
       setShowExperienceForm(false);
       setCurrentExperience(null);
       setEditingExperienceId(null);
-      fetchProfileData(token); // Refresh profile to get updated experiences list
       setError(null);
     } catch (err: any) {
       setError(err.message || `Failed to ${editingExperienceId ? 'update' : 'add'} experience.`);
@@ -171,8 +168,8 @@ export default function ProfilePage() {
     if (!token) return;
 
     try {
-      await deleteExperience(expId, token);
-      fetchProfileData(token); // Refresh
+      const updatedProfile = await saveProfileChanges([{ op: 'delete_experience', id: expId }], token);
+      setProfile(updatedProfile);
       setError(null);
     } catch (err: any) {
       setError(err.message || 'Failed to delete experience.');
@@ -77,8 +77,7 @@ export type UserProfileUpdateData = { // Changed from UserProfileCreateUpdateDat
   linkedin_url?: string;
   github_url?: string;
   website_url?: string;
-  // Note: experiences and education_history are not part of the PUT /profiles/me/ payload
-  // They are managed by their own dedicated endpoints.
+  // Note: experiences and education_history are changed through their own batch operations
 };
 
 export type ExperienceCreateData = Omit<Experience, 'id'>;
@@ -88,44 +87,43 @@ export const getProfile = (token: string): Promise<UserProfile> => {
   return request<UserProfile>('/profiles/me/', { token });
 };
 
-export const updateProfile = (data: UserProfileUpdateData, token: string): Promise<UserProfile> => {
-  return request<UserProfile>('/profiles/me/', {
-    method: 'PUT',
-    body: data,
-    token,
-  });
-};
-
-// --- Experience API ---
-export const addExperience = (data: ExperienceCreateData, token: string): Promise<Experience> => {
-  return request<Experience>('/profiles/me/experiences/', {
-    method: 'POST',
-    body: data,
-    token,
-  });
-};
-
-export const updateExperience = (id: string, data: ExperienceCreateData, token: string): Promise<Experience> => {
-  return request<Experience>(`/profiles/me/experiences/${id}`, {
-    method: 'PUT',
-    body: data,
-    token,
-  });
-};
-
-export const deleteExperience = (id: string, token: string): Promise<null> => {
-  return request<null>(`/profiles/me/experiences/${id}`, {
-    method: 'DELETE',
+// --- Profile Editor API ---
+// One save from the profile editor: any mix of profile field changes and experience/education
+// additions, edits and removals, applied by PATCH /profiles/me/batch in a single transaction
+// (all or nothing). The response is the updated profile, so there is nothing to refetch.
+export type EducationCreateData = Omit<Education, 'id'>;
+
+export type ProfileBatchOperation =
+  | { op: 'update_profile'; data: UserProfileUpdateData }
+  | { op: 'create_experience'; data: ExperienceCreateData }
+  | { op: 'update_experience'; id: string; data: Partial<ExperienceCreateData> }
+  | { op: 'delete_experience'; id: string }
+  | { op: 'create_education'; data: EducationCreateData }
+  | { op: 'update_education'; id: string; data: Partial<EducationCreateData> }
+  | { op: 'delete_education'; id: string };
+
+export const saveProfileChanges = (operations: ProfileBatchOperation[], token: string): Promise<UserProfile> => {
+  return request<UserProfile>('/profiles/me/batch', {
+    method: 'PATCH',
+    body: operations,
     token,
   });
 };
 
 // --- Public Profile API ---
-export const getPublicProfileByHandle = (handle: string): Promise<UserProfile> => {
+// Where `python -m app.cli export-static` output is served (e.g. a CDN); unset reads from the API
+const PROFILE_STATIC_URL = process.env.NEXT_PUBLIC_PROFILE_STATIC_URL;
+
+export const getPublicProfileByHandle = async (handle: string): Promise<UserProfile> => {
+  if (PROFILE_STATIC_URL) {
+    // Exported files are named by the lowercased, percent-encoded handle (as Python's quote(handle, safe=""));
+    // encoded once more for the URL, which the server decodes back to the file name.
+    // Profiles newer than the last export fall back to the API.
+    const fileName = encodeURIComponent(handle.toLowerCase()).replace(/[!'()*]/g, (c) => `%${c.charCodeAt(0).toString(16).toUpperCase()}`);
+    const response = await fetch(`${PROFILE_STATIC_URL}/p/${encodeURIComponent(fileName)}.json`);
+    if (response.ok) {
+      return response.json();
+    }
+  }
   return request<UserProfile>(`/profiles/handle/${handle}`);
 };
-
-// Placeholder for Education API functions if needed later
-// export const addEducation = ...
-// export const updateEducation = ...
-// export const deleteEducation = ...